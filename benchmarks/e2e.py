@@ -0,0 +1,311 @@
+"""End to end benchmark of the discovery and crawling endpoints.
+
+Starts local stand-ins for Google, Apify and analytics (see ``benchmarks.fakes``),
+points the module at them and drives the FastAPI app in-process with N companies
+at a concurrency of C requests. Reports the throughput, the p50/p95/p99 request
+latency and the peak memory, and compares them with a stored baseline.
+
+Run it from the repository root, e.g.::
+
+    python -m benchmarks.e2e companies --companies 200 --concurrency 16
+    python -m benchmarks.e2e discover --latency google=0.05 --error-rate google=0.1
+    python -m benchmarks.e2e companies --save-baseline
+    python -m benchmarks.e2e companies --compare
+
+Baselines are stored per scenario in ``benchmarks/baselines``. A comparison
+fails if the throughput drops or the p95 latency grows by more than the
+tolerance, and is only meaningful on the machine the baseline was recorded on.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fakes import (
+    FakeAnalytics,
+    FakeApify,
+    FakeGoogle,
+    FakeServer,
+    company_slug,
+)
+
+SCENARIOS = ("companies", "discover")
+UPSTREAMS = ("google", "apify", "analytics")
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# the stand-ins answer instantly, so the rate limits would dominate the results
+UNLIMITED_RATE = {
+    "RATE_PER_SECOND": "10000",
+    "MAX_RATE_PER_SECOND": "10000",
+    "GLOBAL_RATE_PER_SECOND": "10000",
+    "BURST": "1000",
+}
+
+
+def percentile(values: list[float], share: float) -> float:
+    """Return the nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def upstream_settings(pairs: list[str], option: str) -> dict[str, float]:
+    """Parse ``upstream=value`` pairs given on the command line."""
+    settings = {}
+    for pair in pairs:
+        upstream, _, value = pair.partition("=")
+        if upstream not in UPSTREAMS or not value:
+            raise SystemExit(
+                f"{option} expects upstream=value with upstream in "
+                f"{', '.join(UPSTREAMS)}, got {pair!r}"
+            )
+        settings[upstream] = float(value)
+    return settings
+
+
+def configure_environment(fakes: dict[str, FakeServer], args: argparse.Namespace):
+    """Point the module at the stand-ins; must run before the app is imported."""
+    for variable in (
+        "DISCOVERY_CACHE_PATH",
+        "SCRAPE_CACHE_PATH",
+        "FEED_SNAPSHOT_PATH",
+        "CRAWL_QUEUE_PATH",
+    ):
+        os.environ.pop(variable, None)
+    os.environ.update(
+        {
+            "DEPLOYMENT_ENV": "prod",
+            "APIFY_API_KEY": "benchmark",
+            "APIFY_ACTOR_ID": "benchmark~linkedin",
+            "APIFY_API_URL": fakes["apify"].url,
+            "APIFY_BATCH_SIZE": str(args.batch_size),
+            "APIFY_MAX_CONCURRENT_RUNS": str(args.concurrency),
+            "ANALYTICS_BASE_URL": fakes["analytics"].url,
+            "GOOGLE_SEARCH_PAUSE": "0",
+        }
+    )
+    for upstream in UPSTREAMS:
+        for key, value in UNLIMITED_RATE.items():
+            os.environ[f"{upstream.upper()}_{key}"] = value
+    fakes["google"].patch_googlesearch()
+
+
+def request_bodies(args: argparse.Namespace, run: str) -> list:
+    """Return the request bodies of a scenario, with names unique to the run."""
+    names = [f"Bench {run} Company {index}" for index in range(args.companies)]
+    chunks = [
+        names[start : start + args.per_request]
+        for start in range(0, len(names), args.per_request)
+    ]
+    if args.scenario == "discover":
+        return [
+            [{"company_id": name, "name": name} for name in chunk] for chunk in chunks
+        ]
+    return [
+        {
+            "task_id": index,
+            "companies": {
+                name: {
+                    "urls": [f"https://www.linkedin.com/company/{company_slug(name)}"]
+                }
+                for name in chunk
+            },
+        }
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+async def drive(app, args: argparse.Namespace, bodies: list) -> tuple[list, int]:
+    """Send the request bodies with ``args.concurrency`` requests in flight."""
+    path = "/discover" if args.scenario == "discover" else "/companies"
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    failed = 0
+    # failing requests are counted like the 500 responses a server would send
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+
+        async def send(body):
+            nonlocal failed
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json=body)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != httpx.codes.OK:
+                    failed += 1
+
+        await asyncio.gather(*(send(body) for body in bodies))
+    return latencies, failed
+
+
+async def run_scenario(args: argparse.Namespace, fakes: dict[str, FakeServer]):
+    """Run the warmup and the measured requests within the app lifespan."""
+    from parma_mining.linkedin.api.dependencies.auth import authenticate
+    from parma_mining.linkedin.api.main import app
+
+    app.dependency_overrides[authenticate] = lambda: "benchmark-token"
+    async with app.router.lifespan_context(app):
+        if args.warmup:
+            await drive(app, args, request_bodies(args, "warmup")[: args.warmup])
+        before = {name: fake.stats() for name, fake in fakes.items()}
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        latencies, failed = await drive(app, args, request_bodies(args, "measured"))
+        seconds = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    upstreams = {
+        name: {
+            key: value - before[name].get(key, 0) for key, value in fake.stats().items()
+        }
+        for name, fake in fakes.items()
+    }
+    return {
+        "requests": len(latencies),
+        "failed_requests": failed,
+        "seconds": round(seconds, 3),
+        "companies_per_second": round(args.companies / seconds, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+        "upstreams": upstreams,
+    }
+
+
+def config(args: argparse.Namespace) -> dict:
+    """Return the settings a baseline is only comparable under."""
+    return {
+        "companies": args.companies,
+        "concurrency": args.concurrency,
+        "per_request": args.per_request,
+        "batch_size": args.batch_size,
+        "run_seconds": args.run_seconds,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+    }
+
+
+def compare(args: argparse.Namespace, results: dict) -> bool:
+    """Print the change against the stored baseline and return whether it passes."""
+    path = BASELINE_DIR / f"{args.scenario}.json"
+    if not path.exists():
+        print(f"No baseline at {path}, record one with --save-baseline")
+        return True
+    baseline = json.loads(path.read_text())
+    if baseline["config"] != config(args):
+        print(f"Baseline {path} was recorded with {baseline['config']}, not compared")
+        return True
+    base = baseline["results"]
+    throughput = results["companies_per_second"] / base["companies_per_second"] - 1
+    p95 = results["p95_ms"] / base["p95_ms"] - 1
+    print(f"vs baseline: throughput {throughput:+.1%}, p95 latency {p95:+.1%}")
+    passed = throughput >= -args.tolerance and p95 <= args.tolerance
+    if not passed:
+        print(f"Regression beyond the tolerance of {args.tolerance:.0%}")
+    return passed
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--per-request", type=int, default=1, help="companies sent per request"
+    )
+    parser.add_argument("--batch-size", type=int, default=25, help="urls per run")
+    parser.add_argument(
+        "--run-seconds", type=float, default=0.5, help="duration of an actor run"
+    )
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="UPSTREAM=SECONDS",
+        help="response latency of an upstream, may be repeated",
+    )
+    parser.add_argument(
+        "--error-rate",
+        action="append",
+        default=[],
+        metavar="UPSTREAM=SHARE",
+        help="share of requests an upstream answers with 503, may be repeated",
+    )
+    parser.add_argument("--warmup", type=int, default=2, help="warmup requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args(argv)
+    args.latency = upstream_settings(args.latency, "--latency")
+    args.error_rate = upstream_settings(args.error_rate, "--error-rate")
+    return args
+
+
+def main(argv: list[str]) -> int:
+    """Run a scenario and report, store or compare its results."""
+    args = parse_args(argv)
+    fakes: dict[str, FakeServer] = {
+        "google": FakeGoogle(
+            args.latency.get("google", 0), args.error_rate.get("google", 0), args.seed
+        ),
+        "apify": FakeApify(
+            args.latency.get("apify", 0),
+            args.error_rate.get("apify", 0),
+            args.seed,
+            run_seconds=args.run_seconds,
+        ),
+        "analytics": FakeAnalytics(
+            args.latency.get("analytics", 0),
+            args.error_rate.get("analytics", 0),
+            args.seed,
+        ),
+    }
+    for fake in fakes.values():
+        fake.start()
+    try:
+        configure_environment(fakes, args)
+        results = asyncio.run(run_scenario(args, fakes))
+    finally:
+        for fake in fakes.values():
+            fake.stop()
+
+    if args.json:
+        print(json.dumps({"config": config(args), "results": results}, indent=2))
+    else:
+        print(f"{args.scenario}: {json.dumps(config(args))}")
+        for key, value in results.items():
+            if key != "upstreams":
+                print(f"{key:>22}: {value}")
+        for name, stats in results["upstreams"].items():
+            print(f"{name:>22}: {json.dumps(stats)}")
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.scenario}.json"
+        path.write_text(
+            json.dumps({"config": config(args), "results": results}, indent=2) + "\n"
+        )
+        print(f"Baseline stored at {path}")
+    if args.compare and not compare(args, results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    sys.exit(main(sys.argv[1:]))
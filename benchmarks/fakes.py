@@ -0,0 +1,331 @@
+"""Local stand-ins for Google, Apify and analytics used by the benchmarks.
+
+Every stand-in is a small HTTP server running in a background thread of the
+benchmark process. It answers like the real upstream for the requests the module
+sends, and can inject latency and errors into its responses. The servers use
+plain HTTP on 127.0.0.1, so the full client stacks of the module (googlesearch,
+apify-client, httpx) are exercised without reaching the internet.
+"""
+import gzip
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import googlesearch
+
+from parma_mining.mining_common.const import (
+    HTTP_200,
+    HTTP_201,
+    HTTP_404,
+    HTTP_503,
+)
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class FakeServer:
+    """HTTP server answering requests with injected latency and errors."""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        """Initialize the FakeServer class.
+
+        Every response is delayed by ``latency`` seconds (+-20% jitter). A share
+        of ``error_rate`` of the requests is answered with status 503 instead.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.injected_errors = 0
+        self.received_bytes = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self.url = ""
+
+    def start(self) -> str:
+        """Start serving on a free port and return the base url."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # noqa: N802
+                fake._serve(self)
+
+            def do_POST(self):  # noqa: N802
+                fake._serve(self)
+
+            def log_message(self, format, *args):  # noqa: A002
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        return self.url
+
+    def stop(self):
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of requests, injected errors and received bytes."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "injected_errors": self.injected_errors,
+                "received_bytes": self.received_bytes,
+            }
+
+    def handle(
+        self, method: str, path: str, query: dict[str, str], body: bytes
+    ) -> tuple[int, dict[str, str], bytes]:
+        """Return the status, headers and body answering a request."""
+        raise NotImplementedError
+
+    def _serve(self, request: BaseHTTPRequestHandler):
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        if request.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        url = urllib.parse.urlsplit(request.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        with self._lock:
+            self.requests += 1
+            self.received_bytes += len(body)
+            delay = self.latency * self._random.uniform(0.8, 1.2)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.injected_errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            status, headers, content = HTTP_503, JSON_HEADERS, b'{"error":"injected"}'
+        else:
+            status, headers, content = self.handle(
+                request.command, url.path, query, body
+            )
+        request.send_response(status)
+        for header, value in headers.items():
+            request.send_header(header, value)
+        request.send_header("Content-Length", str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+
+def company_slug(name: str) -> str:
+    """Return the LinkedIn slug of a benchmark company name."""
+    return re.sub(r"\W+", "-", name.strip().lower()).strip("-")
+
+
+def company_item(slug: str, index: int) -> dict:
+    """Return a dataset item of the LinkedIn actor with every field set."""
+    return {
+        "name": slug.replace("-", " ").title(),
+        "id": str(index),
+        "websiteUrl": f"https://{slug}.example.com",
+        "url": f"https://www.linkedin.com/company/{slug}",
+        "adsRule": "ALL_MEMBERS",
+        "employeeCount": index % 5000,
+        "active": True,
+        "jobSearchUrl": f"https://www.linkedin.com/jobs/search?f_C={index}",
+        "phone": {"number": "+49 89 123456"},
+        "tagline": "Tagline",
+        "description": "Description " * 40,
+        "logoUrl": f"https://media.licdn.com/{slug}.png",
+        "followerCount": index * 10,
+        "universalName": slug,
+        "specialities": ["Software", "Data"],
+        "headquarter": {"city": "Munich", "country": "DE", "postalCode": "80331"},
+        "industries": [{"name": "Software Development"}],
+        "groupedLocations": [{"localizedName": "Munich"}, {"localizedName": "Berlin"}],
+        "hashtag": [{"displayName": "#data"}],
+        "foundedOn": {"year": 2000, "month": 1, "day": 1},
+    }
+
+
+class FakeGoogle(FakeServer):
+    """Google result pages listing LinkedIn profiles for the queried name.
+
+    ``patch_googlesearch`` points the url templates of googlesearch to the
+    server, so ``googlesearch.search`` fetches its result pages from it.
+    """
+
+    name = "google"
+    # profiles of other companies listed before the matching one
+    DISTRACTORS = 2
+
+    def handle(self, method, path, query, body):
+        """Answer the home page or a result page."""
+        if path != "/search":
+            return HTTP_200, {"Content-Type": "text/html"}, b"<html></html>"
+        text = query.get("q", "")
+        quoted = re.search(r'"([^"]+)"', text)
+        name = quoted.group(1) if quoted else text.removesuffix(" linkedin")
+        slug = company_slug(name)
+        urls = [
+            f"https://www.linkedin.com/company/{slug}-holding-{index}"
+            for index in range(self.DISTRACTORS)
+        ]
+        urls.append(f"https://www.linkedin.com/company/{slug}")
+        if int(query.get("start") or 0) > 0:
+            urls = []
+        anchors = "".join(
+            f'<a href="/url?q={urllib.parse.quote(url)}&amp;sa=U">{url}</a>'
+            for url in urls
+        )
+        html = f'<html><body><div id="search">{anchors}</div></body></html>'
+        return HTTP_200, {"Content-Type": "text/html"}, html.encode()
+
+    def patch_googlesearch(self):
+        """Send the searches of googlesearch to this server."""
+        search = self.url + "/search?hl=%(lang)s&q=%(query)s&tbs=%(tbs)s"
+        googlesearch.url_home = self.url + "/"
+        googlesearch.url_search = search
+        googlesearch.url_next_page = search + "&start=%(start)d"
+        googlesearch.url_search_num = search + "&num=%(num)d"
+        googlesearch.url_next_page_num = search + "&num=%(num)d&start=%(start)d"
+
+
+class FakeApify(FakeServer):
+    """Apify API running the LinkedIn actor on the requested profile urls."""
+
+    name = "apify"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        run_seconds: float = 1.0,
+    ):
+        """Initialize the FakeApify class.
+
+        Every actor run finishes ``run_seconds`` after it was started.
+        """
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.run_seconds = run_seconds
+        self.runs: dict[str, dict] = {}
+        self.datasets: dict[str, list[dict]] = {}
+        self._finish_at: dict[str, float] = {}
+        self._ids = itertools.count()
+
+    def handle(self, method, path, query, body):
+        """Answer the run, abort and dataset endpoints."""
+        parts = path.strip("/").split("/")
+        if method == "POST" and parts[1:2] == ["acts"] and parts[-1] == "runs":
+            return self._start(json.loads(body or b"{}"))
+        if parts[1:2] == ["actor-runs"] and len(parts) >= 3:  # noqa: PLR2004
+            run_id = parts[2]
+            if run_id not in self.runs:
+                return HTTP_404, JSON_HEADERS, b'{"error":{"type":"not-found"}}'
+            if parts[-1] == "abort":
+                self._update(run_id, aborted=True)
+            else:
+                self._wait(run_id, float(query.get("waitForFinish") or 0))
+            return self._json(HTTP_200, {"data": self.runs[run_id]})
+        if parts[1:2] == ["datasets"] and parts[-1] == "items":
+            return self._items(parts[2], query)
+        return HTTP_404, JSON_HEADERS, b'{"error":{"type":"not-found"}}'
+
+    def _start(self, run_input: dict):
+        with self._lock:
+            index = next(self._ids)
+        run_id, dataset_id = f"run{index}", f"dataset{index}"
+        self.datasets[dataset_id] = [
+            company_item(url.rstrip("/").rsplit("/", 1)[-1], position)
+            for position, url in enumerate(run_input.get("urls", []))
+        ]
+        self.runs[run_id] = {
+            "id": run_id,
+            "status": "RUNNING",
+            "defaultDatasetId": dataset_id,
+            "stats": {"runTimeSecs": self.run_seconds},
+        }
+        self._finish_at[run_id] = time.monotonic() + self.run_seconds
+        return self._json(HTTP_201, {"data": self.runs[run_id]})
+
+    def _wait(self, run_id: str, wait_seconds: float):
+        remaining = self._finish_at[run_id] - time.monotonic()
+        if remaining > 0 and self.runs[run_id]["status"] == "RUNNING":
+            time.sleep(min(remaining, wait_seconds))
+        self._update(run_id)
+
+    def _update(self, run_id: str, aborted: bool = False):
+        run = self.runs[run_id]
+        if run["status"] != "RUNNING":
+            return
+        if aborted:
+            run["status"] = "ABORTED"
+        elif time.monotonic() >= self._finish_at[run_id]:
+            run["status"] = "SUCCEEDED"
+
+    def _items(self, dataset_id: str, query: dict[str, str]):
+        items = self.datasets.get(dataset_id, [])
+        offset = int(query.get("offset") or 0)
+        limit = int(query.get("limit") or len(items))
+        page = items[offset : offset + limit]
+        status, headers, content = self._json(HTTP_200, page)
+        headers = {
+            **headers,
+            "x-apify-pagination-total": str(len(items)),
+            "x-apify-pagination-offset": str(offset),
+            "x-apify-pagination-limit": str(limit),
+            "x-apify-pagination-count": str(len(page)),
+            "x-apify-pagination-desc": "",
+        }
+        return status, headers, content
+
+    @staticmethod
+    def _json(status: int, data) -> tuple[int, dict[str, str], bytes]:
+        return status, JSON_HEADERS, json.dumps(data).encode()
+
+
+class FakeAnalytics(FakeServer):
+    """Analytics backend accepting measurements, raw data and finished crawls."""
+
+    name = "analytics"
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        """Initialize the FakeAnalytics class."""
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+        self.fed_records = 0
+        self.reported_errors = 0
+        self._measurement_ids = itertools.count(1)
+
+    def handle(self, method, path, query, body):
+        """Answer the measurement, feed and crawling finished endpoints."""
+        data = json.loads(body or b"null")
+        if path == "/source-measurement":
+            result = {"id": next(self._measurement_ids)}
+        elif path == "/source-measurement/bulk":
+            result = [{"id": next(self._measurement_ids)} for _ in data]
+        elif path in ("/feed-raw-data", "/feed-raw-data/bulk"):
+            with self._lock:
+                self.fed_records += len(data) if isinstance(data, list) else 1
+            result = {}
+        elif path == "/crawling-finished":
+            with self._lock:
+                self.reported_errors += len(data.get("errors") or {})
+            result = {}
+        else:
+            return HTTP_404, JSON_HEADERS, b'{"detail":"Not Found"}'
+        return HTTP_201, JSON_HEADERS, json.dumps(result).encode()
+
+    def stats(self) -> dict[str, int]:
+        """Return the request counters and the records fed."""
+        return {
+            **super().stats(),
+            "fed_records": self.fed_records,
+            "reported_errors": self.reported_errors,
+        }
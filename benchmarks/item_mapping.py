@@ -0,0 +1,120 @@
+"""Microbenchmark of the mapping of Apify dataset items to company fields.
+
+Maps a synthetic dataset of 10k items with the field extractors of the item map
+and with the conditional expression chain it replaced, and prints the throughput
+of both.
+
+Run it from the repository root with ``python -m benchmarks.item_mapping [items]``.
+"""
+import sys
+import timeit
+
+from parma_mining.linkedin.item_mapping import map_item, map_items
+
+
+def legacy_parse_company_item(item: dict) -> dict:
+    """Map an item like ``LinkedinClient.parse_company_item`` did before."""
+    return {
+        "name": item["name"] if "name" in item else None,
+        "linkedin_id": item["id"] if "id" in item else None,
+        "website": item["websiteUrl"] if "websiteUrl" in item else None,
+        "profile_url": item["url"] if "url" in item else None,
+        "ads_rule": item["adsRule"] if "adsRule" in item else None,
+        "employee_count": item["employeeCount"] if "employeeCount" in item else None,
+        "active": item["active"] if "active" in item else None,
+        "job_search_url": item["jobSearchUrl"] if "jobSearchUrl" in item else None,
+        "phone": item["phone"]["number"] if item["phone"] is not None else None,
+        "tagline": item["tagline"] if "tagline" in item else None,
+        "description": item["description"] if "description" in item else None,
+        "logo_url": item["logoUrl"] if "logoUrl" in item else None,
+        "follower_count": item["followerCount"] if "followerCount" in item else None,
+        "universal_name": item["universalName"] if "universalName" in item else None,
+        "specialities": item["specialities"] if "specialities" in item else None,
+        "headquarter_city": item["headquarter"]["city"]
+        if "headquarter" in item
+        else None,
+        "headquarter_country": item["headquarter"]["country"]
+        if "headquarter" in item
+        else None,
+        "head_quarter_postal_code": item["headquarter"]["postalCode"]
+        if "headquarter" in item
+        else None,
+        "industries": [industry["name"] for industry in item["industries"]]
+        if item["industries"] is not None
+        else None,
+        "locations": [
+            location["localizedName"] for location in item["groupedLocations"]
+        ]
+        if item["groupedLocations"] is not None
+        else None,
+        "hashtags": [hashtag["displayName"] for hashtag in item["hashtag"]]
+        if item["hashtag"] is not None
+        else None,
+        "founded_year": item["foundedOn"]["year"]
+        if item["foundedOn"] is not None
+        else None,
+        "founded_month": item["foundedOn"]["month"]
+        if item["foundedOn"] is not None
+        else None,
+        "founded_day": item["foundedOn"]["day"]
+        if item["foundedOn"] is not None
+        else None,
+    }
+
+
+def dataset(size: int) -> list[dict]:
+    """Return ``size`` dataset items with every field set."""
+    return [
+        {
+            "name": f"Company {index}",
+            "id": str(index),
+            "websiteUrl": f"https://company{index}.com",
+            "url": f"https://www.linkedin.com/company/company{index}",
+            "adsRule": "ALL_MEMBERS",
+            "employeeCount": index,
+            "active": True,
+            "jobSearchUrl": f"https://www.linkedin.com/jobs/search?f_C={index}",
+            "phone": {"number": "+49 89 123456"},
+            "tagline": "Tagline",
+            "description": "Description " * 20,
+            "logoUrl": f"https://media.licdn.com/{index}.png",
+            "followerCount": index * 10,
+            "universalName": f"company{index}",
+            "specialities": ["Software", "Data"],
+            "headquarter": {"city": "Munich", "country": "DE", "postalCode": "80331"},
+            "industries": [{"name": "Software Development"}],
+            "groupedLocations": [
+                {"localizedName": "Munich"},
+                {"localizedName": "Berlin"},
+            ],
+            "hashtag": [{"displayName": "#data"}],
+            "foundedOn": {"year": 2000, "month": 1, "day": 1},
+        }
+        for index in range(size)
+    ]
+
+
+def main(size: int = 10_000, repeat: int = 20):
+    """Print the items mapped per second by each implementation."""
+    items = dataset(size)
+    assert [legacy_parse_company_item(item) for item in items] == map_items(items)
+
+    candidates = {
+        "legacy": lambda: [legacy_parse_company_item(item) for item in items],
+        "extractors per item": lambda: [map_item(item) for item in items],
+        "extractors batch": lambda: map_items(items),
+    }
+    results = {
+        name: min(timeit.repeat(run, number=1, repeat=repeat))
+        for name, run in candidates.items()
+    }
+    for name, seconds in results.items():
+        speedup = results["legacy"] / seconds
+        print(
+            f"{name:>19}: {size / seconds:>12,.0f} items/s "
+            f"({seconds * 1000:.1f} ms, {speedup:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
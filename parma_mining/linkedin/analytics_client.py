@@ -2,17 +2,33 @@
 
 This module sends normalization data and raw data to analytics.
 """
-import json
+import asyncio
+import importlib.util
 import logging
 import os
 import urllib.parse
 
 import httpx
 from dotenv import load_dotenv
+from pydantic_core import to_json
 
 from parma_mining.linkedin.model import ResponseModel
-from parma_mining.mining_common.const import HTTP_200, HTTP_201
+from parma_mining.mining_common.const import (
+    HTTP_200,
+    HTTP_201,
+    HTTP_404,
+    HTTP_405,
+    HTTP_501,
+)
 from parma_mining.mining_common.exceptions import AnalyticsError
+from parma_mining.mining_common.metrics import (
+    STAGE_CRAWLING_FINISHED,
+    STAGE_FEED_RAW_DATA,
+    STAGE_REGISTER_MEASUREMENTS,
+    observe,
+    record_error,
+)
+from parma_mining.mining_common.rate_control import RateControl
 
 logger = logging.getLogger(__name__)
 
@@ -24,18 +40,136 @@ class AnalyticsClient:
     analytics_base = str(os.getenv("ANALYTICS_BASE_URL") or "")
 
     measurement_url = urllib.parse.urljoin(analytics_base, "/source-measurement")
+    measurement_bulk_url = urllib.parse.urljoin(
+        analytics_base, "/source-measurement/bulk"
+    )
     feed_raw_url = urllib.parse.urljoin(analytics_base, "/feed-raw-data")
+    feed_raw_bulk_url = urllib.parse.urljoin(analytics_base, "/feed-raw-data/bulk")
     crawling_finished_url = urllib.parse.urljoin(analytics_base, "/crawling-finished")
 
-    def send_post_request(self, token: str, api_endpoint, data):
-        """Send a POST request to the given API endpoint with the given data."""
+    # status codes telling that the backend has no bulk endpoint
+    BULK_UNSUPPORTED_STATUS_CODES = (HTTP_404, HTTP_405, HTTP_501)
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        base_url: str | None = None,
+        rate_control: RateControl | None = None,
+    ):
+        """Initialize the AnalyticsClient class.
+
+        Requests are sent through a long-lived connection pool, which keeps
+        connections to analytics alive between requests and uses HTTP/2 if the
+        ``h2`` package is installed. The pool also bounds the number of concurrent
+        requests to ``ANALYTICS_MAX_CONNECTIONS``; further requests wait for a free
+        connection. ``transport`` replaces the network transport, e.g. by a stub of
+        the analytics backend, which can be addressed by ``base_url`` instead of
+        ``ANALYTICS_BASE_URL``. Requests are paced by the analytics upstream of
+        ``rate_control``.
+        """
+        if base_url is not None:
+            self.analytics_base = base_url
+            self.measurement_url = urllib.parse.urljoin(base_url, "/source-measurement")
+            self.measurement_bulk_url = urllib.parse.urljoin(
+                base_url, "/source-measurement/bulk"
+            )
+            self.feed_raw_url = urllib.parse.urljoin(base_url, "/feed-raw-data")
+            self.feed_raw_bulk_url = urllib.parse.urljoin(
+                base_url, "/feed-raw-data/bulk"
+            )
+            self.crawling_finished_url = urllib.parse.urljoin(
+                base_url, "/crawling-finished"
+            )
+        self.rate_control = rate_control or RateControl()
+        self.upstream = self.rate_control.upstream("analytics")
+        # unknown until the first bulk request has been answered
+        self.bulk_supported: bool | None = None
+        self.bulk_registration_supported: bool | None = None
+        self.registration_concurrency = int(
+            os.getenv("ANALYTICS_REGISTRATION_CONCURRENCY") or 8
+        )
+        # registered measurements and mappings by source module and parent id
+        self._registrations: dict[tuple, tuple[list[dict], dict]] = {}
+        self._registration_lock = asyncio.Lock()
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("ANALYTICS_MAX_CONNECTIONS") or 20),
+            max_keepalive_connections=int(
+                os.getenv("ANALYTICS_MAX_KEEPALIVE_CONNECTIONS") or 10
+            ),
+            keepalive_expiry=float(os.getenv("ANALYTICS_KEEPALIVE_SECONDS") or 30),
+        )
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._transport = transport
+        self._http_client: httpx.AsyncClient | None = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Return the connection pool of the client.
+
+        The pool is created on first use, so it binds to the running event loop.
+        """
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=120,
+                transport=self._transport,
+            )
+        return self._http_client
+
+    async def aclose(self):
+        """Close the connection pool of the client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    @staticmethod
+    def _headers(token: str, idempotency_key: str | None = None) -> dict[str, str]:
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
         }
+        if idempotency_key is not None:
+            # lets analytics drop a request it has processed before
+            headers["Idempotency-Key"] = idempotency_key
+        return headers
 
-        response = httpx.post(api_endpoint, json=data, headers=headers, timeout=120)
+    async def _post(
+        self, token: str, api_endpoint, data, idempotency_key: str | None = None
+    ) -> httpx.Response:
+        # models are serialized straight to the request body, without an
+        # intermediate dict; values JSON has no type for are sent as strings
+        content = to_json(data, fallback=str)
+        await self.upstream.acquire_async()
+        try:
+            response = await self.http_client.post(
+                api_endpoint,
+                content=content,
+                headers=self._headers(token, idempotency_key),
+            )
+        except httpx.HTTPError:
+            self.upstream.record_failure()
+            raise
+        except BaseException:
+            self.upstream.record_cancelled()
+            raise
+        self.upstream.record_status(response.status_code)
+        return response
+
+    async def send_post_request(
+        self, token: str, api_endpoint, data, idempotency_key: str | None = None
+    ):
+        """Send a POST request to the given API endpoint with the given data.
 
+        ``data`` may be any JSON serializable value, including pydantic models. An
+        ``idempotency_key`` is sent in the ``Idempotency-Key`` header.
+        """
+        return self._handle_response(
+            await self._post(token, api_endpoint, data, idempotency_key)
+        )
+
+    @staticmethod
+    def _handle_response(response: httpx.Response):
         if response.status_code in [HTTP_200, HTTP_201]:
             return response.json()
         else:
@@ -48,60 +182,291 @@ class AnalyticsClient:
                 f"response: {response.text}"
             )
 
-    def register_measurements(
+    async def register_measurements(
         self, token: str, mapping, parent_id=None, source_module_id=None
     ):
-        """Register the given mapping as a measurement."""
-        result = []
+        """Register the given mapping as a measurement.
 
-        for field_mapping in mapping["Mappings"]:
-            measurement_data = {
-                "source_module_id": source_module_id,
-                "type": field_mapping["DataType"],
-                "measurement_name": field_mapping["MeasurementName"],
-            }
-
-            if parent_id is not None:
-                measurement_data["parent_measurement_id"] = parent_id
-            else:
-                logger.debug(
-                    f"No parent id provided for "
-                    f"measurement {measurement_data['measurement_name']}"
-                )
+        Measurements are registered level by level, so every parent is registered
+        before its nested measurements, while the measurements of one level are
+        sent in a single bulk request or, without bulk support, concurrently. The
+        result is memoized per source module, so registering the same module again
+        costs no requests.
+        """
+        memo_key = (source_module_id, parent_id)
+        with observe(STAGE_REGISTER_MEASUREMENTS):
+            async with self._registration_lock:
+                if memo_key in self._registrations:
+                    logger.debug(
+                        f"Measurements of {source_module_id} already registered"
+                    )
+                    return self._registrations[memo_key]
+
+                measurements: dict[int, dict] = {}
+                level = [
+                    (field_mapping, parent_id) for field_mapping in mapping["Mappings"]
+                ]
+                while level:
+                    level_data = [
+                        self._measurement_data(
+                            field_mapping, level_parent_id, source_module_id
+                        )
+                        for field_mapping, level_parent_id in level
+                    ]
+                    ids = await self._register_level(token, level_data)
 
-            response = self.send_post_request(
-                token, self.measurement_url, measurement_data
+                    next_level = []
+                    for (field_mapping, _), measurement_data, measurement_id in zip(
+                        level, level_data, ids, strict=True
+                    ):
+                        measurement_data["source_measurement_id"] = measurement_id
+                        # add the source measurement id to mapping
+                        field_mapping["source_measurement_id"] = measurement_id
+                        measurements[id(field_mapping)] = measurement_data
+                        next_level.extend(
+                            (nested_mapping, measurement_id)
+                            for nested_mapping in field_mapping.get(
+                                "NestedMappings", []
+                            )
+                        )
+                    level = next_level
+
+                result = self._ordered_measurements(mapping["Mappings"], measurements)
+                self._registrations[memo_key] = (result, mapping)
+                return result, mapping
+
+    @staticmethod
+    def _measurement_data(field_mapping: dict, parent_id, source_module_id) -> dict:
+        measurement_data = {
+            "source_module_id": source_module_id,
+            "type": field_mapping["DataType"],
+            "measurement_name": field_mapping["MeasurementName"],
+        }
+
+        if parent_id is not None:
+            measurement_data["parent_measurement_id"] = parent_id
+        else:
+            logger.debug(
+                f"No parent id provided for "
+                f"measurement {measurement_data['measurement_name']}"
             )
-            measurement_data["source_measurement_id"] = response.get("id")
+        return measurement_data
+
+    async def _register_level(self, token: str, level_data: list[dict]) -> list:
+        if len(level_data) > 1 and self.bulk_registration_supported is not False:
+            response = await self._post(token, self.measurement_bulk_url, level_data)
+            if response.status_code not in self.BULK_UNSUPPORTED_STATUS_CODES:
+                self.bulk_registration_supported = True
+                registered = self._handle_response(response)
+                if len(registered) != len(level_data):
+                    raise AnalyticsError(
+                        f"Bulk registration returned {len(registered)} measurements "
+                        f"for {len(level_data)} requested ones"
+                    )
+                return [measurement.get("id") for measurement in registered]
+            logger.info("Analytics has no bulk registration, registering concurrently")
+            self.bulk_registration_supported = False
+
+        semaphore = asyncio.Semaphore(self.registration_concurrency)
+
+        async def register(measurement_data: dict):
+            async with semaphore:
+                return await self.send_post_request(
+                    token, self.measurement_url, measurement_data
+                )
 
-            # add the source measurement id to mapping
-            field_mapping["source_measurement_id"] = measurement_data[
-                "source_measurement_id"
-            ]
+        responses = await asyncio.gather(*map(register, level_data))
+        return [response.get("id") for response in responses]
 
+    @classmethod
+    def _ordered_measurements(
+        cls, mappings: list[dict], measurements: dict[int, dict]
+    ) -> list[dict]:
+        # nested measurements precede their parent, as in the mapping traversal
+        result = []
+        for field_mapping in mappings:
             if "NestedMappings" in field_mapping:
-                nested_measurements = self.register_measurements(
-                    token,
-                    {"Mappings": field_mapping["NestedMappings"]},
-                    parent_id=measurement_data["source_measurement_id"],
-                    source_module_id=source_module_id,
-                )[0]
-                result.extend(nested_measurements)
-            result.append(measurement_data)
-        return result, mapping
-
-    def feed_raw_data(self, token: str, input_data: ResponseModel):
+                result.extend(
+                    cls._ordered_measurements(
+                        field_mapping["NestedMappings"], measurements
+                    )
+                )
+            result.append(measurements[id(field_mapping)])
+        return result
+
+    async def feed_raw_data(
+        self,
+        token: str,
+        input_data: ResponseModel,
+        idempotency_key: str | None = None,
+    ):
         """Feed the raw data to the analytics service."""
-        organization_json = json.loads(input_data.raw_data.updated_model_dump())
+        return await self.send_post_request(
+            token, self.feed_raw_url, input_data, idempotency_key
+        )
 
-        data = {
-            "source_name": input_data.source_name,
-            "company_id": input_data.company_id,
-            "raw_data": organization_json,
-        }
+    async def feed_raw_data_batch(
+        self,
+        token: str,
+        input_data: list[ResponseModel],
+        idempotency_keys: list[str] | None = None,
+    ) -> dict[str, AnalyticsError]:
+        """Feed several raw data records to the analytics service at once.
+
+        The records are sent as one JSON array to the bulk endpoint. If the backend
+        does not provide it, every record is sent on its own and the bulk endpoint
+        is not tried again. With ``idempotency_keys``, one per record, every record
+        carries its key: in the ``idempotency_key`` field of its array element on
+        the bulk endpoint, and in the ``Idempotency-Key`` header when sent on its
+        own. Analytics can thus recognize a record fed again after a restart,
+        whichever batch it ends up in.
+
+        Returns:
+            The errors of the records that could not be fed, by company id.
+        """
+        if not input_data:
+            return {}
+        with observe(STAGE_FEED_RAW_DATA):
+            errors = await self._feed_raw_data_batch(
+                token, input_data, idempotency_keys
+            )
+        for error in errors.values():
+            record_error(STAGE_FEED_RAW_DATA, error)
+        return errors
+
+    async def _feed_raw_data_batch(
+        self,
+        token: str,
+        input_data: list[ResponseModel],
+        idempotency_keys: list[str] | None,
+    ) -> dict[str, AnalyticsError]:
+        keys = idempotency_keys or [None] * len(input_data)
+        if self.bulk_supported is not False:
+            payload = (
+                # shallow copies, the nested models are serialized as they are
+                [
+                    {**dict(data), "idempotency_key": key}
+                    for data, key in zip(input_data, idempotency_keys, strict=True)
+                ]
+                if idempotency_keys
+                else input_data
+            )
+            response = await self._post(token, self.feed_raw_bulk_url, payload)
+            if response.status_code not in self.BULK_UNSUPPORTED_STATUS_CODES:
+                self.bulk_supported = True
+                try:
+                    self._handle_response(response)
+                    return {}
+                except AnalyticsError as e:
+                    return {data.company_id: e for data in input_data}
+            logger.info("Analytics has no bulk endpoint, feeding records one by one")
+            self.bulk_supported = False
 
-        return self.send_post_request(token, self.feed_raw_url, data)
+        errors = {}
+        for data, key in zip(input_data, keys, strict=True):
+            try:
+                await self.feed_raw_data(token, data, key)
+            except AnalyticsError as e:
+                errors[data.company_id] = e
+        return errors
 
-    def crawling_finished(self, token, data):
+    async def crawling_finished(self, token, data):
         """Notify crawling is finished to the analytics."""
-        return self.send_post_request(token, self.crawling_finished_url, data)
+        with observe(STAGE_CRAWLING_FINISHED):
+            return await self.send_post_request(token, self.crawling_finished_url, data)
+
+
+class RawDataSink:
+    """Buffer raw data records and feed them to analytics in batches.
+
+    A batch is sent as soon as ``max_batch_size`` records are buffered or the
+    oldest buffered record has waited ``max_delay_seconds``. Records that could
+    not be fed are collected in ``errors`` by company id. Records added with an
+    idempotency key are fed with it, and ``sent`` is called with the keys of every
+    batch sent.
+    """
+
+    def __init__(
+        self,
+        client: AnalyticsClient,
+        token: str,
+        max_batch_size: int | None = None,
+        max_delay_seconds: float | None = None,
+    ):
+        """Initialize the RawDataSink class."""
+        self.client = client
+        self.token = token
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("ANALYTICS_FEED_BATCH_SIZE") or 50
+        )
+        self.max_delay_seconds = max_delay_seconds or float(
+            os.getenv("ANALYTICS_FEED_MAX_DELAY_SECONDS") or 5
+        )
+        self.errors: dict[str, AnalyticsError] = {}
+        self._buffer: list[ResponseModel] = []
+        self._keys: list[str | None] = []
+        self._timer: asyncio.Task | None = None
+        # timed flushes, which may still be sending their batch
+        self._timed_flushes: set[asyncio.Task] = set()
+
+    async def add(self, data: ResponseModel, key: str | None = None):
+        """Buffer a record, sending the batch once it is full."""
+        self._buffer.append(data)
+        self._keys.append(key)
+        if len(self._buffer) < self.max_batch_size:
+            if self._timer is None:
+                self._timer = asyncio.create_task(self._flush_later())
+                self._timed_flushes.add(self._timer)
+                self._timer.add_done_callback(self._timed_flushes.discard)
+            return
+        await self._send(*self._take())
+
+    async def flush(self):
+        """Send all buffered records."""
+        await self._send(*self._take())
+
+    async def close(self):
+        """Send the remaining records and wait for batches still being sent.
+
+        The sink may still be used afterwards.
+        """
+        await self.flush()
+        if self._timed_flushes:
+            await asyncio.wait(self._timed_flushes)
+
+    def sent(self, keys: list[str | None], errors: dict[str, AnalyticsError]):
+        """Handle the result of a batch, given the keys of its records.
+
+        Does nothing, subclasses override it to track the records fed.
+        """
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay_seconds)
+        # the timer has fired, so taking the batch must not cancel this task
+        self._timer = None
+        await self.flush()
+
+    def _take(self) -> tuple[list[ResponseModel], list[str | None]]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._buffer = self._buffer, []
+        keys, self._keys = self._keys, []
+        return batch, keys
+
+    async def _send(self, batch: list[ResponseModel], keys: list[str | None]):
+        if not batch:
+            return
+        try:
+            errors = await self.client.feed_raw_data_batch(
+                self.token, batch, None if None in keys else keys
+            )
+        except Exception as e:
+            errors = {data.company_id: AnalyticsError(str(e)) for data in batch}
+        for company_id, error in errors.items():
+            logger.error(
+                f"Can't send crawling data of {company_id} to the Analytics. "
+                f"Error: {error}"
+            )
+        self.errors.update(errors)
+        self.sent(keys, errors)
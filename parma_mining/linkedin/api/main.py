@@ -1,29 +1,66 @@
 """Main entrypoint for the API routes in of parma-analytics."""
+import asyncio
 import json
 import logging
+import math
 import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 
-from fastapi import Depends, FastAPI, status
+from fastapi import Depends, FastAPI, HTTPException, Header, Response, status
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic_core import to_json
 
 from parma_mining.linkedin.analytics_client import AnalyticsClient
 from parma_mining.linkedin.api.dependencies.auth import authenticate
 from parma_mining.linkedin.client import LinkedinClient
+from parma_mining.linkedin.crawl_queue import (
+    ITEM_SCRAPED,
+    CrawlQueue,
+    QueueFeedSink,
+    QueueItem,
+    QueuedTask,
+)
+from parma_mining.linkedin.discovery import DiscoveryEngine
+from parma_mining.linkedin.discovery_cache import DiscoveryCache
+from parma_mining.linkedin.feed_snapshots import DeltaFeed, FeedSnapshotStore
+from parma_mining.linkedin.jobs import Job, JobManager
 from parma_mining.linkedin.model import (
     CompaniesRequest,
+    CompanyModel,
     CrawlingFinishedInputModel,
     DiscoveryRequest,
+    DiscoveryResponse,
     ErrorInfoModel,
     FinalDiscoveryResponse,
+    JobModel,
     ResponseModel,
 )
 from parma_mining.linkedin.normalization_map import LinkedinNormalizationMap
+from parma_mining.linkedin.scheduler import TaskScheduler
+from parma_mining.linkedin.scrape_cache import ScrapeCache
+from parma_mining.mining_common.const import (
+    DISCOVERY_VALIDITY_DAYS,
+    NDJSON_MEDIA_TYPE,
+)
 from parma_mining.mining_common.exceptions import (
-    AnalyticsError,
     ClientInvalidBodyError,
     CrawlingError,
 )
 from parma_mining.mining_common.helper import collect_errors
+from parma_mining.mining_common.jwt_handler import JWTHandler
+from parma_mining.mining_common.metrics import (
+    CRAWLS_IN_FLIGHT,
+    ERRORS,
+    STAGE_CRAWL_COMPANIES,
+    observe,
+)
+from parma_mining.mining_common.rate_control import RateControl
+from parma_mining.mining_common.shared_state import shared_state_from_env
+from parma_mining.mining_common.single_flight import Flight, SingleFlight
 
 env = os.getenv("DEPLOYMENT_ENV", "local")
 
@@ -38,29 +75,126 @@ else:
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+# "inline" crawls the tasks in the API process, "queue" leaves them to workers
+CRAWL_MODE_INLINE = "inline"
+CRAWL_MODE_QUEUE = "queue"
+crawl_mode = os.getenv("CRAWL_MODE") or CRAWL_MODE_INLINE
 
-analytics_client = AnalyticsClient()
+shared_state = shared_state_from_env()
+# the caches and jobs only need a second tier if it is shared with other processes
+remote_state = shared_state if shared_state.remote else None
+rate_control = RateControl(state=shared_state)
+analytics_client = AnalyticsClient(rate_control=rate_control)
 normalization = LinkedinNormalizationMap()
-linkedin_client = LinkedinClient()
+discovery_cache = DiscoveryCache.from_env(shared=remote_state)
+feed_snapshots = FeedSnapshotStore.from_env()
+linkedin_client = LinkedinClient(
+    scrape_cache=ScrapeCache.from_env(shared=remote_state), rate_control=rate_control
+)
+job_manager = JobManager(state=remote_state)
+discovery_engine = DiscoveryEngine(cache=discovery_cache)
+crawl_queue = CrawlQueue.from_env()
+scheduler = TaskScheduler.from_env(linkedin_client.run_manager.max_concurrent_runs)
+# profiles being scraped by the tasks of this process, by their handle
+scrapes = SingleFlight()
+
+
+def check_crawl_mode():
+    """Check that the workers can see the tasks queued in queue mode.
+
+    The API and the workers share the crawl queue through the SQLite database at
+    ``CRAWL_QUEUE_PATH``, so they have to run on the same host, and the job states
+    through ``SHARED_STATE_URL``.
+
+    Raises:
+        RuntimeError: If ``CRAWL_MODE`` is ``queue`` but either is not set.
+    """
+    if crawl_mode != CRAWL_MODE_QUEUE:
+        return
+    missing = [
+        name
+        for name, configured in (
+            ("CRAWL_QUEUE_PATH", crawl_queue.persistent),
+            ("SHARED_STATE_URL", shared_state.remote),
+        )
+        if not configured
+    ]
+    if missing:
+        raise RuntimeError(
+            f"CRAWL_MODE={CRAWL_MODE_QUEUE} needs {' and '.join(missing)}, "
+            "otherwise the queued tasks are never seen by the workers"
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Resume unfinished crawling tasks on startup and release them on shutdown.
+
+    Tasks left unfinished by a previous process are resumed as background jobs,
+    unless the tasks are crawled by workers. Tasks still running at shutdown stay
+    unfinished, so they are resumed after the restart, provided
+    ``CRAWL_QUEUE_PATH`` keeps the queue on disk.
+    """
+    check_crawl_mode()
+    leases = asyncio.create_task(crawl_queue.keep_leases())
+    if crawl_mode != CRAWL_MODE_QUEUE:
+        for task in crawl_queue.unfinished_tasks():
+            logger.info(f"Resuming the unfinished task {task.task_id}")
+            job_manager.submit(task.task_id, lambda job, task=task: run_task(task, job))
+    yield
+    leases.cancel()
+    await job_manager.shutdown(wait=False)
+    discovery_engine.shutdown()
+    await analytics_client.aclose()
+    await linkedin_client.aclose()
+    shared_state.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/", status_code=status.HTTP_200_OK)
-def root():
+async def root():
     """Root endpoint for the API."""
     logger.debug("Root endpoint called")
     return {"welcome": "at parma-mining-linkedin"}
 
 
+@app.get("/stats", status_code=status.HTTP_200_OK)
+async def stats():
+    """Endpoint reporting the counters of the caches, rate limits and actor runs."""
+    scrape_cache = linkedin_client.scrape_cache
+    return {
+        "discovery_cache": discovery_cache.stats() if discovery_cache else None,
+        "scrape_cache": scrape_cache.stats() if scrape_cache else None,
+        "token_cache": JWTHandler.token_cache.stats(),
+        "rate_control": rate_control.state(),
+        "apify_runs": linkedin_client.run_manager.stats(),
+        "feed_snapshots": feed_snapshots.stats() if feed_snapshots else None,
+        "crawl_queue": crawl_queue.stats(),
+        "shared_state": shared_state.stats(),
+        "scheduler": scheduler.stats(),
+        "single_flight": scrapes.stats(),
+    }
+
+
+@app.get("/metrics", status_code=status.HTTP_200_OK)
+async def metrics():
+    """Endpoint exposing the metrics in the Prometheus text format."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/initialize", status_code=200)
-def initialize(source_id: int, token: str = Depends(authenticate)) -> str:
+async def initialize(source_id: int, token: str = Depends(authenticate)) -> str:
     """Initialization endpoint for the API."""
     # init frequency
     time = "weekly"
     normalization_map = normalization.get_normalization_map()
     # register the measurements to analytics
-    normalization_map = analytics_client.register_measurements(
-        token, normalization_map, source_module_id=source_id
+    normalization_map = (
+        await analytics_client.register_measurements(
+            token, normalization_map, source_module_id=source_id
+        )
     )[1]
 
     # set and return results
@@ -70,81 +204,449 @@ def initialize(source_id: int, token: str = Depends(authenticate)) -> str:
     return json.dumps(results)
 
 
-@app.post(
-    "/companies",
-    status_code=status.HTTP_200_OK,
-)
-def get_company_info(body: CompaniesRequest, token: str = Depends(authenticate)):
-    """Endpoint to get detailed information about a dict of organizations."""
-    errors: dict[str, ErrorInfoModel] = {}
+def collect_company_urls(
+    body: CompaniesRequest, errors: dict[str, ErrorInfoModel]
+) -> tuple[list[str], dict[str, list[str]]]:
+    """Collect the LinkedIn urls of a request.
+
+    Returns the canonical urls to scrape and the company ids belonging to the
+    handle of each url, so every profile is scraped once however often and in
+    whichever form the request lists it. Handles with an unsupported data type are
+    recorded in ``errors``.
+    """
+    urls: list[str] = []
+    companies_by_handle: dict[str, list[str]] = {}
     for company_id, company_data in body.companies.items():
         for data_type, handles in company_data.items():
             for handle in handles:
-                if data_type == "urls":
-                    try:
-                        if "linkedin.com/" in handle:
-                            org_details = linkedin_client.get_company_details([handle])
-                        else:
-                            logger.error(f"Not a valid Linkedin url: {handle}")
-                    except CrawlingError as e:
-                        logger.error(
-                            f"Can't fetch company details from Linkedin Error: {e}"
-                        )
-                        collect_errors(company_id, errors, e)
-                        continue
-
-                    data = ResponseModel(
-                        source_name="linkedin",
-                        company_id=company_id,
-                        raw_data=org_details,
-                    )
-                    # Write data to db via endpoint in analytics backend
-                    try:
-                        analytics_client.feed_raw_data(token, data)
-                    except AnalyticsError as e:
-                        logger.error(
-                            f"Can't send crawling data to the Analytics. Error: {e}"
-                        )
-                        collect_errors(company_id, errors, e)
-
-                else:
+                if data_type != "urls":
                     msg = f"Unsupported type error for {data_type} in {handle}"
                     logger.error(msg)
                     collect_errors(company_id, errors, ClientInvalidBodyError(msg))
+                elif "linkedin.com/" not in handle.lower():
+                    logger.error(f"Not a valid Linkedin url: {handle}")
+                else:
+                    key = LinkedinClient.company_handle(handle)
+                    if key not in companies_by_handle:
+                        companies_by_handle[key] = []
+                        urls.append(LinkedinClient.canonical_url(handle))
+                    if company_id not in companies_by_handle[key]:
+                        companies_by_handle[key].append(company_id)
+    return urls, companies_by_handle
+
+
+async def feed_company(
+    sink: QueueFeedSink,
+    company_ids: list[str],
+    handle: str,
+    org_details: CompanyModel,
+    delta: DeltaFeed | None = None,
+):
+    """Feed the scraped details of a company to analytics for each of its ids.
+
+    With ``delta`` only the fields changed since the last feed of a company id from
+    the same handle are fed, and nothing if none changed.
+    """
+    for company_id in company_ids:
+        raw_data = (
+            delta.raw_data(company_id, handle, org_details)
+            if delta is not None
+            else org_details
+        )
+        if raw_data is None:
+            logger.debug(f"Company {company_id} is unchanged, skipping the feed")
+            sink.skip_item(company_id, handle)
+            continue
+        data = ResponseModel.model_construct(
+            source_name="linkedin",
+            company_id=company_id,
+            raw_data=raw_data,
+        )
+        # Write data to db via endpoint in analytics backend
+        await sink.add_item(data, handle)
+
+
+async def scrape_profiles(
+    task_id: int, urls: list[str], run_id: str | None = None
+) -> AsyncIterator[tuple[str, CompanyModel]]:
+    """Scrape the profiles of a task and yield each company with its handle.
+
+    The profiles are marked as scraped or failed in the queue, and their result is
+    shared with the tasks waiting for them.
+    """
+    if not urls:
+        return
+    handles = [LinkedinClient.company_handle(url) for url in urls]
+    pending = set(handles)
+    try:
+        async for scraped in linkedin_client.iter_company_details(
+            urls,
+            run_id=run_id,
+            on_run_started=lambda started: crawl_queue.set_run(
+                task_id, handles, started
+            ),
+        ):
+            key = (
+                LinkedinClient.company_handle(scraped.source_url)
+                if scraped.source_url is not None
+                else None
+            )
+            if key not in pending:
+                logger.warning(
+                    f"Scraped company {scraped.company.universal_name} "
+                    "matches no pending url"
+                )
+                continue
+            pending.discard(key)
+            crawl_queue.mark_scraped(task_id, key, to_json(scraped.company).decode())
+            scrapes.resolve(key, scraped.company)
+            yield key, scraped.company
+    except CrawlingError as e:
+        logger.error(f"Can't fetch company details from Linkedin Error: {e}")
+        crawl_queue.mark_failed(task_id, [(None, key) for key in pending], e)
+        for key in pending:
+            scrapes.fail(key, e)
+        return
+
+    for key in pending:
+        msg = f"No company details scraped for {key}"
+        logger.error(msg)
+        crawl_queue.mark_failed(task_id, [(None, key)], CrawlingError(msg))
+        scrapes.fail(key, CrawlingError(msg))
+
+
+async def feed_joined(
+    task_id: int,
+    joined: dict[str, Flight],
+    companies_by_handle: dict[str, list[str]],
+    sink: QueueFeedSink,
+    delta: DeltaFeed | None = None,
+) -> list[str]:
+    """Feed the profiles another task has scraped meanwhile.
+
+    Returns the handles the other task gave up on, which are left to scrape.
+    """
+    abandoned = []
+    for key, flight in joined.items():
+        await flight.wait()
+        if flight.abandoned:
+            abandoned.append(key)
+        elif flight.error is not None:
+            crawl_queue.mark_failed(task_id, [(None, key)], flight.error)
+        else:
+            crawl_queue.mark_scraped(task_id, key, to_json(flight.result).decode())
+            await feed_company(
+                sink, companies_by_handle[key], key, flight.result, delta
+            )
+    return abandoned
+
+
+async def crawl_chunk(
+    task_id: int,
+    items: list[QueueItem],
+    sink: QueueFeedSink,
+    delta: DeltaFeed | None = None,
+):
+    """Scrape the claimed items of a task and feed the results.
+
+    Profiles scraped before a restart are fed from the queue. The others are
+    scraped within one actor run, or within the run started for them before a
+    restart if it still exists. Profiles another task is scraping at the same
+    time are not scraped again; the task waits for their result instead.
+    """
+    companies_by_handle: dict[str, list[str]] = {}
+    urls_by_handle: dict[str, str] = {}
+    handles_by_run: dict[str | None, list[str]] = {}
+    for item in items:
+        if item.state == ITEM_SCRAPED:
+            company = CompanyModel.model_validate_json(item.data or "{}")
+            await feed_company(sink, [item.company_id], item.handle, company, delta)
+            continue
+        if item.handle not in urls_by_handle:
+            urls_by_handle[item.handle] = item.url
+            handles_by_run.setdefault(item.run_id, []).append(item.handle)
+        companies_by_handle.setdefault(item.handle, []).append(item.company_id)
+
+    for run_id, run_handles in handles_by_run.items():
+        handles = run_handles
+        while handles:
+            handles, joined = scrapes.lead_or_join(handles)
+            try:
+                async for key, company in scrape_profiles(
+                    task_id, [urls_by_handle[handle] for handle in handles], run_id
+                ):
+                    await feed_company(
+                        sink, companies_by_handle[key], key, company, delta
+                    )
+            finally:
+                scrapes.abandon(handles)
+            handles = await feed_joined(
+                task_id, joined, companies_by_handle, sink, delta
+            )
+
+
+def queue_companies(body: CompaniesRequest, token: str) -> QueuedTask:
+    """Queue the companies of a request in the crawl queue.
+
+    Every LinkedIn url of a company becomes an item of the task. A request for a
+    task that is still unfinished, e.g. repeated after a restart, resumes the task
+    instead, so only its open items are crawled.
+    """
+    errors: dict[str, ErrorInfoModel] = {}
+    urls, companies_by_handle = collect_company_urls(body, errors)
+    items = []
+    for url in urls:
+        handle = LinkedinClient.company_handle(url)
+        items.extend(
+            (company_id, url, handle) for company_id in companies_by_handle[handle]
+        )
+    task = crawl_queue.add_task(body.task_id, token, body.force_full, items, errors)
+    return crawl_queue.set_priority(task, body.priority)
+
 
-    return analytics_client.crawling_finished(
-        token,
-        json.loads(
-            CrawlingFinishedInputModel(
-                task_id=body.task_id, errors=errors
-            ).model_dump_json()
-        ),
+async def crawl_companies(body: CompaniesRequest, token: str, job: Job | None = None):
+    """Queue the companies of a request and crawl them."""
+    return await run_task(queue_companies(body, token), job)
+
+
+async def run_task(task: QueuedTask, job: Job | None = None):
+    """Crawl the open items of a queued task and notify analytics when finished.
+
+    The open items are claimed in chunks of ``linkedin_client.batch_size``
+    profiles, each scraped within one actor run. The chunks of concurrent tasks
+    share the actor runs by the priority of their task, see ``TaskScheduler``.
+    Scraped companies are streamed, matched back to their company ids by the url
+    they were scraped from and fed to analytics in batches. If
+    ``FEED_SNAPSHOT_PATH`` is set, only the fields changed since the last
+    successful feed are fed, unless the task asks for ``force_full``. Progress and
+    the expected completion are reported to ``job``, if given. The errors of the
+    companies are counted by their type in the metrics.
+
+    The task is finished once its items are settled or the crawl failed. A task
+    cancelled by a shutdown stays unfinished, so it is resumed later. Of the
+    processes sharing a task, only the one finishing it notifies analytics.
+    """
+    try:
+        errors = await crawl_task(task, job)
+    except Exception:
+        crawl_queue.finish_task(task.task_id)
+        raise
+    if not crawl_queue.finish_task(task.task_id):
+        logger.debug(f"Task {task.task_id} was finished by another process")
+        return None
+    return await analytics_client.crawling_finished(
+        task.token, CrawlingFinishedInputModel(task_id=task.task_id, errors=errors)
     )
 
 
+async def report_progress(task: QueuedTask, job: Job | None) -> int:
+    """Report the progress and expected completion of a task to its job.
+
+    Returns the number of profiles left to crawl.
+    """
+    total, done = crawl_queue.progress(task.task_id)
+    eta_seconds = scheduler.estimate(task.task_id, total - done)
+    if job is not None:
+        await job.report(total, done, eta_seconds)
+    return total - done
+
+
+async def crawl_chunks(
+    task: QueuedTask,
+    sink: QueueFeedSink,
+    delta: DeltaFeed | None = None,
+    job: Job | None = None,
+):
+    """Claim and crawl chunks of a task in turn until none is left to claim."""
+    while True:
+        remaining = await report_progress(task, job)
+        batch_size = linkedin_client.batch_size
+        async with scheduler.slot(task.task_id, min(batch_size, max(remaining, 1))):
+            items = crawl_queue.claim(task.task_id, batch_size)
+            if not items:
+                return
+            await crawl_chunk(task.task_id, items, sink, delta)
+
+
+async def crawl_task(
+    task: QueuedTask, job: Job | None = None
+) -> dict[str, ErrorInfoModel]:
+    """Crawl the open items of a queued task and return the errors, see ``run_task``."""
+    with CRAWLS_IN_FLIGHT.track_inprogress(), observe(STAGE_CRAWL_COMPANIES):
+        delta = (
+            DeltaFeed(feed_snapshots, force_full=task.force_full)
+            if feed_snapshots is not None
+            else None
+        )
+        sink = QueueFeedSink(analytics_client, crawl_queue, task)
+        scheduler.register(task.task_id, task.priority)
+        try:
+            while True:
+                # up to the concurrency cap of the task, one chunk at a time each
+                chunks = min(
+                    scheduler.max_per_task,
+                    math.ceil(
+                        await report_progress(task, job) / linkedin_client.batch_size
+                    ),
+                )
+                try:
+                    async with asyncio.TaskGroup() as group:
+                        for _ in range(chunks):
+                            group.create_task(crawl_chunks(task, sink, delta, job))
+                except ExceptionGroup as e:
+                    raise e.exceptions[0] from None
+                # the records still buffered settle the items of this process
+                await sink.close()
+                retry_in = crawl_queue.retry_in(task.task_id)
+                if retry_in is None:
+                    break
+                # the remaining items are leased by another process
+                await asyncio.sleep(max(retry_in, 1))
+        finally:
+            scheduler.unregister(task.task_id)
+            await sink.close()
+        await report_progress(task, job)
+        if delta is not None:
+            delta.commit(failed=sink.errors)
+
+        errors = crawl_queue.errors(task.task_id)
+        for error in errors.values():
+            ERRORS.labels(stage=STAGE_CRAWL_COMPANIES, error=error.error_type).inc()
+    return errors
+
+
+@app.post(
+    "/companies",
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobModel}},
+)
+async def get_company_info(
+    body: CompaniesRequest,
+    response: Response,
+    background: bool = False,
+    token: str = Depends(authenticate),
+):
+    """Endpoint to get detailed information about a dict of organizations.
+
+    With ``background=true`` the task is crawled as a background job and the job
+    is returned right away with status 202. Its progress can be polled
+    at ``/jobs/{job_id}``. If ``CRAWL_MODE`` is ``queue``, the task is always
+    left to the worker processes in this way.
+    """
+    if crawl_mode == CRAWL_MODE_QUEUE:
+        task = queue_companies(body, token)
+        job = job_manager.enqueue(task.task_id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return job.to_model()
+
+    if background:
+        job = job_manager.submit(
+            body.task_id, lambda job: crawl_companies(body, token, job)
+        )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return job.to_model()
+
+    return await crawl_companies(body, token)
+
+
+@app.get("/jobs/{job_id}", response_model=JobModel, status_code=status.HTTP_200_OK)
+async def get_job(job_id: str, token: str = Depends(authenticate)):
+    """Endpoint to get the progress of a crawling job."""
+    job = job_manager.snapshot(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {job_id}"
+        )
+    return job
+
+
+def discovery_validity(discovered_at: float) -> datetime:
+    """Return until when results discovered at ``discovered_at`` are valid."""
+    return datetime.fromtimestamp(discovered_at) + timedelta(
+        days=DISCOVERY_VALIDITY_DAYS
+    )
+
+
+async def stream_discovery(
+    request: list[DiscoveryRequest],
+) -> AsyncIterator[bytes]:
+    """Stream the discovery results of a request as NDJSON.
+
+    Every line is a partial FinalDiscoveryResponse holding the identifiers of a
+    single company, emitted as soon as its discovery has finished. A company whose
+    discovery failed gets empty identifiers and its error under ``errors``, so the
+    other companies are still streamed. The last line holds the validity of all
+    results, counted from the oldest of them, and is always written.
+    """
+    # errors of the failed discoveries by company name
+    errors: dict[str, ErrorInfoModel] = {}
+
+    def discover_company(name: str) -> DiscoveryResponse:
+        try:
+            return linkedin_client.discover_company(name)
+        except Exception as e:
+            logger.error(f"Discovery for {name} failed: {e}")
+            errors[name] = ErrorInfoModel(
+                error_type=e.__class__.__name__, error_description=str(e)
+            )
+            return DiscoveryResponse()
+
+    oldest = time.time()
+    try:
+        async for index, response, discovered_at in discovery_engine.iter_discover(
+            discover_company, [company.name for company in request]
+        ):
+            oldest = min(oldest, discovered_at)
+            company = request[index]
+            line = {"identifiers": {company.company_id: response}}
+            if company.name in errors:
+                line["errors"] = {company.company_id: errors[company.name]}
+            yield to_json(line) + b"\n"
+    except Exception as e:
+        logger.error(f"Streaming the discovery failed: {e}")
+
+    yield to_json({"validity": discovery_validity(oldest)}) + b"\n"
+
+
 @app.post(
     "/discover",
     response_model=FinalDiscoveryResponse,
     status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_200_OK: {"content": {NDJSON_MEDIA_TYPE: {}}},
+    },
 )
-def discover_companies(
-    request: list[DiscoveryRequest], token: str = Depends(authenticate)
+async def discover_companies(
+    request: list[DiscoveryRequest],
+    stream: bool = False,
+    accept: str | None = Header(None),
+    token: str = Depends(authenticate),
 ):
-    """Endpoint to discover organizations based on provided names."""
+    """Endpoint to discover organizations based on provided names.
+
+    With ``stream=true`` or an Accept header asking for ``application/x-ndjson``
+    the results are streamed line by line as they resolve, see
+    ``stream_discovery``.
+    """
     if not request:
         msg = "Request body cannot be empty for discovery"
         logger.error(msg)
         raise ClientInvalidBodyError(msg)
 
-    response_data = {}
-    for company in request:
-        logger.debug(
-            f"Discovering with name: {company.name} for company_id {company.company_id}"
+    logger.debug(f"Discovering {len(request)} companies")
+    if stream or (accept is not None and NDJSON_MEDIA_TYPE in accept):
+        return StreamingResponse(
+            stream_discovery(request), media_type=NDJSON_MEDIA_TYPE
         )
-        response = linkedin_client.discover_company(company.name)
-        response_data[company.company_id] = response
 
-    current_date = datetime.now()
-    valid_until = current_date + timedelta(days=180)
+    response_data = {}
+    oldest = time.time()
+    async for index, response, discovered_at in discovery_engine.iter_discover(
+        linkedin_client.discover_company, [company.name for company in request]
+    ):
+        response_data[request[index].company_id] = response
+        oldest = min(oldest, discovered_at)
 
-    return FinalDiscoveryResponse(identifiers=response_data, validity=valid_until)
+    return FinalDiscoveryResponse(
+        identifiers=response_data, validity=discovery_validity(oldest)
+    )
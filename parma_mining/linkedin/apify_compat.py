@@ -0,0 +1,42 @@
+"""Module isolating the internals of apify-client this module relies on.
+
+apify-client neither exports the error raised for failed API requests nor offers
+a way to close its connection pools. Both are reached through private attributes,
+which are only accessed here and checked against the versions of apify-client
+pinned in ``environment.yml``.
+"""
+import logging
+
+from apify_client import ApifyClientAsync
+
+try:
+    from apify_client._errors import ApifyApiError
+except ImportError as e:
+    raise ImportError(
+        "apify_client._errors.ApifyApiError is missing, the installed apify-client "
+        "does not match the version range pinned in environment.yml"
+    ) from e
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["ApifyApiError", "close_apify_client"]
+
+
+async def close_apify_client(client: ApifyClientAsync):
+    """Close the connection pools of an Apify client.
+
+    Pools the installed apify-client does not expose where expected are left to
+    the garbage collector, with a warning.
+    """
+    http_client = getattr(client, "http_client", None)
+    async_pool = getattr(http_client, "httpx_async_client", None)
+    pool = getattr(http_client, "httpx_client", None)
+    if async_pool is None or pool is None:
+        logger.warning(
+            "The Apify client exposes no connection pools to close, "
+            "check the apify-client version pinned in environment.yml"
+        )
+    if async_pool is not None:
+        await async_pool.aclose()
+    if pool is not None:
+        pool.close()
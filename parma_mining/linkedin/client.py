@@ -5,79 +5,307 @@ This module communicates with the Apify Scraper to discover and scrape
 import json
 import logging
 import os
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from urllib.error import HTTPError
 
-from apify_client import ApifyClient
+from apify_client import ApifyClientAsync
 from dotenv import load_dotenv
 from googlesearch import search
 
-from parma_mining.linkedin.model import CompanyModel, DiscoveryResponse
+from parma_mining.linkedin.apify_compat import close_apify_client
+from parma_mining.linkedin.item_mapping import map_item, map_items
+from parma_mining.linkedin.model import (
+    CompanyModel,
+    DiscoveryResponse,
+    ScrapedCompanyModel,
+)
+from parma_mining.linkedin.run_manager import RunManager
+from parma_mining.linkedin.scrape_cache import ScrapeCache
+from parma_mining.linkedin.url_matcher import LinkedinUrlMatcher
 from parma_mining.mining_common.exceptions import (
     ClientError,
     CrawlingError,
 )
+from parma_mining.mining_common.metrics import (
+    STAGE_DATASET_FETCH,
+    STAGE_DISCOVER_COMPANY,
+    STAGE_MODEL_MAPPING,
+    observe,
+    observe_iter,
+    observe_seconds,
+)
+from parma_mining.mining_common.rate_control import RateControl
 
 logger = logging.getLogger(__name__)
 
+SEARCH_MODE_SITE = "site"
+SEARCH_MODE_KEYWORD = "keyword"
+
 
 class LinkedinClient:
     """Class for communicating with the Linkedin via Apify."""
 
-    def __init__(self):
-        """Initialize the LinkedinClient class."""
+    def __init__(
+        self,
+        search_backend: Callable[..., Iterable[str]] | None = None,
+        scrape_cache: ScrapeCache | None = None,
+        rate_control: RateControl | None = None,
+    ):
+        """Initialize the LinkedinClient class.
+
+        ``search_backend`` replaces ``googlesearch.search``, e.g. by a
+        StaticSearchBackend for offline use. Profiles found fresh in
+        ``scrape_cache`` are not scraped again. Requests to Google and Apify are
+        paced by ``rate_control``, which may be shared with other clients.
+        """
         load_dotenv()
         self.key = str(os.getenv("APIFY_API_KEY") or "")
         self.cookie = self.parse_json_string(str(os.getenv("LINKEDIN_COOKIE") or "{}"))
         self.actor_id = str(os.getenv("APIFY_ACTOR_ID") or "")
-        self.maximum_runtime_scraping_seconds = 600  # 10 minutes
+        self.maximum_runtime_scraping_seconds = int(
+            os.getenv("APIFY_RUN_TIMEOUT_SECONDS") or 600  # 10 minutes
+        )
+        # Number of profile urls submitted to a single actor run
+        self.batch_size = int(os.getenv("APIFY_BATCH_SIZE") or 25)
+        # Retries and timeouts of every request to the Apify API; the timeout must
+        # exceed the 60 seconds Apify holds a request waiting for a run to finish
+        self.apify_max_retries = int(os.getenv("APIFY_MAX_RETRIES") or 4)
+        self.apify_retry_delay_millis = int(
+            os.getenv("APIFY_RETRY_DELAY_MILLIS") or 500
+        )
+        self.apify_timeout_seconds = int(os.getenv("APIFY_TIMEOUT_SECONDS") or 120)
+        # Replaces the Apify API, e.g. by a local stand-in for benchmarks
+        self.apify_api_url = os.getenv("APIFY_API_URL") or None
+        self._apify_client: ApifyClientAsync | None = None
+        self.search_backend = search_backend
+        self.scrape_cache = scrape_cache
+        self.search_tld = "co.in"
+        self.search_mode = os.getenv("DISCOVERY_QUERY_MODE") or SEARCH_MODE_SITE
+        self.url_matcher = LinkedinUrlMatcher()
+        # the google rate limit paces the searches, so no extra pause is needed
+        self.search_pause = float(os.getenv("GOOGLE_SEARCH_PAUSE") or 0)
+        self.rate_control = rate_control or RateControl()
+        # Requests are paced across all threads and tasks using the client
+        self.google = self.rate_control.upstream("google")
+        self.apify = self.rate_control.upstream("apify")
+        memory_mbytes = os.getenv("APIFY_RUN_MEMORY_MBYTES")
+        # Actor runs in flight at once, across all crawling tasks
+        self.run_manager = RunManager(
+            self.apify,
+            max_concurrent_runs=int(os.getenv("APIFY_MAX_CONCURRENT_RUNS") or 4),
+            timeout_seconds=self.maximum_runtime_scraping_seconds,
+            memory_mbytes=int(memory_mbytes) if memory_mbytes else None,
+        )
+
+    @property
+    def apify_client(self) -> ApifyClientAsync:
+        """Return the Apify client shared by all scrapes.
+
+        The client is created on first use, so its connection pool binds to the
+        running event loop and is kept alive across actor runs and dataset pages.
+        Failed requests are retried with an exponential backoff.
+        """
+        if self._apify_client is None:
+            self._apify_client = ApifyClientAsync(
+                self.key,
+                api_url=self.apify_api_url,
+                max_retries=self.apify_max_retries,
+                min_delay_between_retries_millis=self.apify_retry_delay_millis,
+                timeout_secs=self.apify_timeout_seconds,
+            )
+        return self._apify_client
+
+    async def aclose(self):
+        """Close the connection pools of the Apify client."""
+        if self._apify_client is not None:
+            await close_apify_client(self._apify_client)
+            self._apify_client = None
 
     def parse_json_string(self, json_string):
         """Parse a JSON string."""
         return json.loads(json_string)
 
+    @staticmethod
+    def company_handle(url: str) -> str:
+        """Return the key used to match a profile url with scraped items.
+
+        For ``linkedin.com/company/<slug>`` urls this is the lower cased slug, which
+        equals the ``universal_name`` of the company, whatever the locale subdomain,
+        subpage, query string or trailing slash of the url. Any other url is
+        matched by its lower cased form without query string, fragment and
+        trailing slash.
+        """
+        url = url.strip()
+        slug = LinkedinUrlMatcher.slug(url if "://" in url else f"https://{url}")
+        if slug is not None:
+            return slug
+        return url.split("#", 1)[0].split("?", 1)[0].rstrip("/").lower()
+
+    @staticmethod
+    def canonical_url(url: str) -> str:
+        """Return the url a profile is scraped from, equal for urls of one profile."""
+        slug = LinkedinUrlMatcher.slug(url if "://" in url else f"https://{url}")
+        if slug is None:
+            return url.strip().split("#", 1)[0].split("?", 1)[0]
+        return LinkedinUrlMatcher.company_url(slug)
+
+    @classmethod
+    def item_handles(cls, company: CompanyModel) -> list[str]:
+        """Return every key a scraped company can be matched with.
+
+        Besides its universal name and profile url, a company is matched by its
+        LinkedIn id, as profile urls may hold the numeric id instead of a slug.
+        """
+        handles = []
+        if company.universal_name:
+            handles.append(company.universal_name.lower())
+        if company.profile_url:
+            handles.append(cls.company_handle(company.profile_url))
+        if company.linkedin_id:
+            handles.append(str(company.linkedin_id).lower())
+        return handles
+
+    def search_query(self, query: str) -> str:
+        """Return the search query for a company name.
+
+        In the ``site`` query mode the search is restricted to LinkedIn company
+        profiles, so nearly every result is a candidate and the first result page
+        usually suffices. The ``keyword`` mode searches for the name and the word
+        linkedin.
+        """
+        if self.search_mode == SEARCH_MODE_SITE:
+            return f'"{query}" site:linkedin.com/company'
+        return query + " linkedin"
+
+    def search_results(self, search_query: str) -> Iterator[str]:
+        """Yield the urls found by a web search, fetching result pages lazily.
+
+        The outcome of the first result page is recorded with the google
+        upstream, so throttling slows down the following searches.
+        """
+        user_agent = (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36"
+        )
+        backend = self.search_backend or search
+        self.google.acquire()
+        try:
+            results = iter(
+                backend(
+                    search_query,
+                    tld=self.search_tld,
+                    num=10,
+                    stop=10,
+                    pause=self.search_pause,
+                    user_agent=user_agent,
+                )
+            )
+            first = next(results, None)
+        except HTTPError as e:
+            self.google.record_status(e.code)
+            raise
+        except Exception:
+            self.google.record_failure()
+            raise
+        self.google.record_success()
+        if first is not None:
+            yield first
+            yield from results
+
     def discover_company(self, query: str) -> DiscoveryResponse:
         """Discover a company.
 
-        Take name as an input and find its linkedin url.
+        Take name as an input and find its linkedin url. Search results are
+        ranked by the url matcher, which stops the search as soon as a confident
+        match is found. If no candidate scores at least the minimum score, an empty
+        DiscoveryResponse is returned; a ClientError is raised only if the search
+        itself failed. The Google search blocks, so this is run on the worker
+        threads of the DiscoveryEngine.
+        """
+        with observe(STAGE_DISCOVER_COMPANY):
+            try:
+                url = self.url_matcher.best_match(
+                    query, self.search_results(self.search_query(query))
+                )
+            except Exception as e:
+                msg = f"Error searching organizations for {query}: {e}"
+                logger.error(msg)
+                raise ClientError(msg)
+        if url is None:
+            logger.info(f"No Linkedin profile url matches {query} confidently")
+            return DiscoveryResponse()
+        return DiscoveryResponse(urls=[url])
+
+    def parse_company_item(self, item: dict) -> dict:
+        """Map a dataset item of the Apify actor to CompanyModel fields."""
+        return map_item(item)
+
+    async def iter_company_details(
+        self,
+        urls: list[str],
+        run_id: str | None = None,
+        on_run_started: Callable[[str], None] | None = None,
+    ) -> AsyncIterator[ScrapedCompanyModel]:
+        """Scrape companies and yield one CompanyModel per dataset item.
+
+        Every model is tagged with the requested url it was scraped from (``None``
+        if the item matches none of ``urls``). Profiles that are still fresh in the
+        scrape cache are served from it; only the remaining urls are passed to the
+        actor. Dataset items are fetched page by page, so memory stays flat even for
+        datasets with thousands of items. Actor runs are started and awaited by
+        the run manager, which keeps at most ``APIFY_MAX_CONCURRENT_RUNS`` runs in
+        flight and aborts runs past their deadline.
+
+        Items are matched with urls by their universal name, profile url and
+        LinkedIn id. Urls of renamed profiles match none of them; if a run leaves
+        a single url and a single item unmatched, they are paired, otherwise the
+        unmatched urls are scraped again one per run.
+
+        With ``run_id`` the items of that earlier run are yielded, if it still
+        exists, instead of starting a new run. ``on_run_started`` is called with the
+        id of a newly started run.
         """
-        search_query = query + " linkedin"
-        preferred_slash_count = 4
-        urls = []
+        urls_by_handle = {self.company_handle(url): url for url in urls}
         try:
-            user_agent = (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36"
-            )
-            for search_item in search(
-                search_query,
-                tld="co.in",
-                num=10,
-                stop=10,
-                pause=5,
-                user_agent=user_agent,
-            ):
-                print(search_item)
-                if (
-                    search_item.count("/") == preferred_slash_count
-                    or (
-                        search_item.count("/") == preferred_slash_count + 1
-                        and search_item.endswith("/")
-                    )
-                    and "https://www.linkedin.com/company/" in search_item
-                ):
-                    urls.append(search_item)
-                    break
-            if len(urls) == 0:
-                raise Exception("No Linkedin profile url found with given query")
-            return DiscoveryResponse.model_validate({"urls": urls})
+            to_scrape = []
+            cached = []
+            for url in urls:
+                item = (
+                    await self.scrape_cache.get_async(self.company_handle(url))
+                    if self.scrape_cache is not None
+                    else None
+                )
+                if item is None:
+                    to_scrape.append(url)
+                else:
+                    cached.append(item)
+            start = time.perf_counter()
+            companies = [
+                self._scraped_company(fields, urls_by_handle)
+                for fields in map_items(cached)
+            ]
+            observe_seconds(STAGE_MODEL_MAPPING, time.perf_counter() - start)
+            for company in companies:
+                yield company
+            if not to_scrape:
+                return
+            async for company in self._scrape_urls(to_scrape, run_id, on_run_started):
+                yield company
+
         except Exception as e:
-            msg = f"Error searching organizations for {query}: {e}"
+            msg = f"Error scraping company details: {e}"
             logger.error(msg)
-            raise ClientError()
+            raise CrawlingError(msg)
 
-    def get_company_details(self, urls: list[str]) -> CompanyModel:
-        """Scrape a company for details."""
-        # Initialize the ApifyClient with your API token
-        client = ApifyClient(self.key)
+    async def _scrape_urls(
+        self,
+        urls: list[str],
+        run_id: str | None = None,
+        on_run_started: Callable[[str], None] | None = None,
+    ) -> AsyncIterator[ScrapedCompanyModel]:
+        client = self.apify_client
+        urls_by_handle = {self.company_handle(url): url for url in urls}
         # Prepare the Actor input
         run_input = {
             "urls": urls,
@@ -85,75 +313,73 @@ class LinkedinClient:
             "maxDelay": 5,
             "cookie": self.cookie,
         }
-        try:
-            # Run the Actor and wait for it to finish
-            run = client.actor(self.actor_id).call(run_input=run_input)
-
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                company_data = {
-                    "name": item["name"] if "name" in item else None,
-                    "linkedin_id": item["id"] if "id" in item else None,
-                    "website": item["websiteUrl"] if "websiteUrl" in item else None,
-                    "profile_url": item["url"] if "url" in item else None,
-                    "ads_rule": item["adsRule"] if "adsRule" in item else None,
-                    "employee_count": item["employeeCount"]
-                    if "employeeCount" in item
-                    else None,
-                    "active": item["active"] if "active" in item else None,
-                    "job_search_url": item["jobSearchUrl"]
-                    if "jobSearchUrl" in item
-                    else None,
-                    "phone": item["phone"]["number"]
-                    if item["phone"] is not None
-                    else None,
-                    "tagline": item["tagline"] if "tagline" in item else None,
-                    "description": item["description"]
-                    if "description" in item
-                    else None,
-                    "logo_url": item["logoUrl"] if "logoUrl" in item else None,
-                    "follower_count": item["followerCount"]
-                    if "followerCount" in item
-                    else None,
-                    "universal_name": item["universalName"]
-                    if "universalName" in item
-                    else None,
-                    "specialities": item["specialities"]
-                    if "specialities" in item
-                    else None,
-                    "headquarter_city": item["headquarter"]["city"]
-                    if "headquarter" in item
-                    else None,
-                    "headquarter_country": item["headquarter"]["country"]
-                    if "headquarter" in item
-                    else None,
-                    "head_quarter_postal_code": item["headquarter"]["postalCode"]
-                    if "headquarter" in item
-                    else None,
-                    "industries": [industry["name"] for industry in item["industries"]]
-                    if item["industries"] is not None
-                    else None,
-                    "locations": [
-                        location["localizedName"]
-                        for location in item["groupedLocations"]
-                    ]
-                    if item["groupedLocations"] is not None
-                    else None,
-                    "hashtags": [hashtag["displayName"] for hashtag in item["hashtag"]]
-                    if item["hashtag"] is not None
-                    else None,
-                    "founded_year": item["foundedOn"]["year"]
-                    if item["foundedOn"] is not None
-                    else None,
-                    "founded_month": item["foundedOn"]["month"]
-                    if item["foundedOn"] is not None
-                    else None,
-                    "founded_day": item["foundedOn"]["day"]
-                    if item["foundedOn"] is not None
-                    else None,
-                }
-            return CompanyModel.model_validate(company_data)
+        # Start the Actor and wait for it to finish without blocking
+        run = (
+            await self.run_manager.resume(client, run_id)
+            if run_id is not None
+            else None
+        )
+        if run is None:
+            run = await self.run_manager.run(
+                client, self.actor_id, run_input, on_start=on_run_started
+            )
 
-        except Exception as e:
-            msg = f"Error scraping company details: {e}"
-            logger.error(msg)
-            raise CrawlingError(msg)
+        scraped_items = 0
+        matched = set()
+        unmatched = []
+        # the mapping time is summed up and recorded once per run
+        mapping_seconds = 0.0
+        async for item in observe_iter(
+            STAGE_DATASET_FETCH,
+            client.dataset(run["defaultDatasetId"]).iterate_items(),
+        ):
+            start = time.perf_counter()
+            scraped = self._scraped_company(
+                self.parse_company_item(item), urls_by_handle
+            )
+            mapping_seconds += time.perf_counter() - start
+            if self.scrape_cache is not None:
+                await self.scrape_cache.put_async(item)
+            scraped_items += 1
+            if scraped.source_url is None:
+                unmatched.append(scraped)
+                continue
+            matched.add(self.company_handle(scraped.source_url))
+            yield scraped
+        observe_seconds(STAGE_MODEL_MAPPING, mapping_seconds)
+        if self.scrape_cache is not None:
+            self.scrape_cache.record_run(
+                (run.get("stats") or {}).get("runTimeSecs") or 0, scraped_items
+            )
+
+        left = [url for handle, url in urls_by_handle.items() if handle not in matched]
+        if len(left) == 1 and len(unmatched) == 1:
+            logger.debug(f"Pairing the only unmatched item with {left[0]}")
+            yield ScrapedCompanyModel(source_url=left[0], company=unmatched[0].company)
+            return
+        for scraped in unmatched:
+            yield scraped
+        if len(urls_by_handle) > 1:
+            for url in left:
+                logger.debug(f"Scraping {url} on its own, as no item matched it")
+                async for scraped in self._scrape_urls([url]):
+                    yield scraped
+
+    def _scraped_company(
+        self, fields: dict, urls_by_handle: dict[str, str]
+    ) -> ScrapedCompanyModel:
+        # the fields come from the compiled item map, so they are not validated
+        company = CompanyModel.model_construct(**fields)
+        source_url = next(
+            (
+                urls_by_handle[handle]
+                for handle in self.item_handles(company)
+                if handle in urls_by_handle
+            ),
+            None,
+        )
+        return ScrapedCompanyModel(source_url=source_url, company=company)
+
+    async def get_company_details(self, urls: list[str]) -> list[CompanyModel]:
+        """Scrape companies for details and return every scraped company."""
+        return [scraped.company async for scraped in self.iter_company_details(urls)]
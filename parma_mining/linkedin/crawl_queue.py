@@ -0,0 +1,474 @@
+"""Module for the durable queue of crawling work.
+
+This module records every crawling task and the state of each of its
+(company id, url) items in a SQLite database, so a task interrupted by a restart
+resumes where it stopped instead of starting over. An item moves from pending
+to scraped to fed, or to failed. Scraped company details and the Apify run
+scraping an item are stored with it, so neither the scraping nor the actor run
+is repeated after a restart.
+
+Items are claimed with a lease held by the claiming process. The lease is
+renewed while the process is alive and expires if it dies, after which another
+process or the restarted one claims the item again. Records are fed with an
+idempotency key per task attempt and item, so analytics can drop a record fed
+again because the process died before its item was marked as fed.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+from parma_mining.linkedin.analytics_client import AnalyticsClient, RawDataSink
+from parma_mining.linkedin.model import ErrorInfoModel, ResponseModel
+from parma_mining.mining_common.exceptions import AnalyticsError, BaseError
+from parma_mining.mining_common.sqlite import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+ITEM_PENDING = "pending"
+ITEM_SCRAPED = "scraped"
+ITEM_FED = "fed"
+ITEM_FAILED = "failed"
+
+TASK_RUNNING = "running"
+TASK_FINISHED = "finished"
+
+
+class QueueItem(NamedTuple):
+    """A url of a company within a crawling task."""
+
+    company_id: str
+    url: str
+    handle: str
+    state: str
+    data: str | None
+    run_id: str | None
+
+
+class QueuedTask(NamedTuple):
+    """A crawling task that has not finished yet."""
+
+    task_id: int
+    token: str
+    force_full: bool
+    # distinguishes a task crawled again after it had finished
+    attempt: str
+    priority: int = 1
+
+
+class CrawlQueue:
+    """Crawling tasks and the state of their items."""
+
+    def __init__(self, path: str = ":memory:", lease_seconds: float = 60):
+        """Initialize the CrawlQueue class.
+
+        Leases of claimed items last ``lease_seconds`` unless renewed.
+        """
+        self.lease_seconds = lease_seconds
+        # an in-memory queue is neither kept across restarts nor seen by workers
+        self.persistent = path != ":memory:"
+        # identifies the leases of this process
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._db = connect_sqlite(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id INTEGER PRIMARY KEY, token TEXT NOT NULL, "
+            "force_full INTEGER NOT NULL, attempt TEXT NOT NULL, status TEXT NOT NULL, "
+            "updated_at REAL, priority INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "task_id INTEGER NOT NULL, company_id TEXT NOT NULL, url TEXT NOT NULL, "
+            "handle TEXT NOT NULL, state TEXT NOT NULL, data TEXT, run_id TEXT, "
+            "error_type TEXT, error_description TEXT, lease_owner TEXT, "
+            "lease_until REAL, PRIMARY KEY (task_id, company_id, url))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS items_state ON items (task_id, state)"
+        )
+
+    @classmethod
+    def from_env(cls) -> "CrawlQueue":
+        """Create the queue configured by the environment.
+
+        The queue is kept in memory unless ``CRAWL_QUEUE_PATH`` is set, in which
+        case tasks survive restarts of the module. The file holds the bearer tokens
+        of the tasks in plaintext.
+        """
+        return cls(
+            os.getenv("CRAWL_QUEUE_PATH") or ":memory:",
+            lease_seconds=float(os.getenv("CRAWL_LEASE_SECONDS") or 60),
+        )
+
+    def add_task(
+        self,
+        task_id: int,
+        token: str,
+        force_full: bool,
+        items: list[tuple[str, str, str]],
+        errors: dict[str, ErrorInfoModel],
+    ) -> QueuedTask:
+        """Add a task with its (company id, url, handle) items.
+
+        A task that is still running is resumed with the new token instead, so a
+        repeated request does not crawl the items done already. The ``errors`` of
+        companies that cannot be crawled are recorded as failed items.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                "SELECT status, attempt, priority FROM tasks WHERE task_id = ?",
+                (task_id,),
+            ).fetchone()
+            if row is not None and row[0] == TASK_RUNNING:
+                self._db.execute(
+                    "UPDATE tasks SET token = ?, force_full = ?, updated_at = ? "
+                    "WHERE task_id = ?",
+                    (token, force_full, now, task_id),
+                )
+                self._db.execute("COMMIT")
+                logger.info(f"Resuming the unfinished task {task_id}")
+                return QueuedTask(task_id, token, force_full, row[1], row[2])
+            attempt = uuid.uuid4().hex
+            self._db.execute("DELETE FROM items WHERE task_id = ?", (task_id,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, token, force_full, attempt, "
+                "status, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (task_id, token, force_full, attempt, TASK_RUNNING, now),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO items (task_id, company_id, url, handle, state) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (task_id, company_id, url, handle, ITEM_PENDING)
+                    for company_id, url, handle in items
+                ],
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO items (task_id, company_id, url, handle, state, "
+                "error_type, error_description) VALUES (?, ?, '', '', ?, ?, ?)",
+                [
+                    (
+                        task_id,
+                        company_id,
+                        ITEM_FAILED,
+                        error.error_type,
+                        error.error_description,
+                    )
+                    for company_id, error in errors.items()
+                ],
+            )
+            self._db.execute("COMMIT")
+        return QueuedTask(task_id, token, force_full, attempt)
+
+    def set_priority(self, task: QueuedTask, priority: int) -> QueuedTask:
+        """Set the priority a task is scheduled with and return the updated task."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET priority = ? WHERE task_id = ?",
+                (priority, task.task_id),
+            )
+        return task._replace(priority=priority)
+
+    def claim(self, task_id: int, max_handles: int) -> list[QueueItem]:
+        """Lease the open items of up to ``max_handles`` profiles of a task.
+
+        All items of a profile are claimed together, so it is scraped once for
+        every company listing it. Items leased by this process or by another live
+        process are skipped.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            handles = [
+                row[0]
+                for row in self._db.execute(
+                    "SELECT handle FROM items WHERE task_id = ? AND state IN (?, ?) "
+                    "AND (lease_owner IS NULL OR lease_owner != ? AND lease_until < ?) "
+                    "GROUP BY handle ORDER BY MIN(rowid) LIMIT ?",
+                    (task_id, ITEM_PENDING, ITEM_SCRAPED, self.owner, now, max_handles),
+                )
+            ]
+            items = []
+            for handle in handles:
+                self._db.execute(
+                    "UPDATE items SET lease_owner = ?, lease_until = ? "
+                    "WHERE task_id = ? AND handle = ? AND state IN (?, ?)",
+                    (
+                        self.owner,
+                        now + self.lease_seconds,
+                        task_id,
+                        handle,
+                        ITEM_PENDING,
+                        ITEM_SCRAPED,
+                    ),
+                )
+                items.extend(
+                    QueueItem(*row)
+                    for row in self._db.execute(
+                        "SELECT company_id, url, handle, state, data, run_id "
+                        "FROM items WHERE task_id = ? AND handle = ? "
+                        "AND state IN (?, ?) ORDER BY rowid",
+                        (task_id, handle, ITEM_PENDING, ITEM_SCRAPED),
+                    )
+                )
+            self._db.execute("COMMIT")
+        return items
+
+    def renew_leases(self):
+        """Extend the leases held by this process."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE items SET lease_until = ? WHERE lease_owner = ? "
+                "AND state IN (?, ?)",
+                (
+                    time.time() + self.lease_seconds,
+                    self.owner,
+                    ITEM_PENDING,
+                    ITEM_SCRAPED,
+                ),
+            )
+
+    async def keep_leases(self):
+        """Renew the leases of this process until cancelled."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.renew_leases()
+
+    def set_run(self, task_id: int, handles: list[str], run_id: str):
+        """Record the actor run scraping the pending items of some profiles."""
+        self._update(
+            "run_id = ?", (run_id,), task_id, [(None, handle) for handle in handles]
+        )
+
+    def mark_scraped(self, task_id: int, handle: str, data: str):
+        """Store the scraped details of a profile for the items still pending."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE items SET state = ?, data = ? "
+                "WHERE task_id = ? AND handle = ? AND state = ?",
+                (ITEM_SCRAPED, data, task_id, handle, ITEM_PENDING),
+            )
+
+    def mark_fed(self, task_id: int, keys: list[tuple[str | None, str]]):
+        """Mark (company id, handle) items as fed to analytics.
+
+        A company id of None marks every open item of the handle.
+        """
+        self._update(
+            "state = ?, data = NULL, lease_owner = NULL, lease_until = NULL",
+            (ITEM_FED,),
+            task_id,
+            keys,
+        )
+
+    def mark_failed(
+        self, task_id: int, keys: list[tuple[str | None, str]], e: BaseError
+    ):
+        """Mark (company id, handle) items as failed with an error.
+
+        A company id of None marks every open item of the handle.
+        """
+        self._update(
+            "state = ?, error_type = ?, error_description = ?, "
+            "lease_owner = NULL, lease_until = NULL",
+            (ITEM_FAILED, e.__class__.__name__, e.message),
+            task_id,
+            keys,
+        )
+
+    def _update(
+        self,
+        assignments: str,
+        values: tuple,
+        task_id: int,
+        keys: list[tuple[str | None, str]],
+    ):
+        if not keys:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            for company_id, handle in keys:
+                self._db.execute(
+                    f"UPDATE items SET {assignments} WHERE task_id = ? "
+                    "AND handle = ? AND (? IS NULL OR company_id = ?) "
+                    "AND state IN (?, ?)",
+                    (
+                        *values,
+                        task_id,
+                        handle,
+                        company_id,
+                        company_id,
+                        ITEM_PENDING,
+                        ITEM_SCRAPED,
+                    ),
+                )
+            self._db.execute("COMMIT")
+
+    def retry_in(self, task_id: int) -> float | None:
+        """Return the seconds until an open item of a task can be claimed again.
+
+        None if the task has no open items left.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*), MIN(lease_until) FROM items "
+                "WHERE task_id = ? AND state IN (?, ?)",
+                (task_id, ITEM_PENDING, ITEM_SCRAPED),
+            ).fetchone()
+        if row[0] == 0:
+            return None
+        return max(0.0, (row[1] or 0) - time.time())
+
+    def progress(self, task_id: int) -> tuple[int, int]:
+        """Return the number of profiles of a task and how many of them are done."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(DISTINCT handle), COUNT(DISTINCT CASE WHEN state IN "
+                "(?, ?) THEN handle END) FROM items WHERE task_id = ? AND handle != ''",
+                (ITEM_PENDING, ITEM_SCRAPED, task_id),
+            ).fetchone()
+        return row[0], row[0] - row[1]
+
+    def errors(self, task_id: int) -> dict[str, ErrorInfoModel]:
+        """Return the error of every company of a task with a failed item."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT company_id, error_type, error_description FROM items "
+                "WHERE task_id = ? AND state = ? ORDER BY rowid",
+                (task_id, ITEM_FAILED),
+            ).fetchall()
+        return {
+            company_id: ErrorInfoModel(
+                error_type=error_type, error_description=error_description
+            )
+            for company_id, error_type, error_description in rows
+        }
+
+    def finish_task(self, task_id: int) -> bool:
+        """Mark a task as finished, so it is not resumed anymore.
+
+        Returns whether the call finished the task, so a task run by several
+        processes is reported once.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? "
+                "WHERE task_id = ? AND status = ?",
+                (TASK_FINISHED, time.time(), task_id, TASK_RUNNING),
+            )
+        return cursor.rowcount > 0
+
+    def unfinished_tasks(self) -> list[QueuedTask]:
+        """Return the tasks that have not finished yet."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT task_id, token, force_full, attempt, priority FROM tasks "
+                "WHERE status = ? ORDER BY updated_at",
+                (TASK_RUNNING,),
+            ).fetchall()
+        return [
+            QueuedTask(task_id, token, bool(force_full), attempt, priority)
+            for task_id, token, force_full, attempt, priority in rows
+        ]
+
+    def runnable_tasks(self) -> list[QueuedTask]:
+        """Return the unfinished tasks this process could work on now.
+
+        These have items it can claim, or no open items left but have not been
+        reported yet.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT task_id, token, force_full, attempt, priority FROM tasks "
+                "WHERE status = ? AND (EXISTS (SELECT 1 FROM items "
+                "WHERE items.task_id = tasks.task_id AND state IN (?, ?) "
+                "AND (lease_owner IS NULL OR lease_owner != ? AND lease_until < ?)) "
+                "OR NOT EXISTS (SELECT 1 FROM items "
+                "WHERE items.task_id = tasks.task_id AND state IN (?, ?))) "
+                "ORDER BY updated_at",
+                (
+                    TASK_RUNNING,
+                    ITEM_PENDING,
+                    ITEM_SCRAPED,
+                    self.owner,
+                    time.time(),
+                    ITEM_PENDING,
+                    ITEM_SCRAPED,
+                ),
+            ).fetchall()
+        return [
+            QueuedTask(task_id, token, bool(force_full), attempt, priority)
+            for task_id, token, force_full, attempt, priority in rows
+        ]
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of items by state."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*) FROM items GROUP BY state"
+            ).fetchall()
+            tasks = self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = ?", (TASK_RUNNING,)
+            ).fetchone()[0]
+        return {
+            "running_tasks": tasks,
+            **{state: 0 for state in (ITEM_PENDING, ITEM_SCRAPED, ITEM_FED)},
+            ITEM_FAILED: 0,
+            **dict(rows),
+        }
+
+
+class QueueFeedSink(RawDataSink):
+    """Feed the records of a queued task and track the state of their items.
+
+    Every record is fed with an idempotency key derived from the task attempt, the
+    company id and the profile it was scraped from. Its item is marked as fed or
+    failed once the batch holding the record has been sent.
+    """
+
+    def __init__(self, client: AnalyticsClient, queue: CrawlQueue, task: QueuedTask):
+        """Initialize the QueueFeedSink class."""
+        super().__init__(client, task.token)
+        self.queue = queue
+        self.task = task
+        # (company id, handle) of the records buffered or being sent by key
+        self._items: dict[str, tuple[str, str]] = {}
+
+    def idempotency_key(self, company_id: str, handle: str) -> str:
+        """Return the idempotency key of the record of an item."""
+        item = f"linkedin:{self.task.task_id}:{self.task.attempt}:{company_id}:{handle}"
+        return hashlib.sha256(item.encode()).hexdigest()
+
+    async def add_item(self, data: ResponseModel, handle: str):
+        """Buffer the record of the item of ``data.company_id`` and ``handle``."""
+        key = self.idempotency_key(data.company_id, handle)
+        self._items[key] = (data.company_id, handle)
+        await self.add(data, key)
+
+    def skip_item(self, company_id: str, handle: str):
+        """Mark an item as fed without feeding it, e.g. as it is unchanged."""
+        self.queue.mark_fed(self.task.task_id, [(company_id, handle)])
+
+    def sent(self, keys: list[str | None], errors: dict[str, AnalyticsError]):
+        """Mark the items of a batch sent as fed or failed."""
+        items = [self._items.pop(key) for key in keys if key in self._items]
+        self.queue.mark_fed(
+            self.task.task_id,
+            [
+                (company_id, handle)
+                for company_id, handle in items
+                if company_id not in errors
+            ],
+        )
+        for company_id, handle in items:
+            if company_id in errors:
+                self.queue.mark_failed(
+                    self.task.task_id, [(company_id, handle)], errors[company_id]
+                )
@@ -0,0 +1,142 @@
+"""Module for discovering many companies concurrently.
+
+This module runs the Google based discovery of LinkedIn profiles for a list of
+companies with bounded parallelism and stops waiting for queries that exceed
+their deadline.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from parma_mining.linkedin.discovery_cache import DiscoveryCache
+from parma_mining.linkedin.model import DiscoveryResponse
+
+logger = logging.getLogger(__name__)
+
+
+class StaticSearchBackend:
+    """Offline stand-in for ``googlesearch.search``.
+
+    Returns predefined results for each query, optionally after a simulated
+    latency, so discovery can be exercised without network access.
+    """
+
+    def __init__(self, results: dict[str, list[str]], latency: float = 0):
+        """Initialize the StaticSearchBackend class."""
+        self.results = results
+        self.latency = latency
+        self.queries: list[str] = []
+
+    def __call__(self, query: str, **kwargs) -> Iterator[str]:
+        """Return the results for ``query``, ignoring Google specific options."""
+        self.queries.append(query)
+        if self.latency:
+            time.sleep(self.latency)
+        yield from self.results.get(query, [])
+
+
+class DiscoveryEngine:
+    """Discover companies concurrently while keeping the request order."""
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        deadline: float | None = None,
+        cache: DiscoveryCache | None = None,
+    ):
+        """Initialize the DiscoveryEngine class.
+
+        Names found in ``cache`` are answered without running a query, and every
+        non-empty result is stored in it.
+        """
+        self.cache = cache
+        self.concurrency = concurrency or int(os.getenv("DISCOVERY_CONCURRENCY") or 4)
+        # seconds a single query may run before its result is given up on
+        self.deadline = deadline or float(os.getenv("DISCOVERY_DEADLINE_SECONDS") or 60)
+        # the search is blocking, so queries run on threads; a thread is only
+        # handed back to the semaphore once its query has really finished
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="discovery"
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def discover(
+        self, discover_company: Callable[[str], DiscoveryResponse], names: list[str]
+    ) -> list[DiscoveryResponse]:
+        """Run ``discover_company`` for every name and return results in order.
+
+        Queries exceeding the deadline yield an empty DiscoveryResponse. Any other
+        exception raised by ``discover_company`` is re-raised.
+        """
+        results = [DiscoveryResponse()] * len(names)
+        async for index, result, _ in self.iter_discover(discover_company, names):
+            results[index] = result
+        return results
+
+    async def iter_discover(
+        self, discover_company: Callable[[str], DiscoveryResponse], names: list[str]
+    ) -> AsyncIterator[tuple[int, DiscoveryResponse, float]]:
+        """Yield the index of every name with its result as soon as it resolves.
+
+        Every result comes with the time it was discovered at, as a POSIX
+        timestamp, which is earlier than now for cached results. Cached results
+        come first, the others in the order their queries finish. Pending queries
+        are cancelled if the caller stops iterating or a query fails.
+        """
+        entries = (
+            await asyncio.gather(*(self.cache.get_async(name) for name in names))
+            if self.cache
+            else [None] * len(names)
+        )
+        cached = dict(enumerate(entries))
+        tasks = [
+            asyncio.create_task(self._resolve(discover_company, index, name))
+            for index, name in enumerate(names)
+            if cached[index] is None
+        ]
+        try:
+            for index, entry in cached.items():
+                if entry is not None:
+                    yield index, *entry
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shutdown(self):
+        """Stop the worker threads without waiting for pending queries."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _resolve(
+        self,
+        discover_company: Callable[[str], DiscoveryResponse],
+        index: int,
+        name: str,
+    ) -> tuple[int, DiscoveryResponse, float]:
+        result = DiscoveryResponse.model_validate(
+            await self._query(discover_company, name)
+        )
+        if self.cache is not None and result.urls:
+            await self.cache.put_async(name, result)
+        return index, result, time.time()
+
+    async def _query(
+        self, discover_company: Callable[[str], DiscoveryResponse], name: str
+    ) -> DiscoveryResponse:
+        await self._semaphore.acquire()
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, discover_company, name
+        )
+        future.add_done_callback(lambda _: self._semaphore.release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.deadline)
+        except TimeoutError:
+            logger.error(
+                f"Discovery for {name} exceeded its deadline "
+                f"of {self.deadline} seconds"
+            )
+            return DiscoveryResponse()
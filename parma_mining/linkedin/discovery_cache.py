@@ -0,0 +1,215 @@
+"""Module for caching discovery results.
+
+This module stores the LinkedIn profiles discovered for company names in a local
+SQLite database, so that names seen before are not searched on Google again while
+their discovery result is still valid. With a shared state, results are stored
+there as well, so names discovered by other processes are not searched again
+either.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+
+from parma_mining.linkedin.model import DiscoveryResponse
+from parma_mining.mining_common.const import DISCOVERY_VALIDITY_DAYS
+from parma_mining.mining_common.shared_state import SharedState
+from parma_mining.mining_common.sqlite import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Legal forms that are dropped from the end of company names
+LEGAL_SUFFIXES = {
+    "ab",
+    "ag",
+    "as",
+    "bv",
+    "co",
+    "company",
+    "corp",
+    "corporation",
+    "gmbh",
+    "inc",
+    "incorporated",
+    "kg",
+    "limited",
+    "llc",
+    "llp",
+    "lp",
+    "ltd",
+    "nv",
+    "oy",
+    "plc",
+    "pte",
+    "pty",
+    "sa",
+    "sarl",
+    "sas",
+    "se",
+    "spa",
+    "srl",
+    "ug",
+}
+
+_NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+class DiscoveryCache:
+    """LRU cache of discovery results with a time to live."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl: timedelta,
+        max_entries: int = 100_000,
+        shared: SharedState | None = None,
+    ):
+        """Initialize the DiscoveryCache class.
+
+        Names missing locally are looked up in the ``shared`` state.
+        """
+        self.ttl = ttl
+        self.shared = shared
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = connect_sqlite(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS discovery ("
+            "name TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS discovery_accessed_at "
+            "ON discovery (accessed_at)"
+        )
+        self._size = self._db.execute("SELECT COUNT(*) FROM discovery").fetchone()[0]
+
+    @classmethod
+    def from_env(cls, shared: SharedState | None = None) -> "DiscoveryCache | None":
+        """Create the cache configured by the environment.
+
+        Caching is enabled by setting ``DISCOVERY_CACHE_PATH`` or by a ``shared``
+        state, in which case the local tier is kept in memory. Entries expire after
+        the validity window of discovery results.
+        """
+        path = os.getenv("DISCOVERY_CACHE_PATH")
+        if not path and shared is None:
+            return None
+        return cls(
+            path or ":memory:",
+            ttl=timedelta(days=DISCOVERY_VALIDITY_DAYS),
+            max_entries=int(os.getenv("DISCOVERY_CACHE_MAX_ENTRIES") or 100_000),
+            shared=shared,
+        )
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """Normalize a company name to its cache key.
+
+        Case, punctuation, surplus whitespace and trailing legal forms such as
+        GmbH or Inc are ignored, so "ACME GmbH" and "Acme" share an entry.
+        """
+        words = _NON_WORD_PATTERN.sub(" ", name.casefold()).split()
+        while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+            words.pop()
+        return " ".join(words)
+
+    def get(self, name: str) -> tuple[DiscoveryResponse, float] | None:
+        """Return the cached discovery result for ``name``, if still valid.
+
+        The result is returned with the time it was discovered at, as a POSIX
+        timestamp, since it is only valid for the validity window from then on.
+        """
+        key = self.normalize_name(name)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM discovery WHERE name = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] + self.ttl.total_seconds() < now:
+                self._db.execute("DELETE FROM discovery WHERE name = ?", (key,))
+                self._size -= 1
+                row = None
+            if row is not None:
+                self._db.execute(
+                    "UPDATE discovery SET accessed_at = ? WHERE name = ?", (now, key)
+                )
+                self.hits += 1
+                return DiscoveryResponse.model_validate_json(row[0]), row[1]
+        # discovered by another process; shared results expire with their validity
+        entry = (
+            self.shared.get(f"discovery-entry:{key}")
+            if self.shared is not None
+            else None
+        )
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        entry = json.loads(entry)
+        return DiscoveryResponse.model_validate(entry["response"]), entry["created_at"]
+
+    def put(self, name: str, response: DiscoveryResponse):
+        """Store the discovery result for ``name``."""
+        key = self.normalize_name(name)
+        serialized = response.model_dump_json()
+        now = time.time()
+        with self._lock:
+            exists = self._db.execute(
+                "SELECT 1 FROM discovery WHERE name = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO discovery VALUES (?, ?, ?, ?)",
+                (key, serialized, now, now),
+            )
+            if exists is None:
+                self._size += 1
+            self._evict()
+        if self.shared is not None and self.ttl.total_seconds() > 0:
+            self.shared.set(
+                f"discovery-entry:{key}",
+                json.dumps({"response": response.model_dump(), "created_at": now}),
+                self.ttl.total_seconds(),
+            )
+
+    async def get_async(self, name: str) -> tuple[DiscoveryResponse, float] | None:
+        """Return the cached result like ``get``, without blocking the event loop."""
+        if self.shared is not None and self.shared.remote:
+            return await asyncio.to_thread(self.get, name)
+        return self.get(name)
+
+    async def put_async(self, name: str, response: DiscoveryResponse):
+        """Store the result like ``put``, without blocking the event loop."""
+        if self.shared is not None and self.shared.remote:
+            await asyncio.to_thread(self.put, name, response)
+        else:
+            self.put(name, response)
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit, miss and eviction counters and the cache size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": self._size,
+        }
+
+    def _evict(self):
+        surplus = self._size - self.max_entries
+        if surplus > 0:
+            self._db.execute(
+                "DELETE FROM discovery WHERE name IN ("
+                "SELECT name FROM discovery ORDER BY accessed_at LIMIT ?)",
+                (surplus,),
+            )
+            self._size -= surplus
+            self.evictions += surplus
+            logger.debug(f"Evicted {surplus} least recently used discovery results")
@@ -0,0 +1,161 @@
+"""Module for feeding only the changed fields of a company to analytics.
+
+This module keeps a snapshot of the company fields last fed to analytics in a
+local SQLite database, per company id and LinkedIn handle. A snapshot holds a
+digest of every field value, so a freshly scraped company can be diffed against
+it field by field without storing the values themselves. Only the fields that
+changed are fed again, and nothing at all is fed for a company that did not
+change.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from parma_mining.linkedin.model import CompanyModel
+from parma_mining.mining_common.sqlite import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class FeedSnapshotStore:
+    """Field digests of the companies last fed to analytics."""
+
+    def __init__(self, path: str):
+        """Initialize the FeedSnapshotStore class."""
+        self.full_feeds = 0
+        self.delta_feeds = 0
+        self.unchanged = 0
+        self.fields_fed = 0
+        self.fields_skipped = 0
+        self._lock = threading.Lock()
+        self._db = connect_sqlite(path)
+        # snapshots are kept per handle, as a company id can be fed from several
+        # profiles
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS handle_snapshots ("
+            "company_id TEXT NOT NULL, handle TEXT NOT NULL, digests TEXT NOT NULL, "
+            "fed_at REAL NOT NULL, PRIMARY KEY (company_id, handle))"
+        )
+
+    @classmethod
+    def from_env(cls) -> "FeedSnapshotStore | None":
+        """Create the store configured by the environment.
+
+        Delta feeding is enabled by setting ``FEED_SNAPSHOT_PATH``.
+        """
+        path = os.getenv("FEED_SNAPSHOT_PATH")
+        if not path:
+            return None
+        return cls(path)
+
+    @staticmethod
+    def field_digests(fields: dict[str, Any]) -> dict[str, str]:
+        """Return the digest of every field value."""
+        return {
+            field: hashlib.sha256(
+                json.dumps(value, sort_keys=True, default=str).encode()
+            ).hexdigest()[:16]
+            for field, value in fields.items()
+        }
+
+    def get(self, company_id: str, handle: str) -> dict[str, str] | None:
+        """Return the field digests last fed for a company from a handle."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digests FROM handle_snapshots "
+                "WHERE company_id = ? AND handle = ?",
+                (company_id, handle),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, company_id: str, handle: str, digests: dict[str, str]):
+        """Store the field digests of a company that has been fed successfully."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO handle_snapshots VALUES (?, ?, ?, ?)",
+                (
+                    company_id,
+                    handle,
+                    json.dumps(digests, sort_keys=True),
+                    time.time(),
+                ),
+            )
+
+    def record_feed(self, fed: int, total: int):
+        """Record a company for which ``fed`` of its ``total`` fields were fed."""
+        with self._lock:
+            if fed == 0:
+                self.unchanged += 1
+            elif fed == total:
+                self.full_feeds += 1
+            else:
+                self.delta_feeds += 1
+            self.fields_fed += fed
+            self.fields_skipped += total - fed
+
+    def stats(self) -> dict[str, int]:
+        """Return how many companies and fields were fed or skipped."""
+        with self._lock:
+            return {
+                "full_feeds": self.full_feeds,
+                "delta_feeds": self.delta_feeds,
+                "unchanged": self.unchanged,
+                "fields_fed": self.fields_fed,
+                "fields_skipped": self.fields_skipped,
+            }
+
+
+class DeltaFeed:
+    """Delta feeding of the companies of one crawling task."""
+
+    def __init__(self, store: FeedSnapshotStore, force_full: bool = False):
+        """Initialize the DeltaFeed class.
+
+        With ``force_full`` every company is fed in full, and the snapshots are
+        still updated.
+        """
+        self.store = store
+        self.force_full = force_full
+        # digests of the companies fed by this task, stored once the feed succeeded
+        self.pending: dict[tuple[str, str], dict[str, str]] = {}
+
+    def raw_data(
+        self, company_id: str, handle: str, company: CompanyModel
+    ) -> CompanyModel | dict[str, Any] | None:
+        """Return the raw data to feed for a company scraped from ``handle``.
+
+        This is the company itself if it has no snapshot yet, the changed fields
+        only if some of them changed, or None if nothing changed. Fields that were
+        cleared since are fed as None.
+        """
+        fields = company.model_dump()
+        digests = self.store.field_digests(fields)
+        previous = None if self.force_full else self.store.get(company_id, handle)
+        if previous is None:
+            changed = list(fields)
+        else:
+            changed = [
+                field
+                for field, digest in digests.items()
+                if previous.get(field) != digest
+            ]
+        self.store.record_feed(len(changed), len(fields))
+        if not changed:
+            return None
+        self.pending[(company_id, handle)] = digests
+        if len(changed) == len(fields):
+            return company
+        return {field: fields[field] for field in changed}
+
+    def commit(self, failed: Iterable[str] = ()):
+        """Store the snapshots of the companies fed successfully."""
+        failed = set(failed)
+        for (company_id, handle), digests in self.pending.items():
+            if company_id not in failed:
+                self.store.put(company_id, handle, digests)
+        self.pending.clear()
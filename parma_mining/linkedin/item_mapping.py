@@ -0,0 +1,149 @@
+"""Module for mapping Apify dataset items to company fields.
+
+This module contains the declarative spec of where each CompanyModel field is
+found in a dataset item of the Apify actor. At import, the spec is compiled into
+the functions mapping items, which tolerate missing keys and null values at every
+level of an item.
+"""
+from collections.abc import Callable, Iterable
+from operator import itemgetter
+from typing import Any
+
+# "a.b" reads a nested key, "a[].b" collects key b of every element of list a
+ITEM_MAP = {
+    "Source": "apify",
+    "Mappings": [
+        {"Field": "name", "ItemPath": "name"},
+        {"Field": "linkedin_id", "ItemPath": "id"},
+        {"Field": "website", "ItemPath": "websiteUrl"},
+        {"Field": "profile_url", "ItemPath": "url"},
+        {"Field": "ads_rule", "ItemPath": "adsRule"},
+        {"Field": "employee_count", "ItemPath": "employeeCount"},
+        {"Field": "active", "ItemPath": "active"},
+        {"Field": "job_search_url", "ItemPath": "jobSearchUrl"},
+        {"Field": "phone", "ItemPath": "phone.number"},
+        {"Field": "tagline", "ItemPath": "tagline"},
+        {"Field": "description", "ItemPath": "description"},
+        {"Field": "logo_url", "ItemPath": "logoUrl"},
+        {"Field": "follower_count", "ItemPath": "followerCount"},
+        {"Field": "universal_name", "ItemPath": "universalName"},
+        {"Field": "specialities", "ItemPath": "specialities"},
+        {"Field": "headquarter_city", "ItemPath": "headquarter.city"},
+        {"Field": "headquarter_country", "ItemPath": "headquarter.country"},
+        {"Field": "head_quarter_postal_code", "ItemPath": "headquarter.postalCode"},
+        {"Field": "industries", "ItemPath": "industries[].name"},
+        {"Field": "locations", "ItemPath": "groupedLocations[].localizedName"},
+        {"Field": "hashtags", "ItemPath": "hashtag[].displayName"},
+        {"Field": "founded_year", "ItemPath": "foundedOn.year"},
+        {"Field": "founded_month", "ItemPath": "foundedOn.month"},
+        {"Field": "founded_day", "ItemPath": "foundedOn.day"},
+    ],
+}
+
+
+def field_extractor(item_path: str) -> Callable[[dict], Any]:
+    """Build the function reading the value at ``item_path`` from a dataset item.
+
+    Missing keys, null values and values of the wrong type yield None; elements of
+    a list missing the key are skipped.
+    """
+    list_path, is_list, element_path = item_path.partition("[].")
+    keys = list_path.split(".")
+
+    def extract(item: dict) -> Any:
+        value = item
+        for key in keys:
+            if value.__class__ is not dict:
+                return None
+            value = value.get(key)
+        return value
+
+    if not is_list:
+        return extract
+    (element_key,) = element_path.split(".")
+
+    def extract_list(item: dict) -> list | None:
+        elements = extract(item)
+        if elements.__class__ is not list:
+            return None
+        return [
+            element[element_key]
+            for element in elements
+            if element.__class__ is dict and element.get(element_key) is not None
+        ]
+
+    return extract_list
+
+
+def compile_item_map(
+    item_map: dict,
+) -> tuple[Callable[[dict], dict], Callable[[Iterable[dict]], list[dict]]]:
+    """Build functions mapping one or many items from an item map.
+
+    The paths of the map are grouped by their shape: top level keys are read
+    directly, keys of a nested dict such as ``headquarter`` are read after looking
+    up their parent once per item, and lists are collected by their element key.
+    Other paths fall back to a generic extractor.
+    """
+    top: list[tuple[str, str]] = []
+    nested: dict[str, list[tuple[str, str]]] = {}
+    lists: list[tuple[str, str, Callable[[dict], Any], str]] = []
+    other: list[tuple[str, Callable[[dict], Any]]] = []
+    for mapping in item_map["Mappings"]:
+        field, path = mapping["Field"], mapping["ItemPath"]
+        list_path, is_list, element_path = path.partition("[].")
+        match list_path.split("."), is_list:
+            case [key], "":
+                top.append((field, key))
+            case [parent_key, key], "":
+                nested.setdefault(parent_key, []).append((field, key))
+            case [list_key], _ if "." not in element_path:
+                getter = itemgetter(element_path)
+                lists.append((field, list_key, getter, element_path))
+            case _:
+                other.append((field, field_extractor(path)))
+    unset = dict.fromkeys(mapping["Field"] for mapping in item_map["Mappings"])
+    nested_items = list(nested.items())
+
+    def collect(elements: list, key: str) -> list:
+        return [
+            element[key]
+            for element in elements
+            if element.__class__ is dict and element.get(key) is not None
+        ]
+
+    def map_item(item: dict) -> dict:
+        """Map a dataset item of the Apify actor to CompanyModel fields."""
+        fields = unset.copy()
+        get = item.get
+        for field, key in top:
+            fields[field] = get(key)
+        for parent_key, children in nested_items:
+            parent = get(parent_key)
+            if parent.__class__ is dict:
+                for field, key in children:
+                    fields[field] = parent.get(key)
+        for field, list_key, element_getter, key in lists:
+            elements = get(list_key)
+            if elements.__class__ is list:
+                # lists of dicts with the key set are collected in one C level pass
+                try:
+                    values = list(map(element_getter, elements))
+                except (KeyError, TypeError):
+                    values = collect(elements, key)
+                else:
+                    if None in values:
+                        values = [value for value in values if value is not None]
+                fields[field] = values
+        for field, extract in other:
+            fields[field] = extract(item)
+        return fields
+
+    def map_items(items: Iterable[dict]) -> list[dict]:
+        """Map several dataset items to CompanyModel fields."""
+        return list(map(map_item, items))
+
+    return map_item, map_items
+
+
+map_item, map_items = compile_item_map(ITEM_MAP)
@@ -0,0 +1,230 @@
+"""Module for running crawling tasks in the background.
+
+This module keeps track of crawling jobs that are executed as background tasks of
+the event loop, so that the API can accept a task right away and report its
+progress later on. With a shared state, snapshots of the jobs are published to
+it, so the API reports the progress of jobs run by worker processes.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+
+from parma_mining.linkedin.model import JobModel
+from parma_mining.mining_common.shared_state import SharedState
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"
+
+# snapshots of jobs are kept in the shared state for this long
+JOB_STATE_TTL_SECONDS = 7 * 24 * 3600
+
+
+class Job:
+    """Progress of a single crawling job."""
+
+    def __init__(
+        self,
+        task_id: int,
+        job_id: str | None = None,
+        state: SharedState | None = None,
+    ):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.task_id = task_id
+        self.state = state
+        self.status = JOB_QUEUED
+        self.total = 0
+        self.processed = 0
+        self.error: str | None = None
+        self.created_at = datetime.now()
+        self.finished_at: datetime | None = None
+        self.eta: datetime | None = None
+
+    def set_total(self, total: int):
+        """Set the number of urls the job has to process."""
+        self.total = total
+        self.publish()
+
+    def advance(self, count: int = 1):
+        """Mark ``count`` urls of the job as processed."""
+        self.processed += count
+        self.publish()
+
+    def set_eta(self, seconds: float | None):
+        """Set the expected completion of the job to ``seconds`` from now."""
+        self.eta = (
+            datetime.now() + timedelta(seconds=seconds) if seconds is not None else None
+        )
+        self.publish()
+
+    async def report(self, total: int, processed: int, eta_seconds: float | None):
+        """Set the progress and expected completion of the job at once.
+
+        A single snapshot is published, without blocking the event loop on a remote
+        shared state.
+        """
+        self.total = total
+        self.processed = processed
+        self.eta = (
+            datetime.now() + timedelta(seconds=eta_seconds)
+            if eta_seconds is not None
+            else None
+        )
+        await self.publish_async()
+
+    def publish(self):
+        """Publish a snapshot of the job to the shared state, if any."""
+        if self.state is not None:
+            self.state.set(
+                f"job:{self.job_id}",
+                self.to_model().model_dump_json(),
+                JOB_STATE_TTL_SECONDS,
+            )
+
+    async def publish_async(self):
+        """Publish a snapshot of the job without blocking the event loop."""
+        if self.state is None:
+            return
+        if not self.state.remote:
+            self.publish()
+            return
+        # the snapshot is taken on the loop, only the write runs in a thread
+        await asyncio.to_thread(
+            self.state.set,
+            f"job:{self.job_id}",
+            self.to_model().model_dump_json(),
+            JOB_STATE_TTL_SECONDS,
+        )
+
+    def to_model(self) -> JobModel:
+        """Return a snapshot of the job."""
+        return JobModel(
+            job_id=self.job_id,
+            task_id=self.task_id,
+            status=self.status,
+            total=self.total,
+            processed=self.processed,
+            error=self.error,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            eta=self.eta,
+        )
+
+
+class JobManager:
+    """Run crawling jobs as background tasks and keep track of their state."""
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        max_jobs: int | None = None,
+        state: SharedState | None = None,
+    ):
+        """Initialize the JobManager class.
+
+        Snapshots of the jobs are published to ``state``, if given.
+        """
+        self.state = state
+        # jobs beyond this number wait in the queued state
+        self.max_workers = max_workers or int(os.getenv("CRAWL_WORKERS") or 4)
+        # finished jobs beyond this number are forgotten, oldest first
+        self.max_jobs = max_jobs or int(os.getenv("CRAWL_JOBS_RETAINED") or 1000)
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(
+        self,
+        task_id: int,
+        fn: Callable[[Job], Awaitable[object]],
+        job_id: str | None = None,
+    ) -> Job:
+        """Schedule ``fn`` on the running event loop and return its job.
+
+        ``fn`` receives the job so it can report its progress. A ``job_id`` given
+        continues the job enqueued by another process.
+        """
+        job = self._add(task_id, job_id)
+        task = asyncio.create_task(self._run(job, fn))
+        # keep a reference, the event loop only holds weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.debug(f"Queued job {job.job_id} for task {task_id}")
+        return job
+
+    def enqueue(self, task_id: int) -> Job:
+        """Return a queued job for a task run by a worker process.
+
+        The worker finds the job by the task with ``job_id_for_task``.
+        """
+        job = self._add(task_id)
+        if self.state is not None:
+            self.state.set(f"task-job:{task_id}", job.job_id, JOB_STATE_TTL_SECONDS)
+        return job
+
+    def job_id_for_task(self, task_id: int) -> str | None:
+        """Return the id of the job enqueued for a task, if any."""
+        if self.state is None:
+            return None
+        return self.state.get(f"task-job:{task_id}")
+
+    def get(self, job_id: str) -> Job | None:
+        """Return the job with the given id, if it is known."""
+        return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str) -> JobModel | None:
+        """Return the state of a job run by this or, if shared, another process."""
+        if self.state is not None:
+            published = self.state.get(f"job:{job_id}")
+            if published is not None:
+                return JobModel.model_validate_json(published)
+        job = self._jobs.get(job_id)
+        return job.to_model() if job is not None else None
+
+    async def shutdown(self, wait: bool = True):
+        """Wait for the submitted jobs or, if not requested, cancel them."""
+        if not self._tasks:
+            return
+        if not wait:
+            for task in self._tasks:
+                task.cancel()
+        await asyncio.wait(self._tasks)
+
+    def _add(self, task_id: int, job_id: str | None = None) -> Job:
+        job = Job(task_id, job_id=job_id, state=self.state)
+        self._jobs[job.job_id] = job
+        self._evict()
+        job.publish()
+        return job
+
+    async def _run(self, job: Job, fn: Callable[[Job], Awaitable[object]]):
+        async with self._semaphore:
+            job.status = JOB_RUNNING
+            await job.publish_async()
+            try:
+                await fn(job)
+                job.status = JOB_FINISHED
+            except Exception as e:
+                logger.error(f"Job {job.job_id} for task {job.task_id} failed: {e}")
+                job.error = str(e)
+                job.status = JOB_FAILED
+            finally:
+                job.finished_at = datetime.now()
+                job.eta = None
+                await job.publish_async()
+
+    def _evict(self):
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in (JOB_FINISHED, JOB_FAILED)
+        ]
+        for job_id in finished[: max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
@@ -2,10 +2,10 @@
 
 This module contains the data models for the LinkedIn module.
 """
-import json
 from datetime import datetime
+from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CompanyModel(BaseModel):
@@ -36,11 +36,12 @@ class CompanyModel(BaseModel):
     founded_month: int | None = None
     founded_day: int | None = None
 
-    def updated_model_dump(self) -> str:
-        """Dump the CompanyModel instance to a JSON string."""
-        # Convert other objects to string representation
-        json_serializable_dict = self.model_dump()
-        return json.dumps(json_serializable_dict, default=str)
+
+class ScrapedCompanyModel(BaseModel):
+    """A scraped company tagged with the profile url it was requested by."""
+
+    source_url: str | None
+    company: CompanyModel
 
 
 class DiscoveryRequest(BaseModel):
@@ -68,6 +69,10 @@ class CompaniesRequest(BaseModel):
 
     task_id: int
     companies: dict[str, dict[str, list[str]]]
+    # feed every company in full, even if delta feeding is enabled
+    force_full: bool = False
+    # weight of the task when sharing the scraping capacity with other tasks
+    priority: int = Field(default=1, ge=1, le=100)
 
 
 class ResponseModel(BaseModel):
@@ -75,7 +80,8 @@ class ResponseModel(BaseModel):
 
     source_name: str
     company_id: str
-    raw_data: CompanyModel
+    # only the changed fields when feeding a delta
+    raw_data: CompanyModel | dict[str, Any]
 
 
 class ErrorInfoModel(BaseModel):
@@ -90,3 +96,18 @@ class CrawlingFinishedInputModel(BaseModel):
 
     task_id: int
     errors: dict[str, ErrorInfoModel] | None = None
+
+
+class JobModel(BaseModel):
+    """Status of a crawling job running in the background."""
+
+    job_id: str
+    task_id: int
+    status: str
+    total: int
+    processed: int
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+    # expected completion of a running job
+    eta: datetime | None = None
@@ -0,0 +1,181 @@
+"""Module for managing the runs of the Apify actor.
+
+This module starts actor runs without holding a request open until they finish.
+Every run is started with a timeout and memory limit, tracked while it is in
+flight and awaited by long polling the Apify API, which answers as soon as the
+run has finished or after a minute at most. Runs still going past their deadline
+are aborted, so a stuck run cannot hold a run slot forever.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from apify_client import ApifyClientAsync
+
+from parma_mining.linkedin.apify_compat import ApifyApiError
+from parma_mining.mining_common.exceptions import CrawlingError
+from parma_mining.mining_common.metrics import STAGE_ACTOR_RUN, observe
+from parma_mining.mining_common.rate_control import Upstream
+
+logger = logging.getLogger(__name__)
+
+RUN_SUCCEEDED = "SUCCEEDED"
+TERMINAL_RUN_STATUSES = (RUN_SUCCEEDED, "FAILED", "TIMED-OUT", "ABORTED")
+
+# Apify answers a request waiting for a run after 60 seconds at the latest
+MAX_WAIT_SECONDS = 60
+
+
+class RunManager:
+    """Start, track and await the runs of Apify actors."""
+
+    # a run is aborted once it is this long past its own timeout
+    ABORT_GRACE_SECONDS = 60
+
+    def __init__(
+        self,
+        upstream: Upstream,
+        max_concurrent_runs: int = 4,
+        timeout_seconds: int = 600,
+        memory_mbytes: int | None = None,
+    ):
+        """Initialize the RunManager class.
+
+        Runs are started with ``timeout_seconds`` and ``memory_mbytes`` (the
+        default of the actor if None). At most ``max_concurrent_runs`` runs are in
+        flight at once, since every run takes a share of the Apify memory quota.
+        All requests to the Apify API are paced by ``upstream``.
+        """
+        self.upstream = upstream
+        self.max_concurrent_runs = max_concurrent_runs
+        self.timeout_seconds = timeout_seconds
+        self.memory_mbytes = memory_mbytes
+        self._semaphore = asyncio.Semaphore(max_concurrent_runs)
+        # deadline of every run in flight by run id
+        self.in_flight: dict[str, float] = {}
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.aborted = 0
+
+    async def _request(self, send: Callable[[], Awaitable[Any]]) -> Any:
+        await self.upstream.acquire_async()
+        try:
+            result = await send()
+        except ApifyApiError as e:
+            self.upstream.record_status(e.status_code)
+            raise
+        except Exception:
+            self.upstream.record_failure()
+            raise
+        except BaseException:
+            self.upstream.record_cancelled()
+            raise
+        self.upstream.record_success()
+        return result
+
+    async def start(
+        self, client: ApifyClientAsync, actor_id: str, run_input: dict
+    ) -> dict:
+        """Start a run of an actor and return it without waiting for it."""
+        run = await self._request(
+            lambda: client.actor(actor_id).start(
+                run_input=run_input,
+                timeout_secs=self.timeout_seconds,
+                memory_mbytes=self.memory_mbytes,
+            )
+        )
+        self.in_flight[run["id"]] = (
+            time.monotonic() + self.timeout_seconds + self.ABORT_GRACE_SECONDS
+        )
+        self.started += 1
+        logger.debug(f"Started run {run['id']} of actor {actor_id}")
+        return run
+
+    async def wait(self, client: ApifyClientAsync, run: dict) -> dict:
+        """Wait until a run has finished and return it.
+
+        The run is aborted if it has not finished by its deadline. The run is
+        returned in whatever state it ended, as even a run that timed out or was
+        aborted keeps the items scraped so far in its dataset.
+
+        Raises:
+            CrawlingError: If the run cannot be found anymore.
+        """
+        run_id = run["id"]
+        deadline = self.in_flight.get(run_id) or (
+            time.monotonic() + self.timeout_seconds + self.ABORT_GRACE_SECONDS
+        )
+        try:
+            while run["status"] not in TERMINAL_RUN_STATUSES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Aborting run {run_id}, it is past its deadline")
+                    run = await self._request(lambda: client.run(run_id).abort())
+                    self.aborted += 1
+                    break
+                wait_secs = min(MAX_WAIT_SECONDS, math.ceil(remaining))
+                finished = await self._request(
+                    lambda: client.run(run_id).wait_for_finish(wait_secs=wait_secs)
+                )
+                if finished is None:
+                    raise CrawlingError(f"Run {run_id} does not exist")
+                run = finished
+        finally:
+            self.in_flight.pop(run_id, None)
+
+        if run["status"] == RUN_SUCCEEDED:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            logger.warning(f"Run {run_id} ended with status {run['status']}")
+        return run
+
+    async def run(
+        self,
+        client: ApifyClientAsync,
+        actor_id: str,
+        run_input: dict,
+        on_start: Callable[[str], None] | None = None,
+    ) -> dict:
+        """Start a run of an actor and wait until it has finished.
+
+        The caller waits for a free run slot first, which is held until the run
+        has finished. ``on_start`` is called with the id of the run once it has
+        been started, e.g. to resume it after a restart.
+        """
+        async with self._semaphore:
+            with observe(STAGE_ACTOR_RUN):
+                run = await self.start(client, actor_id, run_input)
+                if on_start is not None:
+                    on_start(run["id"])
+                return await self.wait(client, run)
+
+    async def resume(self, client: ApifyClientAsync, run_id: str) -> dict | None:
+        """Wait until a run started earlier has finished and return it.
+
+        Returns None if the run does not exist anymore.
+        """
+        async with self._semaphore:
+            with observe(STAGE_ACTOR_RUN):
+                run = await self._request(lambda: client.run(run_id).get())
+                if run is None:
+                    return None
+                logger.debug(f"Resuming run {run_id}")
+                self.in_flight[run_id] = (
+                    time.monotonic() + self.timeout_seconds + self.ABORT_GRACE_SECONDS
+                )
+                return await self.wait(client, run)
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of runs in flight and their outcomes so far."""
+        return {
+            "in_flight": len(self.in_flight),
+            "started": self.started,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "aborted": self.aborted,
+        }
@@ -0,0 +1,207 @@
+"""Module for sharing the scraping capacity between crawling tasks.
+
+This module schedules the chunks of concurrent crawling tasks onto the actor runs
+that may run at the same time, with weighted fair queuing. Every chunk is tagged
+with a virtual finish time, its number of profiles divided by the priority of its
+task, and free slots go to the chunk with the earliest tag. A small task thus
+gets its chunks scheduled right away, while a large one is interleaved with the
+others and never holds more than its concurrency cap.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class _TaskShare:
+    """Scheduling state of one task."""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.last_finish = 0.0
+        self.running = 0
+        self.waiting = 0
+        # profiles left to crawl, as last estimated
+        self.remaining: int | None = None
+        # tasks crawled in parallel by several jobs are registered once per job
+        self.registrations = 1
+
+
+class TaskScheduler:
+    """Weighted fair queue of the chunks of crawling tasks."""
+
+    def __init__(
+        self,
+        capacity: int,
+        max_per_task: int,
+        default_seconds_per_profile: float = 10.0,
+    ):
+        """Initialize the TaskScheduler class.
+
+        At most ``capacity`` chunks are crawled at a time, and at most
+        ``max_per_task`` of them belong to the same task.
+        ``default_seconds_per_profile`` estimates the time to crawl a profile until
+        the duration of actual chunks has been recorded.
+        """
+        self.capacity = capacity
+        self.max_per_task = max_per_task
+        self.default_seconds_per_profile = default_seconds_per_profile
+        self.virtual_time = 0.0
+        self.running = 0
+        self._tasks: dict[int, _TaskShare] = {}
+        self._waiters: list[tuple[float, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # running totals used to estimate the time needed per profile
+        self._chunk_seconds = 0.0
+        self._chunk_profiles = 0
+
+    @classmethod
+    def from_env(cls, capacity: int) -> "TaskScheduler":
+        """Create the scheduler configured by the environment.
+
+        A task crawls at most ``CRAWL_TASK_MAX_CONCURRENCY`` chunks at a time, by
+        default half of the ``capacity``.
+        """
+        max_per_task = int(
+            os.getenv("CRAWL_TASK_MAX_CONCURRENCY") or max(1, capacity // 2)
+        )
+        return cls(capacity, max_per_task=max_per_task)
+
+    def register(self, task_id: int, priority: int = 1):
+        """Add a task to the scheduling, weighted by its ``priority``."""
+        share = self._tasks.get(task_id)
+        if share is None:
+            self._tasks[task_id] = _TaskShare(priority)
+            return
+        share.registrations += 1
+        share.priority = max(share.priority, priority)
+
+    def unregister(self, task_id: int):
+        """Remove a task from the scheduling once it is done."""
+        share = self._tasks.get(task_id)
+        if share is None:
+            return
+        share.registrations -= 1
+        if share.registrations == 0:
+            del self._tasks[task_id]
+
+    @asynccontextmanager
+    async def slot(self, task_id: int, profiles: int) -> AsyncIterator[None]:
+        """Wait for the turn of a chunk of ``profiles`` and hold a slot meanwhile.
+
+        The time the slot was held is recorded, to estimate the completion of the
+        tasks.
+        """
+        await self._acquire(task_id, profiles)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(task_id)
+            self._chunk_seconds += time.monotonic() - started
+            self._chunk_profiles += profiles
+
+    def estimate(self, task_id: int, remaining: int) -> float | None:
+        """Estimate the seconds until ``remaining`` profiles of a task are crawled.
+
+        The task gets the share of the capacity given by its priority, up to its
+        concurrency cap. None if the task is not scheduled.
+        """
+        share = self._tasks.get(task_id)
+        if share is None:
+            return None
+        share.remaining = remaining
+        return self._eta_seconds(share)
+
+    def _eta_seconds(self, share: _TaskShare) -> float | None:
+        if share.remaining is None:
+            return None
+        priorities = sum(task.priority for task in self._tasks.values())
+        parallel = min(
+            self.max_per_task, max(1.0, self.capacity * share.priority / priorities)
+        )
+        return share.remaining * self.seconds_per_profile() / parallel
+
+    def seconds_per_profile(self) -> float:
+        """Return the estimated seconds to crawl a profile within one slot."""
+        if self._chunk_profiles == 0:
+            return self.default_seconds_per_profile
+        return self._chunk_seconds / self._chunk_profiles
+
+    def stats(self) -> dict:
+        """Return the slots in use and the share of every scheduled task."""
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "waiting": len(self._waiters),
+            "seconds_per_profile": self.seconds_per_profile(),
+            "tasks": {
+                task_id: {
+                    "priority": share.priority,
+                    "running": share.running,
+                    "waiting": share.waiting,
+                    "eta_seconds": self._eta_seconds(share),
+                }
+                for task_id, share in self._tasks.items()
+            },
+        }
+
+    async def _acquire(self, task_id: int, profiles: int):
+        if task_id not in self._tasks:
+            self.register(task_id)
+        share = self._tasks[task_id]
+        finish = max(self.virtual_time, share.last_finish) + max(profiles, 1) / max(
+            share.priority, 1
+        )
+        share.last_finish = finish
+        share.waiting += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (finish, next(self._sequence), task_id, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # granted while being cancelled, pass the slot on
+                self._release(task_id)
+            else:
+                share.waiting -= 1
+                self._waiters = [
+                    waiter for waiter in self._waiters if waiter[3] is not future
+                ]
+                heapq.heapify(self._waiters)
+            raise
+
+    def _release(self, task_id: int):
+        self.running -= 1
+        share = self._tasks.get(task_id)
+        if share is not None:
+            share.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        # chunks of tasks at their cap wait for a chunk of the same task to end
+        capped = []
+        while self._waiters and self.running < self.capacity:
+            waiter = heapq.heappop(self._waiters)
+            finish, _, task_id, future = waiter
+            if future.done():
+                # cancelled while waiting; its chunk updates the counts on resuming
+                continue
+            share = self._tasks[task_id]
+            if share.running >= self.max_per_task:
+                capped.append(waiter)
+                continue
+            share.waiting -= 1
+            share.running += 1
+            self.running += 1
+            self.virtual_time = max(self.virtual_time, finish)
+            future.set_result(None)
+        for waiter in capped:
+            heapq.heappush(self._waiters, waiter)
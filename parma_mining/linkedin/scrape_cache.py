@@ -0,0 +1,231 @@
+"""Module for caching scraped LinkedIn profiles.
+
+This module stores the raw dataset items of the Apify actor in a local SQLite
+database. Items are stored content addressed by their digest and indexed by the
+universal name and LinkedIn id of the company, so profiles scraped recently can be
+served without starting another actor run. With a shared state, items are stored
+there as well, so profiles scraped by other processes are served too.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from parma_mining.mining_common.shared_state import SharedState
+from parma_mining.mining_common.sqlite import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeCache:
+    """LRU cache of raw Apify items with a freshness window."""
+
+    def __init__(
+        self,
+        path: str,
+        freshness_seconds: float,
+        default_seconds_per_item: float = 10.0,
+        max_entries: int = 100_000,
+        shared: SharedState | None = None,
+    ):
+        """Initialize the ScrapeCache class.
+
+        ``default_seconds_per_item`` estimates the actor time saved by a hit until
+        the duration of an actual run has been recorded. Beyond ``max_entries``
+        keys, the least recently used are evicted. Items missing locally are looked
+        up in the ``shared`` state.
+        """
+        self.freshness_seconds = freshness_seconds
+        self.shared = shared
+        self.default_seconds_per_item = default_seconds_per_item
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_actor_seconds = 0.0
+        # running totals used to estimate the actor time needed per profile
+        self._actor_seconds = 0.0
+        self._actor_items = 0
+        self._lock = threading.Lock()
+        self._db = connect_sqlite(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items (digest TEXT PRIMARY KEY, item TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, digest TEXT NOT NULL, scraped_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_scraped_at ON entries (scraped_at)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+        )
+        self._size = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @classmethod
+    def from_env(cls, shared: SharedState | None = None) -> "ScrapeCache | None":
+        """Create the cache configured by the environment.
+
+        Caching is enabled by setting ``SCRAPE_CACHE_PATH`` or by a ``shared``
+        state, in which case the local tier is kept in memory. Profiles are served
+        from the cache for ``SCRAPE_CACHE_FRESHNESS_HOURS`` hours after they were
+        scraped, and at most ``SCRAPE_CACHE_MAX_ENTRIES`` keys are kept.
+        """
+        path = os.getenv("SCRAPE_CACHE_PATH")
+        if not path and shared is None:
+            return None
+        freshness_hours = float(os.getenv("SCRAPE_CACHE_FRESHNESS_HOURS") or 24)
+        return cls(
+            path or ":memory:",
+            freshness_seconds=freshness_hours * 3600,
+            max_entries=int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES") or 100_000),
+            shared=shared,
+        )
+
+    @staticmethod
+    def item_keys(item: dict) -> list[str]:
+        """Return the keys a raw item is indexed by."""
+        keys = []
+        if item.get("universalName"):
+            keys.append(str(item["universalName"]).lower())
+        if item.get("id"):
+            keys.append(str(item["id"]).lower())
+        return keys
+
+    def get(self, handle: str) -> dict | None:
+        """Return the fresh raw item for a universal name or LinkedIn id."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT items.item FROM entries JOIN items USING (digest) "
+                "WHERE entries.key = ? AND entries.scraped_at >= ?",
+                (handle, now - self.freshness_seconds),
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, handle)
+                )
+        item = row[0] if row is not None else None
+        if item is None and self.shared is not None:
+            # scraped by another process; shared items expire when no longer fresh
+            item = self.shared.get(f"scrape:{handle}")
+        with self._lock:
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_actor_seconds += self._seconds_per_item()
+        return json.loads(item)
+
+    def put(self, item: dict):
+        """Store a freshly scraped raw item."""
+        keys = self.item_keys(item)
+        if not keys:
+            return
+        serialized = json.dumps(item, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(serialized.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            replaced = {
+                key: row[0]
+                for key in keys
+                for row in self._db.execute(
+                    "SELECT digest FROM entries WHERE key = ?", (key,)
+                )
+            }
+            self._db.execute(
+                "INSERT OR IGNORE INTO items VALUES (?, ?)", (digest, serialized)
+            )
+            for key in keys:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    (key, digest, now, now),
+                )
+            self._size += len(keys) - len(replaced)
+            dropped = set(replaced.values())
+            dropped |= self._purge(now - self.freshness_seconds)
+            dropped |= self._evict()
+            # drop previous versions that are no longer referenced by any key
+            for old_digest in dropped - {digest}:
+                self._db.execute(
+                    "DELETE FROM items WHERE digest = ? AND NOT EXISTS "
+                    "(SELECT 1 FROM entries WHERE digest = ?)",
+                    (old_digest, old_digest),
+                )
+            self._db.execute("COMMIT")
+        if self.shared is not None and self.freshness_seconds > 0:
+            for key in keys:
+                self.shared.set(f"scrape:{key}", serialized, self.freshness_seconds)
+
+    async def get_async(self, handle: str) -> dict | None:
+        """Return the fresh item like ``get``, without blocking the event loop."""
+        if self.shared is not None and self.shared.remote:
+            return await asyncio.to_thread(self.get, handle)
+        return self.get(handle)
+
+    async def put_async(self, item: dict):
+        """Store the item like ``put``, without blocking the event loop."""
+        if self.shared is not None and self.shared.remote:
+            await asyncio.to_thread(self.put, item)
+        else:
+            self.put(item)
+
+    def record_run(self, actor_seconds: float, items: int):
+        """Record the duration of an actor run that scraped ``items`` profiles."""
+        if items <= 0:
+            return
+        with self._lock:
+            self._actor_seconds += actor_seconds
+            self._actor_items += items
+
+    def stats(self) -> dict[str, float]:
+        """Return the hit ratio, the actor seconds saved and the cache size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "saved_actor_seconds": self.saved_actor_seconds,
+                "evictions": self.evictions,
+                "size": self._size,
+            }
+
+    # both return the digests of the entries they delete
+    def _purge(self, oldest: float) -> set[str]:
+        stale = self._db.execute(
+            "SELECT key, digest FROM entries WHERE scraped_at < ?", (oldest,)
+        ).fetchall()
+        if stale:
+            self._db.execute("DELETE FROM entries WHERE scraped_at < ?", (oldest,))
+            self._size -= len(stale)
+        return {digest for _, digest in stale}
+
+    def _evict(self) -> set[str]:
+        surplus = self._size - self.max_entries
+        if surplus <= 0:
+            return set()
+        evicted = self._db.execute(
+            "SELECT key, digest FROM entries ORDER BY accessed_at LIMIT ?", (surplus,)
+        ).fetchall()
+        self._db.executemany(
+            "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted]
+        )
+        self._size -= len(evicted)
+        self.evictions += len(evicted)
+        logger.debug(f"Evicted {len(evicted)} least recently used scraped items")
+        return {digest for _, digest in evicted}
+
+    def _seconds_per_item(self) -> float:
+        if self._actor_items == 0:
+            return self.default_seconds_per_item
+        return self._actor_seconds / self._actor_items
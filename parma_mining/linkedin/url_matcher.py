@@ -0,0 +1,99 @@
+"""Module for matching search results to LinkedIn company profiles.
+
+This module picks the LinkedIn company profile belonging to a company name out
+of the urls returned by a web search. Candidates are scored by how well their
+slug matches the name, and the search results are consumed lazily, so no further
+result pages are fetched once a confident match has been found.
+"""
+import logging
+import os
+import re
+import urllib.parse
+from collections.abc import Iterable
+from difflib import SequenceMatcher
+
+from parma_mining.linkedin.discovery_cache import LEGAL_SUFFIXES, DiscoveryCache
+
+logger = logging.getLogger(__name__)
+
+COMPANY_URL_PATTERN = re.compile(
+    r"^https?://(?:[\w-]+\.)?linkedin\.com/company/([^/?#\s]+)", re.IGNORECASE
+)
+_SLUG_SEPARATOR_PATTERN = re.compile(r"[\W_]+")
+
+# weight of the share of name words found in the slug, below an exact match
+TOKEN_OVERLAP_WEIGHT = 0.9
+
+
+class LinkedinUrlMatcher:
+    """Rank LinkedIn company urls by how well they match a company name."""
+
+    def __init__(
+        self, confident_score: float | None = None, min_score: float | None = None
+    ):
+        """Initialize the LinkedinUrlMatcher class.
+
+        A candidate scoring at least ``confident_score`` is accepted right away;
+        otherwise the best candidate scoring at least ``min_score`` is chosen.
+        """
+        self.confident_score = confident_score or float(
+            os.getenv("DISCOVERY_CONFIDENT_SCORE") or 0.95
+        )
+        self.min_score = min_score or float(os.getenv("DISCOVERY_MIN_SCORE") or 0.5)
+
+    @staticmethod
+    def slug(url: str) -> str | None:
+        """Return the normalized company slug of a url, if it is a company profile."""
+        match = COMPANY_URL_PATTERN.match(url.strip())
+        if match is None:
+            return None
+        return urllib.parse.unquote(match.group(1)).strip().lower() or None
+
+    @staticmethod
+    def company_url(slug: str) -> str:
+        """Return the canonical profile url of a company slug."""
+        return f"https://www.linkedin.com/company/{slug}"
+
+    @staticmethod
+    def _slug_words(slug: str) -> list[str]:
+        words = _SLUG_SEPARATOR_PATTERN.sub(" ", slug).split()
+        while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+            words.pop()
+        return words
+
+    def score(self, name: str, slug: str) -> float:
+        """Return how well a slug matches a company name, between 0 and 1."""
+        name_words = DiscoveryCache.normalize_name(name).split()
+        slug_words = self._slug_words(slug)
+        if not name_words or not slug_words:
+            return 0.0
+        compact_name = "".join(name_words)
+        compact_slug = "".join(slug_words)
+        if compact_name == compact_slug:
+            return 1.0
+        overlap = len(set(name_words) & set(slug_words)) / len(set(name_words))
+        ratio = SequenceMatcher(None, compact_name, compact_slug).ratio()
+        return max(ratio, TOKEN_OVERLAP_WEIGHT * overlap)
+
+    def best_match(self, name: str, urls: Iterable[str]) -> str | None:
+        """Return the profile url matching ``name`` best among ``urls``.
+
+        ``urls`` is consumed only up to the first confident match. Of candidates
+        with the same score, the one found first wins.
+        """
+        best_url, best_score = None, 0.0
+        seen = set()
+        for url in urls:
+            slug = self.slug(url)
+            if slug is None or slug in seen:
+                continue
+            seen.add(slug)
+            score = self.score(name, slug)
+            logger.debug(f"Candidate {url} scores {score:.2f} for {name}")
+            if score > best_score:
+                best_url, best_score = self.company_url(slug), score
+            if score >= self.confident_score:
+                break
+        if best_score < self.min_score:
+            return None
+        return best_url
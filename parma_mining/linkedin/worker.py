@@ -0,0 +1,82 @@
+"""Worker process crawling the tasks queued by the API.
+
+With ``CRAWL_MODE=queue`` the API only queues the companies of a task, and any
+number of worker processes started by ``python -m parma_mining.linkedin.worker``
+crawl them. The workers share the crawl queue at ``CRAWL_QUEUE_PATH``, a SQLite
+database on the same host as the API, and the rate limits, caches and job states
+at ``SHARED_STATE_URL``. Every worker claims
+the profiles of a task in chunks, so a large task is crawled by all of them.
+"""
+import asyncio
+import logging
+import os
+import signal
+
+from parma_mining.linkedin.api import main as api
+from parma_mining.linkedin.crawl_queue import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+
+def submit_task(task: QueuedTask, running: set[int]):
+    """Crawl a queued task as a job, continuing the job the API has enqueued."""
+    running.add(task.task_id)
+    job = api.job_manager.submit(
+        task.task_id,
+        lambda job: api.run_task(task, job),
+        job_id=api.job_manager.job_id_for_task(task.task_id),
+    )
+    logger.info(f"Crawling task {task.task_id} as job {job.job_id}")
+
+
+async def run_worker(stop: asyncio.Event, poll_seconds: float | None = None):
+    """Crawl the queued tasks until ``stop`` is set.
+
+    The queue is polled every ``poll_seconds`` for tasks with open items, taking up
+    to ``CRAWL_WORKERS`` tasks at a time.
+
+    Raises:
+        RuntimeError: If ``CRAWL_MODE`` is not ``queue``, as the tasks would then
+            also be resumed by the lifespan of the API, or if the crawl queue or
+            the state is not shared, see ``check_crawl_mode``.
+    """
+    if api.crawl_mode != api.CRAWL_MODE_QUEUE:
+        raise RuntimeError(
+            f"Workers only run with CRAWL_MODE={api.CRAWL_MODE_QUEUE}, "
+            f"not {api.crawl_mode}"
+        )
+    poll_seconds = poll_seconds or float(os.getenv("WORKER_POLL_SECONDS") or 1)
+    # tasks of this worker that have not finished yet
+    running: set[int] = set()
+    async with api.lifespan(api.app):
+        while not stop.is_set():
+            running &= {task.task_id for task in api.crawl_queue.unfinished_tasks()}
+            for task in api.crawl_queue.runnable_tasks():
+                if len(running) >= api.job_manager.max_workers:
+                    break
+                if task.task_id not in running:
+                    submit_task(task, running)
+            try:
+                await asyncio.wait_for(stop.wait(), poll_seconds)
+            except TimeoutError:
+                pass
+        # unfinished tasks are taken over by the other workers once the leases
+        # of this one have expired
+        logger.info("Stopping the worker")
+
+
+def main():
+    """Run a worker until it receives SIGTERM or SIGINT."""
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        await run_worker(stop)
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
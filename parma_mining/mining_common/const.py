@@ -5,5 +5,15 @@ HTTP_400 = 400
 HTTP_401 = 401
 HTTP_403 = 403
 HTTP_404 = 404
+HTTP_405 = 405
 HTTP_422 = 422
+HTTP_429 = 429
 HTTP_500 = 500
+HTTP_501 = 501
+HTTP_503 = 503
+
+# Number of days a discovery result stays valid
+DISCOVERY_VALIDITY_DAYS = 180
+
+# Media type of streamed responses with one JSON document per line
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
@@ -50,3 +50,9 @@ class ClientUnauthorizedError(ClientError):
     """Custom exception for unauthorized client related issues."""
 
     pass
+
+
+class CircuitOpenError(BaseError):
+    """Custom exception for requests to an upstream whose circuit is open."""
+
+    pass
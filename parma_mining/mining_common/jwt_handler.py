@@ -1,10 +1,16 @@
 """Module for JWT (JSON Web Token) handling.
 
 This module contains the JWTHandler class which is designed to verify JWTs. The
-verification process supports shared secret keys to enable authentication.
+verification process supports shared secret keys to enable authentication. Tokens
+that were verified once are kept in a TokenCache until they expire, so repeated
+requests with the same token skip the signature verification.
 """
+import hashlib
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
@@ -12,6 +18,72 @@ from jose.exceptions import ExpiredSignatureError, JWTError
 logger = logging.getLogger(__name__)
 
 
+class TokenCache:
+    """LRU cache of the claims of verified tokens.
+
+    Entries are keyed by the SHA-256 digest of the token, so no token is kept in
+    memory, and expire with the ``exp`` claim of their token. Tokens without an
+    ``exp`` claim expire after ``default_ttl`` seconds.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300):
+        """Initialize the TokenCache class."""
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> str:
+        """Return the cache key of a token."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        """Return the claims of a verified token, if it has not expired yet."""
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, claims: dict):
+        """Store the claims of a token that has just been verified."""
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, int | float):
+            expires_at = time.time() + self.default_ttl
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Forget all cached tokens."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit, miss and eviction counters and the cache size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
 class JWTHandler:
     """A handler for verifying JWTs."""
 
@@ -19,11 +91,17 @@ class JWTHandler:
         os.getenv("PARMA_SHARED_SECRET_KEY") or "PARMA_SHARED_SECRET_KEY"
     )
     ALGORITHM: str = "HS256"
+    token_cache = TokenCache(
+        max_entries=int(os.getenv("JWT_CACHE_MAX_ENTRIES") or 1024),
+        default_ttl=float(os.getenv("JWT_CACHE_DEFAULT_TTL_SECONDS") or 300),
+    )
 
     @staticmethod
     def verify_jwt(token: str) -> bool:
         """Verify a JWT using the shared secret key.
 
+        Tokens found in the token cache are accepted without decoding them again.
+
         Args:
             token: The JWT token to verify.
 
@@ -31,10 +109,14 @@ class JWTHandler:
             True if the verification is successful.
             False otherwise.
         """
+        if JWTHandler.token_cache.get(token) is not None:
+            return True
         try:
-            jwt.decode(
+            claims = jwt.decode(
                 token, JWTHandler.SHARED_SECRET_KEY, algorithms=[JWTHandler.ALGORITHM]
             )
+            if isinstance(claims, dict):
+                JWTHandler.token_cache.put(token, claims)
             return True
         except ExpiredSignatureError:
             logger.error("JWT has expired.")
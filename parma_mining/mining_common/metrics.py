@@ -0,0 +1,119 @@
+"""Module for the Prometheus metrics of mining modules.
+
+This module defines a latency histogram for every stage of the pipeline, a
+counter of errors by stage and exception class and a gauge of the crawls in
+progress. The histogram of every stage is created once at import, so observing a
+stage costs a dictionary lookup and a histogram update.
+"""
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+T = TypeVar("T")
+
+STAGE_DISCOVER_COMPANY = "discover_company"
+STAGE_ACTOR_RUN = "actor_run"
+STAGE_DATASET_FETCH = "dataset_fetch"
+STAGE_MODEL_MAPPING = "model_mapping"
+STAGE_FEED_RAW_DATA = "feed_raw_data"
+STAGE_REGISTER_MEASUREMENTS = "register_measurements"
+STAGE_CRAWLING_FINISHED = "crawling_finished"
+STAGE_CRAWL_COMPANIES = "crawl_companies"
+STAGES = (
+    STAGE_DISCOVER_COMPANY,
+    STAGE_ACTOR_RUN,
+    STAGE_DATASET_FETCH,
+    STAGE_MODEL_MAPPING,
+    STAGE_FEED_RAW_DATA,
+    STAGE_REGISTER_MEASUREMENTS,
+    STAGE_CRAWLING_FINISHED,
+    STAGE_CRAWL_COMPANIES,
+)
+
+# stages take from milliseconds (mapping a batch) to many minutes (actor runs)
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.025,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+    1800,
+    float("inf"),
+)
+
+STAGE_SECONDS = Histogram(
+    "parma_mining_stage_seconds",
+    "Duration of a pipeline stage in seconds",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+ERRORS = Counter(
+    "parma_mining_errors",
+    "Errors of a pipeline stage by exception class",
+    ["stage", "error"],
+)
+CRAWLS_IN_FLIGHT = Gauge(
+    "parma_mining_crawls_in_flight", "Crawling tasks currently in progress"
+)
+
+_stage_seconds = {stage: STAGE_SECONDS.labels(stage=stage) for stage in STAGES}
+
+
+def observe_seconds(stage: str, seconds: float):
+    """Record the duration of a stage."""
+    _stage_seconds[stage].observe(seconds)
+
+
+def record_error(stage: str, error: BaseException):
+    """Count an error of a stage by the class of the exception."""
+    ERRORS.labels(stage=stage, error=error.__class__.__name__).inc()
+
+
+@contextmanager
+def observe(stage: str) -> Iterator[None]:
+    """Record the duration of the block and count the exception it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(stage, e)
+        raise
+    finally:
+        observe_seconds(stage, time.perf_counter() - start)
+
+
+async def observe_iter(stage: str, items: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Yield the items of an async iterator and record the time spent fetching them.
+
+    The time the consumer spends between items is not included. A single
+    duration is recorded once the iterator is exhausted or closed.
+    """
+    seconds = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = await anext(items)
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                record_error(stage, e)
+                raise
+            finally:
+                seconds += time.perf_counter() - start
+            yield item
+    finally:
+        observe_seconds(stage, seconds)
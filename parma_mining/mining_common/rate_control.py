@@ -0,0 +1,416 @@
+"""Module for controlling the request rate to upstream services.
+
+This module paces the requests to each upstream service, e.g. Google, Apify or
+analytics, with a token bucket. The rate of a bucket adapts to the upstream:
+it grows additively while requests succeed and is cut multiplicatively when the
+upstream throttles (AIMD). A circuit breaker stops sending requests to an
+upstream that keeps failing, so callers fail fast until it has recovered.
+The buckets pace the requests of a single process; a global budget held in the
+shared state caps the requests of all processes together.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from parma_mining.mining_common.const import HTTP_429, HTTP_500, HTTP_503
+from parma_mining.mining_common.exceptions import CircuitOpenError
+from parma_mining.mining_common.shared_state import SharedState
+
+logger = logging.getLogger(__name__)
+
+# status codes telling that an upstream throttles us
+THROTTLE_STATUS_CODES = (HTTP_429, HTTP_503)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class TokenBucket:
+    """Token bucket with a rate adapted by AIMD."""
+
+    # a throttled request halves the rate, while it takes this many successful
+    # requests to raise it from the minimum to the maximum rate again
+    DECREASE_FACTOR = 0.5
+    INCREASE_STEPS = 50
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float = 1):
+        """Initialize the TokenBucket class."""
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = (max_rate - min_rate) / self.INCREASE_STEPS
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait until a request may be sent without blocking the event loop."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        """Raise the rate additively."""
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self):
+        """Cut the rate multiplicatively."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.DECREASE_FACTOR)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+
+class GlobalBudget:
+    """Request budget of an upstream shared by all processes.
+
+    Requests are counted per window of at least one second in the shared state. A
+    request beyond the budget of the current window waits for the next one.
+    """
+
+    def __init__(self, state: SharedState, name: str, per_second: float):
+        """Initialize the GlobalBudget class."""
+        self.state = state
+        self.name = name
+        self.per_second = per_second
+        # budgets below one request per second get windows holding one request
+        self.window_seconds = max(1.0, 1 / per_second)
+        self.limit = max(1, round(per_second * self.window_seconds))
+        self.deferred = 0
+
+    def reserve(self) -> float:
+        """Count a request and return the seconds to wait before trying again.
+
+        Zero if the request fits into the budget of the current window.
+        """
+        # wall clock windows, so all processes and hosts share them
+        now = time.time()
+        window = int(now // self.window_seconds)
+        count = self.state.incr(
+            f"budget:{self.name}:{window}", ttl_seconds=2 * self.window_seconds
+        )
+        if count <= self.limit:
+            return 0.0
+        self.deferred += 1
+        return (window + 1) * self.window_seconds - now
+
+    def acquire(self):
+        """Block until a request fits into the budget."""
+        while (delay := self.reserve()) > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait until a request fits into the budget without blocking the loop."""
+        while True:
+            delay = (
+                await asyncio.to_thread(self.reserve)
+                if self.state.remote
+                else self.reserve()
+            )
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Circuit breaker opening after consecutive failures."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60):
+        """Initialize the CircuitBreaker class.
+
+        The circuit opens after ``failure_threshold`` consecutive failures. Once
+        ``reset_seconds`` have passed, a single trial request is let through; the
+        circuit closes if it succeeds and opens again otherwise. A trial without an
+        outcome after another ``reset_seconds``, e.g. because it was cancelled, is
+        replaced by a new one.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now."""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            now = time.monotonic()
+            started_at = (
+                self.opened_at if self.state == CIRCUIT_OPEN else self.trial_started_at
+            )
+            if now - started_at >= self.reset_seconds:
+                self.state = CIRCUIT_HALF_OPEN
+                self.trial_started_at = now
+                return True
+            return False
+
+    def on_success(self):
+        """Close the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.state = CIRCUIT_CLOSED
+
+    def on_failure(self):
+        """Count a failure, opening the circuit once the threshold is reached."""
+        with self._lock:
+            self.failures += 1
+            if (
+                self.state == CIRCUIT_HALF_OPEN
+                or self.failures >= self.failure_threshold
+            ):
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+    def on_cancelled(self):
+        """Give up a trial request that ended without an outcome.
+
+        The next request is let through as a new trial right away.
+        """
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic() - self.reset_seconds
+
+    def retry_in(self) -> float:
+        """Return the seconds until the next trial request, if the circuit is open."""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return 0.0
+            started_at = (
+                self.opened_at if self.state == CIRCUIT_OPEN else self.trial_started_at
+            )
+            return max(0.0, started_at + self.reset_seconds - time.monotonic())
+
+
+class Upstream:
+    """Rate limit and circuit breaker guarding the requests to one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        bucket: TokenBucket,
+        breaker: CircuitBreaker,
+        budget: GlobalBudget | None = None,
+    ):
+        """Initialize the Upstream class."""
+        self.name = name
+        self.bucket = bucket
+        self.breaker = breaker
+        self.budget = budget
+        self.throttled = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        name: str,
+        defaults: dict[str, float],
+        state: SharedState | None = None,
+    ) -> "Upstream":
+        """Create the upstream configured by the environment.
+
+        Every default can be overridden by ``<NAME>_<KEY>``, e.g.
+        ``GOOGLE_RATE_PER_SECOND`` or ``APIFY_BREAKER_THRESHOLD``. With a ``state``
+        and a ``GLOBAL_RATE_PER_SECOND`` above zero, the requests of all processes
+        sharing the state are capped by a global budget.
+        """
+
+        def setting(key: str) -> float:
+            return float(os.getenv(f"{name.upper()}_{key}") or defaults.get(key, 0))
+
+        global_rate = setting("GLOBAL_RATE_PER_SECOND")
+        return cls(
+            name,
+            TokenBucket(
+                rate=setting("RATE_PER_SECOND"),
+                min_rate=setting("MIN_RATE_PER_SECOND"),
+                max_rate=setting("MAX_RATE_PER_SECOND"),
+                burst=setting("BURST"),
+            ),
+            CircuitBreaker(
+                failure_threshold=int(setting("BREAKER_THRESHOLD")),
+                reset_seconds=setting("BREAKER_RESET_SECONDS"),
+            ),
+            (
+                GlobalBudget(state, name, global_rate)
+                if state is not None and global_rate > 0
+                else None
+            ),
+        )
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"Circuit of {self.name} is open, "
+                f"retry in {self.breaker.retry_in():.0f} seconds"
+            )
+
+    def acquire(self):
+        """Block until a request may be sent.
+
+        Raises:
+            CircuitOpenError: If the circuit of the upstream is open.
+        """
+        self._check_circuit()
+        try:
+            self.bucket.acquire()
+            if self.budget is not None:
+                self.budget.acquire()
+        except BaseException:
+            self.record_cancelled()
+            raise
+
+    async def acquire_async(self):
+        """Wait until a request may be sent.
+
+        Raises:
+            CircuitOpenError: If the circuit of the upstream is open.
+        """
+        self._check_circuit()
+        try:
+            await self.bucket.acquire_async()
+            if self.budget is not None:
+                await self.budget.acquire_async()
+        except BaseException:
+            # the request is not sent, so a trial must not stay pending
+            self.record_cancelled()
+            raise
+
+    def record_success(self):
+        """Record a request the upstream has answered."""
+        self.bucket.on_success()
+        self.breaker.on_success()
+
+    def record_throttled(self):
+        """Record a request the upstream has refused because of its rate."""
+        self.throttled += 1
+        logger.warning(
+            f"{self.name} throttles requests, lowering the rate "
+            f"from {self.bucket.rate:.2f} per second"
+        )
+        self.bucket.on_throttled()
+        self.breaker.on_failure()
+
+    def record_failure(self):
+        """Record a request that failed for another reason."""
+        self.breaker.on_failure()
+
+    def record_cancelled(self):
+        """Record a request that ended without an answer, e.g. when cancelled."""
+        self.breaker.on_cancelled()
+
+    def record_status(self, status_code: int):
+        """Record a request by the HTTP status code of its response."""
+        if status_code in THROTTLE_STATUS_CODES:
+            self.record_throttled()
+        elif status_code >= HTTP_500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def state(self) -> dict:
+        """Return the current rate and circuit state."""
+        return {
+            "rate_per_second": self.bucket.rate,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "budget_deferred": self.budget.deferred if self.budget else 0,
+        }
+
+
+# Starting points of the upstreams, the rates adapt within their bounds. The
+# global rates cap LinkedIn searches and Apify requests across all processes.
+UPSTREAM_DEFAULTS: dict[str, dict[str, float]] = {
+    "google": {
+        "RATE_PER_SECOND": 0.5,
+        "MIN_RATE_PER_SECOND": 0.05,
+        "MAX_RATE_PER_SECOND": 2,
+        "GLOBAL_RATE_PER_SECOND": 2,
+        "BURST": 1,
+        "BREAKER_THRESHOLD": 5,
+        "BREAKER_RESET_SECONDS": 300,
+    },
+    "apify": {
+        "RATE_PER_SECOND": 1,
+        "MIN_RATE_PER_SECOND": 0.1,
+        "MAX_RATE_PER_SECOND": 5,
+        "GLOBAL_RATE_PER_SECOND": 5,
+        "BURST": 2,
+        "BREAKER_THRESHOLD": 5,
+        "BREAKER_RESET_SECONDS": 60,
+    },
+    "analytics": {
+        "RATE_PER_SECOND": 50,
+        "MIN_RATE_PER_SECOND": 5,
+        "MAX_RATE_PER_SECOND": 200,
+        "BURST": 20,
+        "BREAKER_THRESHOLD": 10,
+        "BREAKER_RESET_SECONDS": 30,
+    },
+}
+
+
+class RateControl:
+    """Registry of the upstreams shared by all clients."""
+
+    def __init__(
+        self,
+        defaults: dict[str, dict[str, float]] | None = None,
+        state: SharedState | None = None,
+    ):
+        """Initialize the RateControl class.
+
+        The global budgets of the upstreams are kept in ``state``, if given.
+        """
+        self.defaults = defaults or UPSTREAM_DEFAULTS
+        self.shared_state = state
+        self._upstreams: dict[str, Upstream] = {}
+        self._lock = threading.Lock()
+
+    def upstream(self, name: str) -> Upstream:
+        """Return the upstream with the given name, creating it on first use."""
+        with self._lock:
+            if name not in self._upstreams:
+                self._upstreams[name] = Upstream.from_env(
+                    name, self.defaults[name], self.shared_state
+                )
+            return self._upstreams[name]
+
+    def state(self) -> dict[str, dict]:
+        """Return the state of every upstream used so far."""
+        with self._lock:
+            upstreams = dict(self._upstreams)
+        return {name: upstream.state() for name, upstream in upstreams.items()}
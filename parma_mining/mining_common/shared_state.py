@@ -0,0 +1,167 @@
+"""Module for state shared by the processes of a mining module.
+
+This module provides a small key value store with expiring keys and atomic
+counters, used for the state that has to hold across worker processes and
+replicas: the global request budgets of the upstreams, the shared tier of the
+caches and the state of crawling jobs. The in-process backend keeps the state in
+memory and serves a single process. The Redis backend keeps it in Redis or any
+server speaking its protocol, and needs the optional ``redis`` package.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# every key is prefixed, so the state can live next to other data
+KEY_PREFIX = "parma-mining-linkedin:"
+
+
+class LocalState:
+    """State kept in the memory of the process."""
+
+    name = "local"
+    # whether the state is shared with other processes
+    remote = False
+
+    # expired keys are dropped every this many writes
+    PURGE_INTERVAL = 1000
+
+    def __init__(self):
+        """Initialize the LocalState class."""
+        self._values: dict[str, tuple[str, float | None]] = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        """Return the value of a key, if it exists and has not expired."""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float | None = None):
+        """Set the value of a key, expiring after ``ttl_seconds`` if given."""
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._values[key] = (value, expires_at)
+            self._written()
+
+    def incr(self, key: str, ttl_seconds: float) -> int:
+        """Increment a counter and return its new value.
+
+        A counter created by the call expires after ``ttl_seconds``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            value, expires_at = self._values.get(key, ("0", None))
+            if expires_at is None or expires_at <= now:
+                value, expires_at = "0", now + ttl_seconds
+            count = int(value) + 1
+            self._values[key] = (str(count), expires_at)
+            self._written()
+            return count
+
+    def stats(self) -> dict:
+        """Return the backend and the number of keys."""
+        with self._lock:
+            return {"backend": self.name, "keys": len(self._values)}
+
+    def close(self):
+        """Release the state, nothing to do for the process memory."""
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            now = time.monotonic()
+            for key in [
+                key
+                for key, (_, expires_at) in self._values.items()
+                if expires_at is not None and expires_at <= now
+            ]:
+                del self._values[key]
+
+
+class RedisState:
+    """State kept in Redis, shared by every process connected to it."""
+
+    name = "redis"
+    remote = True
+
+    def __init__(self, url: str, timeout_seconds: float = 5):
+        """Initialize the RedisState class.
+
+        Connects to the server at ``url``, e.g. ``redis://localhost:6379/0``.
+
+        Raises:
+            ImportError: If the ``redis`` package is not installed.
+        """
+        try:
+            redis = importlib.import_module("redis")
+        except ImportError as e:
+            raise ImportError(
+                "The redis package is needed for SHARED_STATE_URL, "
+                "install it with `pip install redis`"
+            ) from e
+        self.url = url
+        self._client = redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            # RESP2 is spoken by every Redis compatible server
+            protocol=2,
+            socket_timeout=timeout_seconds,
+            socket_connect_timeout=timeout_seconds,
+        )
+
+    def get(self, key: str) -> str | None:
+        """Return the value of a key, if it exists and has not expired."""
+        return self._client.get(KEY_PREFIX + key)
+
+    def set(self, key: str, value: str, ttl_seconds: float | None = None):
+        """Set the value of a key, expiring after ``ttl_seconds`` if given."""
+        self._client.set(
+            KEY_PREFIX + key,
+            value,
+            px=max(1, int(ttl_seconds * 1000)) if ttl_seconds else None,
+        )
+
+    def incr(self, key: str, ttl_seconds: float) -> int:
+        """Increment a counter and return its new value.
+
+        A counter created by the call expires after ``ttl_seconds``.
+        """
+        count = self._client.incr(KEY_PREFIX + key)
+        if count == 1:
+            self._client.pexpire(KEY_PREFIX + key, max(1, int(ttl_seconds * 1000)))
+        return count
+
+    def stats(self) -> dict:
+        """Return the backend."""
+        return {"backend": self.name}
+
+    def close(self):
+        """Close the connections to the server."""
+        self._client.close()
+
+
+SharedState = LocalState | RedisState
+
+
+def shared_state_from_env() -> SharedState:
+    """Create the shared state configured by the environment.
+
+    The state is kept in Redis if ``SHARED_STATE_URL`` is set, and in the memory of
+    the process otherwise.
+    """
+    url = os.getenv("SHARED_STATE_URL")
+    if not url:
+        return LocalState()
+    logger.info("Sharing the state of the module through Redis")
+    return RedisState(url)
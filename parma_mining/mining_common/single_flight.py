@@ -0,0 +1,93 @@
+"""Module for coalescing concurrent requests for the same resource.
+
+This module lets the first caller asking for a key fetch it, while callers asking
+for the same key meanwhile wait for that result instead of fetching it again
+(single-flight). The result is shared with every waiting caller, including the
+failure of the fetch.
+"""
+import asyncio
+import logging
+from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """A fetch in progress, awaited by the callers that joined it."""
+
+    def __init__(self):
+        """Initialize the Flight class."""
+        self.result: object | None = None
+        self.error: Exception | None = None
+        self._done = asyncio.Event()
+
+    @property
+    def abandoned(self) -> bool:
+        """Whether the fetch ended without a result, so callers fetch it themselves."""
+        return self._done.is_set() and self.result is None and self.error is None
+
+    async def wait(self):
+        """Wait until the fetch has ended."""
+        await self._done.wait()
+
+    def end(self, result: object | None = None, error: Exception | None = None):
+        """End the fetch with its result or error."""
+        self.result = result
+        self.error = error
+        self._done.set()
+
+
+class SingleFlight:
+    """Registry of the fetches in progress by their key."""
+
+    def __init__(self):
+        """Initialize the SingleFlight class."""
+        self._flights: dict[str, Flight] = {}
+        # fetches started and fetches saved by joining another one
+        self.led = 0
+        self.joined = 0
+
+    def lead_or_join(self, keys: Iterable[str]) -> tuple[list[str], dict[str, Flight]]:
+        """Split ``keys`` into the ones to fetch and the flights to join.
+
+        The caller has to end the flight of every key it leads with ``resolve``,
+        ``fail`` or ``abandon``.
+        """
+        lead = []
+        joined = {}
+        for key in keys:
+            flight = self._flights.get(key)
+            if flight is None:
+                self._flights[key] = Flight()
+                lead.append(key)
+            else:
+                joined[key] = flight
+        self.led += len(lead)
+        self.joined += len(joined)
+        return lead, joined
+
+    def resolve(self, key: str, result: object):
+        """End the flight of a key with its result."""
+        self._end(key, result=result)
+
+    def fail(self, key: str, error: Exception):
+        """End the flight of a key with the error of its fetch."""
+        self._end(key, error=error)
+
+    def abandon(self, keys: Iterable[str]):
+        """End the flights of keys that were not fetched, e.g. on cancellation."""
+        for key in keys:
+            self._end(key)
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of fetches in progress, led and saved."""
+        return {
+            "in_flight": len(self._flights),
+            "led": self.led,
+            "joined": self.joined,
+        }
+
+    def _end(self, key: str, **outcome):
+        flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.end(**outcome)
@@ -0,0 +1,21 @@
+"""Helpers for the local SQLite stores of mining modules."""
+import os
+import sqlite3
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Open a SQLite database that can be shared between threads.
+
+    Parent directories are created if needed. File databases use write-ahead
+    logging, so readers are not blocked by concurrent writes. Callers must
+    serialize access to the returned connection themselves.
+    """
+    if path != ":memory:":
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    if path != ":memory:":
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
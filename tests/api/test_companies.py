@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from unittest.mock import MagicMock
 
@@ -5,8 +6,18 @@ import pytest
 from fastapi.testclient import TestClient
 
 from parma_mining.linkedin.api.dependencies.auth import authenticate
-from parma_mining.linkedin.api.main import app
+from parma_mining.linkedin.api.main import app, crawl_companies
+from parma_mining.linkedin.client import LinkedinClient
+from parma_mining.linkedin.crawl_queue import CrawlQueue
+from parma_mining.linkedin.feed_snapshots import FeedSnapshotStore
+from parma_mining.linkedin.model import (
+    CompaniesRequest,
+    CompanyModel,
+    ScrapedCompanyModel,
+)
+from parma_mining.linkedin.scheduler import TaskScheduler
 from parma_mining.mining_common.const import HTTP_200
+from parma_mining.mining_common.exceptions import AnalyticsError, CrawlingError
 from tests.dependencies.mock_auth import mock_authenticate
 
 
@@ -28,9 +39,9 @@ logger = logging.getLogger(__name__)
 def mock_linkedin_client(mocker) -> MagicMock:
     """Mocking the LinkedinClient's method to avoid actual API calls."""
     mock = mocker.patch(
-        "parma_mining.linkedin.api.main.LinkedinClient.get_company_details"
+        "parma_mining.linkedin.api.main.LinkedinClient.iter_company_details"
     )
-    mock.return_value = {
+    company_data = {
         "linkedin_id": "test_linkedin_id",
         "name": "Test Company",
         "profile_url": "http://testcompany.com",
@@ -44,7 +55,7 @@ def mock_linkedin_client(mocker) -> MagicMock:
         "website": "http://testcompany.com",
         "logo_url": "http://testcompany.com/logo.png",
         "follower_count": 1000,
-        "universal_name": "testcompany",
+        "universal_name": "test",
         "headquarter_city": "Test City",
         "headquarter_country": "Test Country",
         "head_quarter_postal_code": "12345",
@@ -56,18 +67,42 @@ def mock_linkedin_client(mocker) -> MagicMock:
         "founded_month": 1,
         "founded_day": 1,
     }
+    company = CompanyModel.model_validate(company_data)
+
+    async def iter_company_details(urls: list[str], **kwargs):
+        for url in urls:
+            if LinkedinClient.company_handle(url) == company.universal_name:
+                yield ScrapedCompanyModel(source_url=url, company=company)
+
+    mock.side_effect = iter_company_details
 
     return mock
 
 
 @pytest.fixture
-def mock_analytics_client(mocker) -> MagicMock:
+def mock_feed_raw_data(mocker) -> MagicMock:
+    """Mocking the AnalyticClient's feed method to avoid actual API calls."""
+    return mocker.patch(
+        "parma_mining.linkedin.api.main.AnalyticsClient.feed_raw_data_batch",
+        return_value={},
+    )
+
+
+def fed_company_ids(mock_feed_raw_data: MagicMock) -> list[str]:
+    return [
+        data.company_id
+        for call in mock_feed_raw_data.call_args_list
+        for data in call.args[1]
+    ]
+
+
+@pytest.fixture
+def mock_analytics_client(mocker, mock_feed_raw_data) -> MagicMock:
     """Mocking the AnalyticClient's method to avoid actual API calls during testing."""
-    mock = mocker.patch("parma_mining.linkedin.api.main.AnalyticsClient.feed_raw_data")
     mock = mocker.patch(
-        "parma_mining.linkedin.api.main.AnalyticsClient.crawling_finished"
+        "parma_mining.linkedin.api.main.AnalyticsClient.crawling_finished",
+        return_value={},
     )
-    # No return value needed, but you can add side effects or exceptions if necessary
     return mock
 
 
@@ -90,3 +125,272 @@ def test_get_company_details(
     mock_analytics_client.assert_called()
 
     assert response.status_code == HTTP_200
+
+
+def test_get_company_details_batches_urls(
+    mocker,
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    batch_size = 2
+    mocker.patch(
+        "parma_mining.linkedin.api.main.linkedin_client.batch_size", batch_size
+    )
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test/"]},
+            "Example_id2": {"urls": ["https://www.linkedin.com/company/other"]},
+            "Example_id3": {"urls": ["https://www.linkedin.com/company/third"]},
+        },
+    }
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    assert mock_linkedin_client.call_count == batch_size
+    assert mock_linkedin_client.call_args_list[0].args == (
+        [
+            "https://www.linkedin.com/company/test",
+            "https://www.linkedin.com/company/other",
+        ],
+    )
+    assert fed_company_ids(mock_feed_raw_data) == ["Example_id1"]
+
+    errors = mock_analytics_client.call_args.args[1].errors
+    assert set(errors) == {"Example_id2", "Example_id3"}
+    assert errors["Example_id2"].error_type == "CrawlingError"
+
+
+def test_get_company_details_same_url_scraped_once(
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test"]},
+            "Example_id2": {"urls": ["https://www.linkedin.com/company/Test/"]},
+            "Example_id3": {"urls": ["https://de.linkedin.com/company/test?trk=ab"]},
+        },
+    }
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    mock_linkedin_client.assert_called_once()
+    assert mock_linkedin_client.call_args.args == (
+        ["https://www.linkedin.com/company/test"],
+    )
+    mock_feed_raw_data.assert_called_once()
+    assert fed_company_ids(mock_feed_raw_data) == [
+        "Example_id1",
+        "Example_id2",
+        "Example_id3",
+    ]
+
+
+def test_same_url_of_concurrent_tasks_scraped_once(
+    mocker,
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+):
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", CrawlQueue(":memory:"))
+    scrape = mock_linkedin_client.side_effect
+
+    async def slow_scrape(urls: list[str], **kwargs):
+        await asyncio.sleep(0.05)
+        async for scraped in scrape(urls, **kwargs):
+            yield scraped
+
+    mock_linkedin_client.side_effect = slow_scrape
+    requests = [
+        CompaniesRequest(
+            task_id=task_id,
+            companies={company_id: {"urls": [url]}},
+        )
+        for task_id, company_id, url in [
+            (1, "id1", "https://www.linkedin.com/company/test"),
+            (2, "id2", "https://fr.linkedin.com/company/test/about/?locale=fr"),
+        ]
+    ]
+
+    async def run():
+        await asyncio.gather(*(crawl_companies(body, "token") for body in requests))
+
+    asyncio.run(run())
+
+    mock_linkedin_client.assert_called_once()
+    assert sorted(fed_company_ids(mock_feed_raw_data)) == ["id1", "id2"]
+
+
+def test_get_company_details_crawling_error(
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    mock_linkedin_client.side_effect = CrawlingError("actor failed")
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test"]},
+            "Example_id2": {"names": ["Test"]},
+        },
+    }
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    mock_feed_raw_data.assert_not_called()
+    errors = mock_analytics_client.call_args.args[1].errors
+    assert errors["Example_id1"].error_type == "CrawlingError"
+    assert errors["Example_id2"].error_type == "ClientInvalidBodyError"
+
+
+def test_get_company_details_feed_errors(
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    mock_feed_raw_data.return_value = {"Example_id1": AnalyticsError("unavailable")}
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test"]},
+        },
+    }
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    errors = mock_analytics_client.call_args.args[1].errors
+    assert errors["Example_id1"].error_type == "AnalyticsError"
+
+
+def test_get_company_details_feeds_deltas(
+    mocker,
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    mocker.patch(
+        "parma_mining.linkedin.api.main.feed_snapshots",
+        FeedSnapshotStore(":memory:"),
+    )
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test"]},
+        },
+    }
+
+    mock_feed_raw_data.return_value = {"Example_id1": AnalyticsError("unavailable")}
+    client.post("/companies", json=payload)
+    mock_feed_raw_data.return_value = {}
+    client.post("/companies", json=payload)
+    client.post("/companies", json=payload)
+    client.post("/companies", json={**payload, "force_full": True})
+
+    # the failed feed is repeated in full, the unchanged company is skipped
+    assert fed_company_ids(mock_feed_raw_data) == ["Example_id1"] * 3
+    raw_data = [
+        data.raw_data
+        for call in mock_feed_raw_data.call_args_list
+        for data in call.args[1]
+    ]
+    assert all(isinstance(data, CompanyModel) for data in raw_data)
+
+
+def test_get_company_details_resumes_unfinished_task(
+    mocker,
+    mock_linkedin_client: MagicMock,
+    mock_feed_raw_data: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    queue = CrawlQueue(":memory:")
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", queue)
+    urls = {
+        handle: f"https://www.linkedin.com/company/{handle}"
+        for handle in ("fed", "scraped", "test")
+    }
+    queue.add_task(
+        123,
+        "old token",
+        False,
+        [(f"Example_{handle}", url, handle) for handle, url in urls.items()],
+        {},
+    )
+    # the state left behind by a process that died mid-task
+    queue.mark_fed(123, [(None, "fed")])
+    queue.mark_scraped(123, "scraped", CompanyModel(name="Scraped").model_dump_json())
+    queue.set_run(123, ["test"], "run1")
+
+    payload = {
+        "task_id": 123,
+        "companies": {"Example_fed": {"urls": [urls["fed"]]}},
+    }
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_200
+    mock_linkedin_client.assert_called_once()
+    assert mock_linkedin_client.call_args.args == ([urls["test"]],)
+    assert mock_linkedin_client.call_args.kwargs["run_id"] == "run1"
+    assert sorted(fed_company_ids(mock_feed_raw_data)) == [
+        "Example_scraped",
+        "Example_test",
+    ]
+    assert mock_analytics_client.call_args.args[1].errors == {}
+    assert queue.unfinished_tasks() == []
+
+
+def test_small_task_finishes_during_backfill(
+    mocker,
+    mock_linkedin_client: MagicMock,
+    mock_analytics_client: MagicMock,
+):
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", CrawlQueue(":memory:"))
+    mocker.patch(
+        "parma_mining.linkedin.api.main.scheduler",
+        TaskScheduler(capacity=1, max_per_task=1),
+    )
+    mocker.patch("parma_mining.linkedin.api.main.linkedin_client.batch_size", 1)
+    scrape = mock_linkedin_client.side_effect
+
+    async def slow_scrape(urls: list[str], **kwargs):
+        await asyncio.sleep(0.01)
+        async for scraped in scrape(urls, **kwargs):
+            yield scraped
+
+    mock_linkedin_client.side_effect = slow_scrape
+    backfill = CompaniesRequest(
+        task_id=1,
+        companies={
+            f"id{index}": {"urls": [f"https://www.linkedin.com/company/c{index}"]}
+            for index in range(6)
+        },
+    )
+    urgent = CompaniesRequest(
+        task_id=2,
+        companies={"id": {"urls": ["https://www.linkedin.com/company/test"]}},
+        priority=10,
+    )
+
+    async def run():
+        crawls = [asyncio.create_task(crawl_companies(backfill, "token"))]
+        await asyncio.sleep(0.015)
+        crawls.append(asyncio.create_task(crawl_companies(urgent, "token")))
+        await asyncio.gather(*crawls)
+
+    asyncio.run(run())
+
+    finished = [call.args[1].task_id for call in mock_analytics_client.call_args_list]
+    assert finished == [2, 1]
@@ -1,13 +1,23 @@
-from unittest.mock import MagicMock
+import json
+import time
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
 from parma_mining.linkedin.api.dependencies.auth import authenticate
 from parma_mining.linkedin.api.main import app
+from parma_mining.linkedin.discovery import DiscoveryEngine
+from parma_mining.linkedin.discovery_cache import DiscoveryCache
 from parma_mining.linkedin.model import DiscoveryRequest, DiscoveryResponse
-from parma_mining.mining_common.const import HTTP_200, HTTP_422
-from parma_mining.mining_common.exceptions import ClientInvalidBodyError
+from parma_mining.mining_common.const import (
+    DISCOVERY_VALIDITY_DAYS,
+    HTTP_200,
+    HTTP_422,
+    NDJSON_MEDIA_TYPE,
+)
+from parma_mining.mining_common.exceptions import ClientError, ClientInvalidBodyError
 from tests.dependencies.mock_auth import mock_authenticate
 
 
@@ -85,3 +95,94 @@ def test_discover_endpoint_with_linkedin_client_error(
     with pytest.raises(Exception) as exc_info:
         client.post("/discover", json=request_data)
     assert "Mocked Exception" in str(exc_info.value)
+
+
+def read_ndjson(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize(
+    "url, headers",
+    [
+        ("/discover?stream=true", {}),
+        ("/discover", {"Accept": NDJSON_MEDIA_TYPE}),
+    ],
+)
+def test_discover_endpoint_streaming(
+    client: TestClient, mock_linkedin_client: MagicMock, url: str, headers: dict
+):
+    request_data = [
+        DiscoveryRequest(company_id="123", name="TestCompany").model_dump(),
+        DiscoveryRequest(company_id="456", name="AnotherCompany").model_dump(),
+    ]
+
+    response = client.post(url, json=request_data, headers=headers)
+
+    assert response.status_code == HTTP_200
+    assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+    lines = read_ndjson(response)
+    identifiers = {
+        company_id: result
+        for line in lines[:-1]
+        for company_id, result in line["identifiers"].items()
+    }
+    assert identifiers == {"123": {"urls": ["mock_url"]}, "456": {"urls": ["mock_url"]}}
+    assert set(lines[-1]) == {"validity"}
+
+
+def test_discover_endpoint_streaming_with_failing_company(
+    client: TestClient, mock_linkedin_client: MagicMock
+):
+    def discover(name: str):
+        if name == "FailingCompany":
+            raise ClientError("Mocked Exception")
+        return DiscoveryResponse(urls=["mock_url"]).model_dump()
+
+    mock_linkedin_client.side_effect = discover
+    request_data = [
+        DiscoveryRequest(company_id="123", name="FailingCompany").model_dump(),
+        DiscoveryRequest(company_id="456", name="AnotherCompany").model_dump(),
+    ]
+
+    response = client.post("/discover?stream=true", json=request_data)
+
+    assert response.status_code == HTTP_200
+    lines = read_ndjson(response)
+    assert {"identifiers": {"456": {"urls": ["mock_url"]}}} in lines
+    assert {
+        "identifiers": {"123": {"urls": []}},
+        "errors": {
+            "123": {
+                "error_type": "ClientError",
+                "error_description": "Mocked Exception",
+            }
+        },
+    } in lines
+    assert set(lines[-1]) == {"validity"}
+
+
+@pytest.mark.parametrize("url", ["/discover", "/discover?stream=true"])
+def test_discover_validity_counts_from_oldest_cached_result(
+    mocker, client: TestClient, mock_linkedin_client: MagicMock, url: str
+):
+    cache = DiscoveryCache(":memory:", ttl=timedelta(days=DISCOVERY_VALIDITY_DAYS))
+    discovered_at = time.time() - timedelta(days=100).total_seconds()
+    with patch("parma_mining.linkedin.discovery_cache.time") as mock_time:
+        mock_time.time.return_value = discovered_at
+        cache.put("CachedCompany", DiscoveryResponse(urls=["cached_url"]))
+    mocker.patch(
+        "parma_mining.linkedin.api.main.discovery_engine",
+        DiscoveryEngine(concurrency=1, cache=cache),
+    )
+    request_data = [
+        DiscoveryRequest(company_id="123", name="CachedCompany").model_dump(),
+        DiscoveryRequest(company_id="456", name="AnotherCompany").model_dump(),
+    ]
+
+    response = client.post(url, json=request_data)
+
+    validity = datetime.fromisoformat(read_ndjson(response)[-1]["validity"])
+    expected = datetime.fromtimestamp(discovered_at) + timedelta(
+        days=DISCOVERY_VALIDITY_DAYS
+    )
+    assert abs(validity - expected) < timedelta(seconds=1)
@@ -0,0 +1,197 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from parma_mining.linkedin.api.dependencies.auth import authenticate
+from parma_mining.linkedin.api.main import CRAWL_MODE_QUEUE, app
+from parma_mining.linkedin.crawl_queue import CrawlQueue
+from parma_mining.linkedin.jobs import JOB_FINISHED, JOB_QUEUED, JobManager
+from parma_mining.linkedin.worker import run_worker
+from parma_mining.mining_common.const import HTTP_404
+from parma_mining.mining_common.shared_state import RedisState
+from tests.dependencies.mock_auth import mock_authenticate
+from tests.redis_stub import RedisStub
+
+HTTP_202 = 202
+
+
+@pytest.fixture
+def client():
+    assert app
+    app.dependency_overrides.update(
+        {
+            authenticate: mock_authenticate,
+        }
+    )
+    # the lifespan keeps the event loop running the background jobs alive
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def mock_linkedin_client(mocker) -> MagicMock:
+    mock = mocker.patch(
+        "parma_mining.linkedin.api.main.LinkedinClient.iter_company_details"
+    )
+
+    async def iter_company_details(urls: list[str], **kwargs):
+        for _ in ():
+            yield
+
+    mock.side_effect = iter_company_details
+    return mock
+
+
+@pytest.fixture
+def mock_analytics_client(mocker) -> MagicMock:
+    return mocker.patch(
+        "parma_mining.linkedin.api.main.AnalyticsClient.crawling_finished",
+        return_value={},
+    )
+
+
+@pytest.fixture
+def shared_state():
+    stub = RedisStub().start()
+    state = RedisState(stub.url)
+    yield state
+    state.close()
+    stub.stop()
+
+
+def wait_for_job(client: TestClient, job_id: str, timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["finished_at"] is not None or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def test_companies_background_job(
+    mock_linkedin_client: MagicMock,
+    mock_analytics_client: MagicMock,
+    client: TestClient,
+):
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test"]},
+        },
+    }
+
+    response = client.post("/companies?background=true", json=payload)
+
+    assert response.status_code == HTTP_202
+    assert response.json()["task_id"] == payload["task_id"]
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == JOB_FINISHED
+    assert job["total"] == job["processed"] == 1
+    mock_analytics_client.assert_called_once()
+
+
+def test_unfinished_tasks_are_resumed_on_startup(
+    mocker,
+    mock_linkedin_client: MagicMock,
+    mock_analytics_client: MagicMock,
+):
+    queue = CrawlQueue(":memory:")
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", queue)
+    url = "https://www.linkedin.com/company/test"
+    queue.add_task(123, "token", False, [("Example_id1", url, "test")], {})
+
+    with TestClient(app):
+        deadline = time.monotonic() + 5
+        while queue.unfinished_tasks() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert queue.unfinished_tasks() == []
+    mock_analytics_client.assert_called_once()
+    assert set(mock_analytics_client.call_args.args[1].errors) == {"Example_id1"}
+
+
+def test_get_unknown_job(client: TestClient):
+    response = client.get("/jobs/unknown")
+    assert response.status_code == HTTP_404
+
+
+def test_queued_tasks_are_crawled_by_workers(
+    mocker,
+    tmp_path,
+    shared_state: RedisState,
+    mock_linkedin_client: MagicMock,
+    mock_analytics_client: MagicMock,
+):
+    queue = CrawlQueue(str(tmp_path / "crawl_queue.sqlite3"))
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", queue)
+    mocker.patch("parma_mining.linkedin.api.main.crawl_mode", CRAWL_MODE_QUEUE)
+    mocker.patch("parma_mining.linkedin.api.main.shared_state", shared_state)
+    mocker.patch(
+        "parma_mining.linkedin.api.main.job_manager",
+        JobManager(state=shared_state),
+    )
+    app.dependency_overrides[authenticate] = mock_authenticate
+    client = TestClient(app)
+    payload = {
+        "task_id": 123,
+        "companies": {
+            "Example_id1": {"urls": ["https://www.linkedin.com/company/test"]},
+        },
+    }
+
+    response = client.post("/companies", json=payload)
+
+    assert response.status_code == HTTP_202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json()["status"] == JOB_QUEUED
+    mock_linkedin_client.assert_not_called()
+
+    async def work():
+        stop = asyncio.Event()
+        worker = asyncio.create_task(run_worker(stop, poll_seconds=0.01))
+        while queue.unfinished_tasks():
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+
+    asyncio.run(asyncio.wait_for(work(), 5))
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == JOB_FINISHED
+    assert job["total"] == job["processed"] == 1
+    mock_analytics_client.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "persistent_queue, missing",
+    [
+        (False, "needs CRAWL_QUEUE_PATH and SHARED_STATE_URL"),
+        (True, "needs SHARED_STATE_URL"),
+    ],
+)
+def test_queue_mode_needs_shared_queue_and_state(
+    mocker, tmp_path, persistent_queue: bool, missing: str
+):
+    path = str(tmp_path / "crawl_queue.sqlite3") if persistent_queue else ":memory:"
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", CrawlQueue(path))
+    mocker.patch("parma_mining.linkedin.api.main.crawl_mode", CRAWL_MODE_QUEUE)
+
+    with pytest.raises(RuntimeError, match=missing):
+        with TestClient(app):
+            pass
+
+
+def test_worker_needs_queue_mode(mocker, tmp_path):
+    queue = CrawlQueue(str(tmp_path / "crawl_queue.sqlite3"))
+    queue.add_task(123, "token", False, [("Example_id1", "url", "test")], {})
+    mocker.patch("parma_mining.linkedin.api.main.crawl_queue", queue)
+    run_task = mocker.patch("parma_mining.linkedin.api.main.run_task")
+
+    with pytest.raises(RuntimeError, match="CRAWL_MODE=queue"):
+        asyncio.run(run_worker(asyncio.Event(), poll_seconds=0.01))
+
+    run_task.assert_not_called()
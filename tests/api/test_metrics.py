@@ -0,0 +1,20 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from parma_mining.linkedin.api import app
+from parma_mining.mining_common.const import HTTP_200
+
+
+@pytest.fixture
+def client():
+    assert app
+    return TestClient(app)
+
+
+def test_metrics_endpoint(client: TestClient):
+    response = client.get("/metrics")
+
+    assert response.status_code == HTTP_200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'parma_mining_stage_seconds_count{stage="feed_raw_data"}' in response.text
+    assert "parma_mining_crawls_in_flight" in response.text
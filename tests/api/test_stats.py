@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from parma_mining.linkedin.api import app
+from parma_mining.mining_common.const import HTTP_200
+
+
+@pytest.fixture
+def client():
+    assert app
+    return TestClient(app)
+
+
+def test_stats_endpoint(client: TestClient):
+    response = client.get("/stats")
+    assert response.status_code == HTTP_200
+    assert set(response.json()) == {
+        "discovery_cache",
+        "scrape_cache",
+        "token_cache",
+        "rate_control",
+        "apify_runs",
+        "feed_snapshots",
+        "crawl_queue",
+        "shared_state",
+        "scheduler",
+        "single_flight",
+    }
@@ -0,0 +1,64 @@
+"""Stub of the analytics backend for testing.
+
+This module provides an in-process stand-in for the endpoints of the analytics
+backend, which can be plugged into the AnalyticsClient as its transport.
+"""
+import json
+
+import httpx
+
+from parma_mining.linkedin.analytics_client import AnalyticsClient
+from parma_mining.mining_common.const import HTTP_200, HTTP_201, HTTP_404
+
+BASE_URL = "http://analytics.test"
+
+
+class AnalyticsStub:
+    """Record the requests sent to analytics and answer them like the backend."""
+
+    def __init__(self, bulk: bool = True):
+        """Initialize the AnalyticsStub class."""
+        self.bulk = bulk
+        self.requests: list[httpx.Request] = []
+        self.measurement_ids = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answer a request sent to the analytics backend."""
+        self.requests.append(request)
+        path = request.url.path
+        if path.endswith("/bulk") and not self.bulk:
+            return httpx.Response(HTTP_404, json={"detail": "Not Found"})
+        if path == "/source-measurement":
+            return httpx.Response(HTTP_201, json={"id": self._next_measurement_id()})
+        if path == "/source-measurement/bulk":
+            return httpx.Response(
+                HTTP_201,
+                json=[
+                    {"id": self._next_measurement_id()}
+                    for _ in json.loads(request.content)
+                ],
+            )
+        return httpx.Response(HTTP_200, json={})
+
+    def _next_measurement_id(self) -> int:
+        self.measurement_ids += 1
+        return self.measurement_ids
+
+    def client(self) -> AnalyticsClient:
+        """Return an AnalyticsClient that talks to the stub."""
+        return AnalyticsClient(
+            transport=httpx.MockTransport(self.handle),
+            base_url=BASE_URL,
+        )
+
+    def paths(self) -> list[str]:
+        """Return the paths of all received requests."""
+        return [request.url.path for request in self.requests]
+
+    def payloads(self, path: str) -> list:
+        """Return the JSON bodies of all requests sent to ``path``."""
+        return [
+            json.loads(request.content)
+            for request in self.requests
+            if request.url.path == path
+        ]
@@ -1,11 +1,19 @@
+import asyncio
+import time
 from unittest.mock import patch
 
 import httpx
 import pytest
 
-from parma_mining.linkedin.analytics_client import AnalyticsClient
-from parma_mining.linkedin.model import CompanyModel, ResponseModel
+from parma_mining.linkedin.analytics_client import AnalyticsClient, RawDataSink
+from parma_mining.linkedin.model import (
+    CompanyModel,
+    CrawlingFinishedInputModel,
+    ErrorInfoModel,
+    ResponseModel,
+)
 from parma_mining.mining_common.const import HTTP_200, HTTP_500
+from tests.client.analytics_stub import AnalyticsStub
 
 TOKEN = "mocked_token"
 
@@ -55,36 +63,294 @@ def mock_response_model(mock_company_model):
     )
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post")
 def test_send_post_request_success(mock_post, analytics_client):
     mock_post.return_value = httpx.Response(HTTP_200, json={"key": "value"})
-    response = analytics_client.send_post_request(
-        TOKEN, "http://example.com", {"data": "test"}
+    response = asyncio.run(
+        analytics_client.send_post_request(
+            TOKEN, "http://example.com", {"data": "test"}
+        )
     )
     assert response == {"key": "value"}
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post")
 def test_send_post_request_failure(mock_post, analytics_client):
     mock_post.return_value = httpx.Response(HTTP_500, text="Internal Server Error")
     with pytest.raises(Exception) as exc_info:
-        analytics_client.send_post_request(
-            TOKEN, "http://example.com", {"data": "test"}
+        asyncio.run(
+            analytics_client.send_post_request(
+                TOKEN, "http://example.com", {"data": "test"}
+            )
         )
     assert "API request failed" in str(exc_info.value)
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post")
 def test_register_measurements(mock_post, analytics_client):
     mock_post.return_value = httpx.Response(HTTP_200, json={"id": "123"})
     mapping = {"Mappings": [{"DataType": "int", "MeasurementName": "test_metric"}]}
-    result, updated_mapping = analytics_client.register_measurements(TOKEN, mapping)
+    result, updated_mapping = asyncio.run(
+        analytics_client.register_measurements(TOKEN, mapping)
+    )
     assert "source_measurement_id" in updated_mapping["Mappings"][0]
     assert result[0]["source_measurement_id"] == "123"
 
 
-@patch("httpx.post")
+@patch("httpx.AsyncClient.post")
 def test_feed_raw_data(mock_post, analytics_client, mock_response_model):
     mock_post.return_value = httpx.Response(HTTP_200, json={"result": "success"})
-    result = analytics_client.feed_raw_data(TOKEN, mock_response_model)
+    result = asyncio.run(analytics_client.feed_raw_data(TOKEN, mock_response_model))
     assert result == {"result": "success"}
+
+
+def test_send_post_request_reuses_connection_pool(mock_response_model):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(HTTP_200, json={"result": "success"})
+
+    client = AnalyticsClient(
+        transport=httpx.MockTransport(handler), base_url="http://analytics.test"
+    )
+
+    async def feed():
+        pool = client.http_client
+        await asyncio.gather(
+            *(client.feed_raw_data(TOKEN, mock_response_model) for _ in range(3))
+        )
+        assert client.http_client is pool
+        await client.aclose()
+        assert pool.is_closed
+
+    asyncio.run(feed())
+    assert len(requests) == 3  # noqa: PLR2004
+    assert requests[0].headers["Authorization"] == f"Bearer {TOKEN}"
+
+
+def response_models(mock_company_model, count: int) -> list[ResponseModel]:
+    return [
+        ResponseModel(
+            source_name="linkedin",
+            company_id=f"company_{index}",
+            raw_data=mock_company_model,
+        )
+        for index in range(count)
+    ]
+
+
+def test_feed_raw_data_batch_bulk(mock_company_model):
+    stub = AnalyticsStub(bulk=True)
+    client = stub.client()
+
+    errors = asyncio.run(
+        client.feed_raw_data_batch(TOKEN, response_models(mock_company_model, 3))
+    )
+
+    assert errors == {}
+    assert stub.paths() == ["/feed-raw-data/bulk"]
+    payload = stub.payloads("/feed-raw-data/bulk")[0]
+    assert [record["company_id"] for record in payload] == [
+        "company_0",
+        "company_1",
+        "company_2",
+    ]
+
+
+def test_feed_raw_data_batch_falls_back_to_single_records(mock_company_model):
+    stub = AnalyticsStub(bulk=False)
+    client = stub.client()
+
+    async def feed():
+        await client.feed_raw_data_batch(TOKEN, response_models(mock_company_model, 2))
+        await client.feed_raw_data_batch(TOKEN, response_models(mock_company_model, 1))
+
+    asyncio.run(feed())
+
+    assert client.bulk_supported is False
+    assert stub.paths() == [
+        "/feed-raw-data/bulk",
+        "/feed-raw-data",
+        "/feed-raw-data",
+        "/feed-raw-data",
+    ]
+
+
+def test_feed_raw_data_batch_sends_idempotency_keys(mock_company_model):
+    stub = AnalyticsStub(bulk=False)
+    client = stub.client()
+    keys = ["key_0", "key_1"]
+
+    asyncio.run(
+        client.feed_raw_data_batch(TOKEN, response_models(mock_company_model, 2), keys)
+    )
+
+    assert [request.headers.get("Idempotency-Key") for request in stub.requests] == [
+        None,
+        *keys,
+    ]
+
+
+def test_feed_raw_data_bulk_sends_idempotency_keys_per_record(mock_company_model):
+    stub = AnalyticsStub()
+    client = stub.client()
+    keys = ["key_0", "key_1"]
+    models = response_models(mock_company_model, 2)
+
+    asyncio.run(client.feed_raw_data_batch(TOKEN, models, keys))
+
+    (records,) = stub.payloads("/feed-raw-data/bulk")
+    assert [record["idempotency_key"] for record in records] == keys
+    assert [record["company_id"] for record in records] == [
+        model.company_id for model in models
+    ]
+    assert "Idempotency-Key" not in stub.requests[0].headers
+
+
+def test_raw_data_sink_flushes_by_size(mock_company_model):
+    stub = AnalyticsStub()
+    sink = RawDataSink(stub.client(), TOKEN, max_batch_size=2, max_delay_seconds=60)
+
+    async def feed():
+        for data in response_models(mock_company_model, 5):
+            await sink.add(data)
+        assert len(stub.payloads("/feed-raw-data/bulk")) == 2  # noqa: PLR2004
+        await sink.close()
+
+    asyncio.run(feed())
+    assert [len(batch) for batch in stub.payloads("/feed-raw-data/bulk")] == [2, 2, 1]
+
+
+def test_raw_data_sink_flushes_by_time(mock_company_model):
+    stub = AnalyticsStub()
+    sink = RawDataSink(stub.client(), TOKEN, max_batch_size=10, max_delay_seconds=0.01)
+
+    async def feed():
+        await sink.add(response_models(mock_company_model, 1)[0])
+        deadline = time.monotonic() + 5
+        while not stub.requests and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await sink.close()
+
+    asyncio.run(feed())
+
+    assert stub.paths() == ["/feed-raw-data/bulk"]
+
+
+def test_raw_data_sink_collects_errors(mock_company_model):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(HTTP_500, text="Internal Server Error")
+
+    client = AnalyticsClient(
+        transport=httpx.MockTransport(handler), base_url="http://analytics.test"
+    )
+    sink = RawDataSink(client, TOKEN, max_batch_size=10, max_delay_seconds=60)
+
+    async def feed():
+        for data in response_models(mock_company_model, 2):
+            await sink.add(data)
+        await sink.close()
+
+    asyncio.run(feed())
+
+    assert set(sink.errors) == {"company_0", "company_1"}
+
+
+def nested_mapping() -> dict:
+    return {
+        "Mappings": [
+            {"DataType": "text", "MeasurementName": "name"},
+            {
+                "DataType": "nested",
+                "MeasurementName": "headquarter",
+                "NestedMappings": [
+                    {"DataType": "text", "MeasurementName": "city"},
+                    {"DataType": "text", "MeasurementName": "country"},
+                ],
+            },
+        ]
+    }
+
+
+@pytest.mark.parametrize("bulk", [True, False])
+def test_register_measurements_parent_before_child(bulk):
+    stub = AnalyticsStub(bulk=bulk)
+    client = stub.client()
+
+    result, mapping = asyncio.run(
+        client.register_measurements(TOKEN, nested_mapping(), source_module_id=1)
+    )
+
+    headquarter = mapping["Mappings"][1]
+    for nested in headquarter["NestedMappings"]:
+        assert nested["source_measurement_id"] > headquarter["source_measurement_id"]
+    assert [measurement["measurement_name"] for measurement in result] == [
+        "name",
+        "city",
+        "country",
+        "headquarter",
+    ]
+    assert result[1]["parent_measurement_id"] == headquarter["source_measurement_id"]
+    expected_paths = (
+        ["/source-measurement/bulk"] * 2
+        if bulk
+        else ["/source-measurement/bulk"] + ["/source-measurement"] * 4
+    )
+    assert stub.paths() == expected_paths
+
+
+def test_register_measurements_is_memoized():
+    stub = AnalyticsStub()
+    client = stub.client()
+
+    async def register():
+        first = await client.register_measurements(
+            TOKEN, nested_mapping(), source_module_id=1
+        )
+        requests = len(stub.requests)
+        second = await client.register_measurements(
+            TOKEN, nested_mapping(), source_module_id=1
+        )
+
+        assert second == first
+        assert len(stub.requests) == requests
+        await client.register_measurements(TOKEN, nested_mapping(), source_module_id=2)
+        assert len(stub.requests) > requests
+
+    asyncio.run(register())
+
+
+def test_feed_raw_data_sends_serialized_model(mock_response_model):
+    stub = AnalyticsStub()
+    client = stub.client()
+
+    asyncio.run(client.feed_raw_data(TOKEN, mock_response_model))
+
+    request = stub.requests[0]
+    assert request.headers["Content-Type"] == "application/json"
+    assert stub.payloads("/feed-raw-data") == [mock_response_model.model_dump()]
+
+
+def test_crawling_finished_sends_serialized_model():
+    stub = AnalyticsStub()
+    client = stub.client()
+    data = CrawlingFinishedInputModel(
+        task_id=1,
+        errors={
+            "company": ErrorInfoModel(
+                error_type="CrawlingError", error_description=None
+            )
+        },
+    )
+
+    asyncio.run(client.crawling_finished(TOKEN, data))
+
+    assert stub.payloads("/crawling-finished") == [
+        {
+            "task_id": 1,
+            "errors": {
+                "company": {"error_type": "CrawlingError", "error_description": None}
+            },
+        }
+    ]
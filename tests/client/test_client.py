@@ -1,9 +1,12 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+from collections.abc import AsyncIterator
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from parma_mining.linkedin.client import LinkedinClient
 from parma_mining.linkedin.model import DiscoveryResponse
+from parma_mining.linkedin.scrape_cache import ScrapeCache
 from parma_mining.mining_common.exceptions import ClientError, CrawlingError
 
 
@@ -12,6 +15,27 @@ def mock_linkedin_client():
     return LinkedinClient()
 
 
+def mock_apify(mock_apify_client, run: dict, items: list[dict]) -> MagicMock:
+    mock_client = MagicMock()
+    mock_apify_client.return_value = mock_client
+    run = {"id": "mocked_run_id", "status": "READY", **run}
+    mock_client.actor.return_value.start = AsyncMock(return_value=run)
+    mock_client.run.return_value.wait_for_finish = AsyncMock(
+        return_value={**run, "status": "SUCCEEDED"}
+    )
+
+    async def iterate_items() -> AsyncIterator[dict]:
+        for item in items:
+            yield item
+
+    mock_client.dataset.return_value.iterate_items.side_effect = iterate_items
+    return mock_client
+
+
+async def collect(iterator: AsyncIterator) -> list:
+    return [item async for item in iterator]
+
+
 @patch("parma_mining.linkedin.client.search")
 def test_discover_company_success(mock_search, mock_linkedin_client):
     mock_search.return_value = [
@@ -32,12 +56,15 @@ def test_discover_company_exception(mock_search_users, mock_linkedin_client):
         mock_linkedin_client.discover_company("Test")
 
 
-@patch("parma_mining.linkedin.client.ApifyClient")
-def test_get_company_details(mock_apify_client, mock_linkedin_client):
-    # Create a mock for ApifyClient
-    mock_client = MagicMock()
-    mock_apify_client.return_value = mock_client
+@patch("parma_mining.linkedin.client.search")
+def test_discover_company_without_confident_match(mock_search, mock_linkedin_client):
+    mock_search.return_value = ["https://www.linkedin.com/company/unrelated-corp"]
+
+    assert mock_linkedin_client.discover_company("Test") == DiscoveryResponse()
+
 
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_get_company_details(mock_apify_client, mock_linkedin_client):
     # Prepare mock results
     mock_run_result = {
         "defaultDatasetId": "mocked_dataset_id",
@@ -72,24 +99,236 @@ def test_get_company_details(mock_apify_client, mock_linkedin_client):
     }
 
     # Configure mocks
-    mock_client.actor.return_value.call.return_value = mock_run_result
-    mock_client.dataset.return_value.iterate_items.return_value = [mock_item]
+    mock_apify(mock_apify_client, mock_run_result, [mock_item])
 
     # Run the method
-    results = mock_linkedin_client.get_company_details(
-        ["https://www.linkedin.com/company/test"]
+    results = asyncio.run(
+        mock_linkedin_client.get_company_details(
+            ["https://www.linkedin.com/company/test"]
+        )
     )
 
     # Assert the results
-    assert results.name == "Mocked Company"
-    assert results.linkedin_id == "123"
+    assert len(results) == 1
+    assert results[0].name == "Mocked Company"
+    assert results[0].linkedin_id == "123"
 
 
-@patch("parma_mining.linkedin.client.ApifyClient")
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
 def test_get_organization_details_exception(mock_apify_client, mock_linkedin_client):
     exception_instance = CrawlingError("Error fetching company details!")
     mock_apify_client.side_effect = exception_instance
     with pytest.raises(CrawlingError):
-        mock_linkedin_client.get_company_details(
-            ["https://www.linkedin.com/company/exceptional-test"]
+        asyncio.run(
+            mock_linkedin_client.get_company_details(
+                ["https://www.linkedin.com/company/exceptional-test"]
+            )
         )
+
+
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_iter_company_details(mock_apify_client, mock_linkedin_client):
+    items = [
+        {
+            "name": f"Company {slug}",
+            "universalName": slug,
+            "url": f"https://www.linkedin.com/company/{slug}",
+            "phone": None,
+            "industries": None,
+            "groupedLocations": None,
+            "hashtag": None,
+            "foundedOn": None,
+        }
+        for slug in ["second", "first", "unknown"]
+    ]
+    mock_client = mock_apify(
+        mock_apify_client, {"defaultDatasetId": "mocked_dataset_id"}, items
+    )
+
+    urls = [
+        "https://www.linkedin.com/company/first/",
+        "https://www.linkedin.com/company/second",
+    ]
+    results = asyncio.run(collect(mock_linkedin_client.iter_company_details(urls)))
+
+    mock_client.actor.return_value.start.assert_called_once()
+    run_input = mock_client.actor.return_value.start.call_args.kwargs["run_input"]
+    assert run_input["urls"] == urls
+    assert [scraped.source_url for scraped in results] == [urls[1], urls[0], None]
+    assert [scraped.company.name for scraped in results] == [
+        "Company second",
+        "Company first",
+        "Company unknown",
+    ]
+
+
+def company_item(slug: str, linkedin_id: str) -> dict:
+    return {
+        "name": f"Company {slug}",
+        "id": linkedin_id,
+        "universalName": slug,
+        "url": f"https://www.linkedin.com/company/{slug}",
+    }
+
+
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_iter_company_details_matches_linkedin_id(
+    mock_apify_client, mock_linkedin_client
+):
+    mock_apify(
+        mock_apify_client,
+        {"defaultDatasetId": "mocked_dataset_id"},
+        [company_item("acme", "1441"), company_item("other", "2")],
+    )
+    urls = [
+        "https://www.linkedin.com/company/1441",
+        "https://www.linkedin.com/company/other",
+    ]
+
+    results = asyncio.run(collect(mock_linkedin_client.iter_company_details(urls)))
+
+    assert [scraped.source_url for scraped in results] == urls
+
+
+def test_scrape_cache_hit_by_linkedin_id_is_matched():
+    scrape_cache = ScrapeCache(":memory:", freshness_seconds=3600)
+    scrape_cache.put(company_item("acme", "1441"))
+    linkedin_client = LinkedinClient(scrape_cache=scrape_cache)
+    urls = ["https://www.linkedin.com/company/1441"]
+
+    results = asyncio.run(collect(linkedin_client.iter_company_details(urls)))
+
+    assert [scraped.source_url for scraped in results] == urls
+
+
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_iter_company_details_pairs_single_unmatched_item(
+    mock_apify_client, mock_linkedin_client
+):
+    mock_client = mock_apify(
+        mock_apify_client,
+        {"defaultDatasetId": "mocked_dataset_id"},
+        [company_item("meta", "10667"), company_item("acme", "1")],
+    )
+    urls = [
+        "https://www.linkedin.com/company/facebook",
+        "https://www.linkedin.com/company/acme",
+    ]
+
+    results = asyncio.run(collect(mock_linkedin_client.iter_company_details(urls)))
+
+    mock_client.actor.return_value.start.assert_called_once()
+    assert {scraped.company.name: scraped.source_url for scraped in results} == {
+        "Company meta": urls[0],
+        "Company acme": urls[1],
+    }
+
+
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_iter_company_details_scrapes_unmatched_urls_one_by_one(
+    mock_apify_client, mock_linkedin_client
+):
+    mock_client = mock_apify(mock_apify_client, {"defaultDatasetId": "id"}, [])
+    start = mock_client.actor.return_value.start
+    renamed = {
+        "https://www.linkedin.com/company/facebook": company_item("meta", "10667"),
+        "https://www.linkedin.com/company/twitter": company_item("x", "96622"),
+    }
+
+    async def iterate_items() -> AsyncIterator[dict]:
+        for url in start.call_args.kwargs["run_input"]["urls"]:
+            yield renamed[url]
+
+    mock_client.dataset.return_value.iterate_items.side_effect = iterate_items
+    urls = list(renamed)
+
+    results = asyncio.run(collect(mock_linkedin_client.iter_company_details(urls)))
+
+    assert [call.kwargs["run_input"]["urls"] for call in start.call_args_list] == [
+        urls,
+        [urls[0]],
+        [urls[1]],
+    ]
+    matched = [scraped for scraped in results if scraped.source_url is not None]
+    assert {scraped.company.name: scraped.source_url for scraped in matched} == {
+        "Company meta": urls[0],
+        "Company x": urls[1],
+    }
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://www.linkedin.com/company/test", "test"),
+        ("https://de.linkedin.com/company/Test/about/", "test"),
+        ("linkedin.com/company/test?trk=public_profile#about", "test"),
+        ("https://www.linkedin.com/company/caf%C3%A9", "café"),
+        (
+            "https://www.linkedin.com/in/someone/?trk=ab",
+            "https://www.linkedin.com/in/someone",
+        ),
+        ("https://www.linkedin.com/in/someone/", "https://www.linkedin.com/in/someone"),
+    ],
+)
+def test_company_handle(url, expected):
+    assert LinkedinClient.company_handle(url) == expected
+
+
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_iter_company_details_uses_scrape_cache(mock_apify_client):
+    mock_client = mock_apify(
+        mock_apify_client,
+        {"defaultDatasetId": "mocked_dataset_id", "stats": {"runTimeSecs": 20}},
+        [
+            {
+                "name": "Fresh",
+                "universalName": "fresh",
+                "phone": None,
+                "industries": None,
+                "groupedLocations": None,
+                "hashtag": None,
+                "foundedOn": None,
+            }
+        ],
+    )
+    scrape_cache = ScrapeCache(":memory:", freshness_seconds=3600)
+    linkedin_client = LinkedinClient(scrape_cache=scrape_cache)
+    urls = ["https://www.linkedin.com/company/fresh"]
+
+    first = asyncio.run(collect(linkedin_client.iter_company_details(urls)))
+    second = asyncio.run(collect(linkedin_client.iter_company_details(urls)))
+
+    mock_client.actor.return_value.start.assert_called_once()
+    assert first == second
+    assert second[0].source_url == urls[0]
+    assert scrape_cache.stats()["hits"] == 1
+
+
+@patch("parma_mining.linkedin.client.ApifyClientAsync")
+def test_apify_client_is_shared_across_scrapes(mock_apify_client, mock_linkedin_client):
+    mock_apify(mock_apify_client, {"defaultDatasetId": "mocked_dataset_id"}, [])
+
+    async def scrape_twice():
+        for slug in ["first", "second"]:
+            await mock_linkedin_client.get_company_details(
+                [f"https://www.linkedin.com/company/{slug}"]
+            )
+
+    asyncio.run(scrape_twice())
+
+    mock_apify_client.assert_called_once_with(
+        mock_linkedin_client.key,
+        api_url=None,
+        max_retries=mock_linkedin_client.apify_max_retries,
+        min_delay_between_retries_millis=mock_linkedin_client.apify_retry_delay_millis,
+        timeout_secs=mock_linkedin_client.apify_timeout_seconds,
+    )
+
+
+def test_aclose_closes_apify_client(mock_linkedin_client):
+    http_client = mock_linkedin_client.apify_client.http_client
+
+    asyncio.run(mock_linkedin_client.aclose())
+
+    assert http_client.httpx_async_client.is_closed
+    assert http_client.httpx_client.is_closed
@@ -0,0 +1,116 @@
+"""Stub of a Redis server for testing.
+
+This module provides a local stand-in speaking the Redis protocol, serving the
+commands used by the shared state from memory on a background thread.
+"""
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            count = int(line[1:])
+            args = []
+            for _ in range(count):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+            self.wfile.write(self.server.stub.execute(args))
+
+
+class RedisStub:
+    """Serve the Redis commands used by the shared state on a local port."""
+
+    def __init__(self):
+        """Initialize the RedisStub class."""
+        self._values: dict[str, tuple[str, float | None]] = {}
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.url = f"redis://127.0.0.1:{self._server.server_address[1]}/0"
+
+    def start(self) -> "RedisStub":
+        """Serve requests on a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def execute(self, args: list[str]) -> bytes:
+        """Execute a command and return its encoded reply."""
+        command = getattr(self, f"_{args[0].lower()}", None)
+        if command is None:
+            return f"-ERR unknown command '{args[0]}'\r\n".encode()
+        with self._lock:
+            return command(*args[1:])
+
+    def _ping(self) -> bytes:
+        return b"+PONG\r\n"
+
+    def _client(self, *args: str) -> bytes:
+        return b"+OK\r\n"
+
+    def _select(self, db: str) -> bytes:
+        return b"+OK\r\n"
+
+    def _get(self, key: str) -> bytes:
+        return _bulk(self._value(key))
+
+    def _set(self, key: str, value: str, *options: str) -> bytes:
+        ttl = None
+        options = [option.upper() for option in options]
+        if "PX" in options:
+            ttl = int(options[options.index("PX") + 1]) / 1000
+        elif "EX" in options:
+            ttl = int(options[options.index("EX") + 1])
+        self._values[key] = (value, _expires_at(ttl))
+        return b"+OK\r\n"
+
+    def _incrby(self, key: str, amount: str) -> bytes:
+        value = self._value(key)
+        expires_at = self._values[key][1] if value is not None else None
+        count = int(value or 0) + int(amount)
+        self._values[key] = (str(count), expires_at)
+        return f":{count}\r\n".encode()
+
+    def _pexpire(self, key: str, milliseconds: str) -> bytes:
+        if self._value(key) is None:
+            return b":0\r\n"
+        self._values[key] = (
+            self._values[key][0],
+            _expires_at(int(milliseconds) / 1000),
+        )
+        return b":1\r\n"
+
+    def _expire(self, key: str, seconds: str) -> bytes:
+        return self._pexpire(key, str(int(seconds) * 1000))
+
+    def _del(self, *keys: str) -> bytes:
+        deleted = sum(self._values.pop(key, None) is not None for key in keys)
+        return f":{deleted}\r\n".encode()
+
+    def _value(self, key: str) -> str | None:
+        value, expires_at = self._values.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+
+def _expires_at(ttl: float | None) -> float | None:
+    return time.monotonic() + ttl if ttl else None
+
+
+def _bulk(value: str | None) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    encoded = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(encoded), encoded)
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+
+from apify_client import ApifyClientAsync
+
+from parma_mining.linkedin.apify_compat import ApifyApiError, close_apify_client
+
+
+def test_installed_apify_client_exposes_the_internals_used():
+    # fails once apify-client moves the internals this module relies on
+    http_client = ApifyClientAsync("token").http_client
+
+    assert issubclass(ApifyApiError, Exception)
+    assert hasattr(http_client, "httpx_async_client")
+    assert hasattr(http_client, "httpx_client")
+
+
+def test_close_apify_client():
+    client = ApifyClientAsync("token")
+
+    asyncio.run(close_apify_client(client))
+
+    assert client.http_client.httpx_async_client.is_closed
+    assert client.http_client.httpx_client.is_closed
+
+
+def test_close_apify_client_without_pools(caplog):
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(close_apify_client(object()))
+
+    assert "no connection pools" in caplog.text
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+
+from parma_mining.linkedin.analytics_client import AnalyticsClient
+from parma_mining.linkedin.crawl_queue import (
+    ITEM_FAILED,
+    ITEM_FED,
+    ITEM_PENDING,
+    ITEM_SCRAPED,
+    CrawlQueue,
+    QueueFeedSink,
+)
+from parma_mining.linkedin.model import ErrorInfoModel, ResponseModel
+from parma_mining.mining_common.exceptions import AnalyticsError, CrawlingError
+
+ITEMS = [
+    ("id1", "https://www.linkedin.com/company/a", "a"),
+    ("id2", "https://www.linkedin.com/company/a", "a"),
+    ("id3", "https://www.linkedin.com/company/b", "b"),
+]
+
+
+@pytest.fixture
+def queue():
+    return CrawlQueue(":memory:", lease_seconds=60)
+
+
+def test_claim_leases_all_items_of_a_profile(queue):
+    queue.add_task(1, "token", False, ITEMS, {})
+
+    items = queue.claim(1, max_handles=1)
+
+    assert [(item.company_id, item.handle) for item in items] == [
+        ("id1", "a"),
+        ("id2", "a"),
+    ]
+    assert {item.state for item in items} == {ITEM_PENDING}
+    # leased items are not claimed twice
+    assert [item.handle for item in queue.claim(1, max_handles=5)] == ["b"]
+    assert queue.claim(1, max_handles=5) == []
+    assert 0 < queue.retry_in(1) <= 60  # noqa: PLR2004
+
+
+def test_expired_leases_are_claimed_by_other_processes(queue):
+    queue.lease_seconds = 0
+    queue.add_task(1, "token", False, ITEMS, {})
+    queue.claim(1, max_handles=5)
+    time.sleep(0.01)
+
+    # records of an expired lease may still be buffered by the process
+    assert queue.claim(1, max_handles=5) == []
+    queue.owner = "restarted"
+    assert len(queue.claim(1, max_handles=5)) == len(ITEMS)
+
+
+def test_item_states(queue):
+    queue.add_task(1, "token", False, ITEMS, {})
+    queue.claim(1, max_handles=5)
+
+    queue.set_run(1, ["a"], "run1")
+    queue.mark_scraped(1, "a", '{"name": "A"}')
+    queue.mark_fed(1, [("id1", "a")])
+    queue.mark_failed(1, [(None, "b")], CrawlingError("actor failed"))
+
+    assert queue.progress(1) == (2, 1)
+    assert queue.stats() == {
+        "running_tasks": 1,
+        ITEM_PENDING: 0,
+        ITEM_SCRAPED: 1,
+        ITEM_FED: 1,
+        ITEM_FAILED: 1,
+    }
+    assert queue.errors(1) == {
+        "id3": ErrorInfoModel(
+            error_type="CrawlingError", error_description="actor failed"
+        )
+    }
+    queue.lease_seconds = 0
+    queue.renew_leases()
+    time.sleep(0.01)
+    queue.owner = "restarted"
+    (item,) = queue.claim(1, max_handles=5)
+    assert (item.company_id, item.state, item.data, item.run_id) == (
+        "id2",
+        ITEM_SCRAPED,
+        '{"name": "A"}',
+        "run1",
+    )
+
+
+def test_running_task_is_resumed(queue):
+    task = queue.add_task(1, "token", False, ITEMS, {})
+    queue.claim(1, max_handles=1)
+    queue.mark_fed(1, [(None, "a")])
+
+    resumed = queue.add_task(1, "new token", True, ITEMS[:1], {})
+
+    assert resumed.attempt == task.attempt
+    assert resumed.token == "new token"
+    assert queue.unfinished_tasks() == [resumed]
+    assert queue.progress(1) == (2, 1)
+
+
+def test_finished_task_is_reset(queue):
+    task = queue.add_task(1, "token", False, ITEMS, {})
+    queue.claim(1, max_handles=5)
+    queue.mark_fed(1, [(None, "a"), (None, "b")])
+    queue.finish_task(1)
+    assert queue.unfinished_tasks() == []
+
+    errors = {"id4": ErrorInfoModel(error_type="ClientError", error_description="")}
+    again = queue.add_task(1, "token", False, ITEMS, errors)
+
+    assert again.attempt != task.attempt
+    assert queue.progress(1) == (2, 0)
+    assert set(queue.errors(1)) == {"id4"}
+
+
+def test_queue_survives_restarts(tmp_path):
+    path = str(tmp_path / "queue.db")
+    CrawlQueue(path).add_task(1, "token", False, ITEMS, {})
+
+    restarted = CrawlQueue(path)
+
+    assert [task.task_id for task in restarted.unfinished_tasks()] == [1]
+    assert len(restarted.claim(1, max_handles=5)) == len(ITEMS)
+
+
+def test_feed_sink_marks_items(queue, mocker):
+    task = queue.add_task(1, "token", False, ITEMS, {})
+    queue.claim(1, max_handles=5)
+    client = AnalyticsClient()
+    feed = mocker.patch.object(
+        client, "feed_raw_data_batch", return_value={"id3": AnalyticsError("down")}
+    )
+    sink = QueueFeedSink(client, queue, task)
+
+    async def run():
+        for company_id, _, handle in ITEMS:
+            data = ResponseModel.model_construct(
+                source_name="linkedin", company_id=company_id, raw_data={}
+            )
+            if company_id == "id2":
+                sink.skip_item(company_id, handle)
+            else:
+                await sink.add_item(data, handle)
+        await sink.close()
+
+    asyncio.run(run())
+
+    keys = feed.call_args.args[2]
+    assert keys == [sink.idempotency_key("id1", "a"), sink.idempotency_key("id3", "b")]
+    assert queue.retry_in(1) is None
+    assert set(queue.errors(1)) == {"id3"}
+    assert queue.stats()[ITEM_FED] == 2  # noqa: PLR2004
+
+
+def test_priority_is_kept_for_resumed_tasks(queue):
+    task = queue.add_task(1, "token", False, ITEMS, {})
+    task = queue.set_priority(task, 5)
+
+    assert task.priority == 5  # noqa: PLR2004
+    assert queue.unfinished_tasks() == [task]
+    assert queue.add_task(1, "token", False, ITEMS, {}).priority == 5  # noqa: PLR2004
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from parma_mining.linkedin.client import LinkedinClient
+from parma_mining.linkedin.discovery import DiscoveryEngine, StaticSearchBackend
+from parma_mining.linkedin.model import DiscoveryResponse
+from parma_mining.mining_common.exceptions import ClientError
+
+
+def slow_discover(name: str) -> DiscoveryResponse:
+    # later names finish first to check that the request order is kept
+    time.sleep(0.05 / int(name))
+    return DiscoveryResponse(urls=[f"https://www.linkedin.com/company/{name}"])
+
+
+def test_discovery_engine_keeps_request_order():
+    engine = DiscoveryEngine(concurrency=4, deadline=5)
+    names = ["1", "2", "3", "4"]
+
+    results = asyncio.run(engine.discover(slow_discover, names))
+
+    assert [result.urls[0].rsplit("/", 1)[1] for result in results] == names
+
+
+def test_discovery_engine_deadline():
+    engine = DiscoveryEngine(concurrency=2, deadline=0.01)
+
+    results = asyncio.run(engine.discover(lambda name: time.sleep(0.2), ["slow"]))
+
+    assert results == [DiscoveryResponse()]
+
+
+def test_discovery_engine_reraises_upstream_errors():
+    engine = DiscoveryEngine(concurrency=2, deadline=5)
+
+    def fail(name: str):
+        raise ClientError("Error searching organizations")
+
+    with pytest.raises(ClientError):
+        asyncio.run(engine.discover(fail, ["error"]))
+
+
+def test_discovery_engine_without_confident_match():
+    backend = StaticSearchBackend(
+        {
+            '"Acme" site:linkedin.com/company': [
+                "https://www.linkedin.com/company/unrelated-corp"
+            ]
+        }
+    )
+    client = LinkedinClient(search_backend=backend)
+    engine = DiscoveryEngine(concurrency=2, deadline=5)
+
+    results = asyncio.run(engine.discover(client.discover_company, ["Acme", "Other"]))
+
+    assert results == [DiscoveryResponse(), DiscoveryResponse()]
+
+
+def test_discovery_engine_bounds_concurrency():
+    engine = DiscoveryEngine(concurrency=2, deadline=5)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def discover(name: str) -> DiscoveryResponse:
+        with lock:
+            running.append(name)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(name)
+        return DiscoveryResponse()
+
+    asyncio.run(engine.discover(discover, [str(index) for index in range(6)]))
+
+    assert max(peak) == engine.concurrency
+
+
+def test_discover_company_with_static_backend():
+    backend = StaticSearchBackend(
+        {'"Test" site:linkedin.com/company': ["https://www.linkedin.com/company/test"]}
+    )
+    client = LinkedinClient(search_backend=backend)
+
+    result = client.discover_company("Test")
+
+    assert result.urls == ["https://www.linkedin.com/company/test"]
+    assert backend.queries == ['"Test" site:linkedin.com/company']
+
+
+def test_iter_discover_yields_results_as_they_resolve():
+    engine = DiscoveryEngine(concurrency=4, deadline=5)
+
+    async def collect() -> list[int]:
+        return [
+            index
+            async for index, _, _ in engine.iter_discover(
+                slow_discover, ["1", "2", "4"]
+            )
+        ]
+
+    assert asyncio.run(collect()) == [2, 1, 0]
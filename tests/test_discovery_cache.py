@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from parma_mining.linkedin.discovery import DiscoveryEngine
+from parma_mining.linkedin.discovery_cache import DiscoveryCache
+from parma_mining.linkedin.model import DiscoveryResponse
+from parma_mining.mining_common.shared_state import LocalState
+
+RESPONSE = DiscoveryResponse(urls=["https://www.linkedin.com/company/acme"])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiscoveryCache(str(tmp_path / "discovery.sqlite3"), ttl=timedelta(days=1))
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("ACME GmbH", "acme"),
+        ("  Acme   Inc. ", "acme"),
+        ("Acme GmbH & Co. KG", "acme"),
+        ("Acme Software, Ltd", "acme software"),
+        ("GmbH", "gmbh"),
+    ],
+)
+def test_normalize_name(name, expected):
+    assert DiscoveryCache.normalize_name(name) == expected
+
+
+def test_cache_hit_and_miss(cache):
+    assert cache.get("Acme") is None
+    cache.put("Acme GmbH", RESPONSE)
+
+    assert cache.get("acme")[0] == RESPONSE
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+
+
+def test_cache_persists(cache, tmp_path):
+    cache.put("Acme", RESPONSE)
+
+    reopened = DiscoveryCache(
+        str(tmp_path / "discovery.sqlite3"), ttl=timedelta(days=1)
+    )
+    assert reopened.get("Acme")[0] == RESPONSE
+
+
+def test_cache_expires_entries(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / "discovery.sqlite3"), ttl=timedelta(0))
+    cache.put("Acme", RESPONSE)
+
+    assert cache.get("Acme") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = DiscoveryCache(":memory:", ttl=timedelta(days=1), max_entries=2)
+    cache.put("first", RESPONSE)
+    cache.put("second", RESPONSE)
+    cache.get("first")
+    cache.put("third", RESPONSE)
+
+    assert cache.get("second") is None
+    assert cache.get("first")[0] == RESPONSE
+    assert cache.stats()["evictions"] == 1
+
+
+def test_discovery_engine_uses_cache(cache):
+    cache.put("Acme", RESPONSE)
+    discover_company = MagicMock(return_value=DiscoveryResponse(urls=["url"]))
+    engine = DiscoveryEngine(concurrency=1, cache=cache)
+
+    results = asyncio.run(engine.discover(discover_company, ["Acme Inc", "Other"]))
+
+    assert results == [RESPONSE, DiscoveryResponse(urls=["url"])]
+    discover_company.assert_called_once_with("Other")
+    assert cache.get("other")[0] == DiscoveryResponse(urls=["url"])
+
+
+def test_cache_serves_results_of_other_processes():
+    shared = LocalState()
+    first = DiscoveryCache(":memory:", ttl=timedelta(days=1), shared=shared)
+    second = DiscoveryCache(":memory:", ttl=timedelta(days=1), shared=shared)
+
+    first.put("Acme GmbH", RESPONSE)
+
+    response, created_at = second.get("acme")
+    assert response == RESPONSE
+    assert created_at == pytest.approx(time.time(), abs=5)
+    assert second.stats()["hits"] == 1
+
+
+def test_discovery_engine_reads_remote_cache_off_the_event_loop():
+    shared = LocalState()
+    shared.remote = True
+    cache = DiscoveryCache(":memory:", ttl=timedelta(days=1), shared=shared)
+    cache.put("Acme", RESPONSE)
+    readers = []
+    get = cache.get
+    cache.get = lambda name: readers.append(threading.get_ident()) or get(name)
+    engine = DiscoveryEngine(cache=cache)
+
+    async def discover() -> int:
+        await engine.discover(MagicMock(), ["Acme"])
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(discover())
+
+    assert len(readers) == 1
+    assert readers[0] != loop_thread
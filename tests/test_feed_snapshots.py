@@ -0,0 +1,82 @@
+import pytest
+
+from parma_mining.linkedin.feed_snapshots import DeltaFeed, FeedSnapshotStore
+from parma_mining.linkedin.model import CompanyModel
+
+COMPANY = CompanyModel(
+    name="Test Company",
+    description="A long description",
+    follower_count=1000,
+    industries=["Software"],
+)
+
+
+@pytest.fixture
+def store():
+    return FeedSnapshotStore(":memory:")
+
+
+def feed(
+    store: FeedSnapshotStore, company: CompanyModel, force_full=False, handle="test"
+):
+    delta = DeltaFeed(store, force_full=force_full)
+    raw_data = delta.raw_data("id1", handle, company)
+    delta.commit()
+    return raw_data
+
+
+def test_first_feed_is_full(store):
+    assert feed(store, COMPANY) is COMPANY
+    assert store.get("id1", "test") == FeedSnapshotStore.field_digests(
+        COMPANY.model_dump()
+    )
+
+
+def test_only_changed_fields_are_fed(store):
+    feed(store, COMPANY)
+    changed = COMPANY.model_copy(update={"follower_count": 1001, "industries": None})
+
+    assert feed(store, COMPANY) is None
+    assert feed(store, changed) == {"follower_count": 1001, "industries": None}
+    assert feed(store, changed) is None
+    assert store.stats() == {
+        "full_feeds": 1,
+        "delta_feeds": 1,
+        "unchanged": 2,
+        "fields_fed": len(CompanyModel.model_fields) + 2,
+        "fields_skipped": len(CompanyModel.model_fields) * 3 - 2,
+    }
+
+
+def test_force_full(store):
+    feed(store, COMPANY)
+
+    assert feed(store, COMPANY, force_full=True) is COMPANY
+
+
+def test_failed_feeds_are_not_committed(store):
+    delta = DeltaFeed(store)
+    delta.raw_data("id1", "test", COMPANY)
+    delta.raw_data("id2", "test", COMPANY)
+
+    delta.commit(failed=["id1"])
+
+    assert store.get("id1", "test") is None
+    assert store.get("id2", "test") is not None
+    assert delta.pending == {}
+
+
+def test_snapshots_are_kept_per_handle(store):
+    other = COMPANY.model_copy(update={"name": "Other Company"})
+    feed(store, COMPANY, handle="test")
+    feed(store, other, handle="other")
+
+    assert feed(store, COMPANY, handle="test") is None
+    assert feed(store, other, handle="other") is None
+
+
+def test_snapshots_persist(tmp_path):
+    path = str(tmp_path / "snapshots.db")
+    feed(FeedSnapshotStore(path), COMPANY)
+
+    assert feed(FeedSnapshotStore(path), COMPANY) is None
@@ -0,0 +1,71 @@
+import pytest
+
+from parma_mining.linkedin.item_mapping import (
+    ITEM_MAP,
+    compile_item_map,
+    map_item,
+    map_items,
+)
+from parma_mining.linkedin.model import CompanyModel
+
+ITEM = {
+    "name": "Mocked Company",
+    "id": "123",
+    "url": "https://www.linkedin.com/company/mocked",
+    "phone": {"number": "123-456-7890"},
+    "universalName": "mocked",
+    "headquarter": {"city": "Munich", "country": "DE", "postalCode": "80331"},
+    "industries": [{"name": "Software"}, {"id": 4}],
+    "groupedLocations": [{"localizedName": "Munich"}],
+    "hashtag": [{"displayName": "#ai"}],
+    "foundedOn": {"year": 2000, "month": 1, "day": 2},
+}
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("name", "Mocked Company"),
+        ("phone.number", "123-456-7890"),
+        ("industries[].name", ["Software"]),
+        ("missing", None),
+        ("missing.key", None),
+        ("name.key", None),
+        ("missing[].name", None),
+        ("name[].name", None),
+        ("headquarter.city.name", None),
+    ],
+)
+def test_compile_item_map(path, expected):
+    compiled_item, compiled_items = compile_item_map(
+        {"Mappings": [{"Field": "value", "ItemPath": path}]}
+    )
+
+    assert compiled_item(ITEM) == {"value": expected}
+    assert compiled_items([ITEM]) == [{"value": expected}]
+
+
+def test_map_item_covers_every_company_field():
+    fields = {mapping["Field"] for mapping in ITEM_MAP["Mappings"]}
+    assert fields == set(CompanyModel.model_fields)
+
+    company = CompanyModel.model_validate(map_item(ITEM))
+
+    assert company.headquarter_city == "Munich"
+    assert company.founded_day == 2  # noqa: PLR2004
+    assert company.locations == ["Munich"]
+
+
+def test_map_item_tolerates_missing_and_null_values():
+    fields = map_item({"name": "Sparse", "phone": None, "foundedOn": None})
+
+    company = CompanyModel.model_validate(fields)
+
+    assert company.name == "Sparse"
+    assert company.phone is None
+    assert company.industries is None
+    assert company.founded_year is None
+
+
+def test_map_items():
+    assert map_items([ITEM, {}]) == [map_item(ITEM), map_item({})]
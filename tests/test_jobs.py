@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+from parma_mining.linkedin.jobs import (
+    JOB_FAILED,
+    JOB_FINISHED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    Job,
+    JobManager,
+)
+from parma_mining.linkedin.model import JobModel
+from parma_mining.mining_common.shared_state import LocalState
+
+
+def test_job_manager_runs_job():
+    manager = JobManager(max_workers=1)
+
+    async def crawl(job: Job):
+        job.set_total(2)
+        job.advance()
+        await asyncio.sleep(0)
+        job.advance()
+
+    async def run() -> Job:
+        job = manager.submit(1, crawl)
+        await manager.shutdown()
+        return job
+
+    job = asyncio.run(run())
+
+    model = job.to_model()
+    assert model.status == JOB_FINISHED
+    assert model.processed == model.total
+    assert model.finished_at is not None
+    assert manager.get(job.job_id) is job
+
+
+def test_job_manager_records_failure():
+    manager = JobManager(max_workers=1)
+
+    async def crawl(job: Job):
+        raise RuntimeError("boom")
+
+    async def run() -> Job:
+        job = manager.submit(1, crawl)
+        await manager.shutdown()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == JOB_FAILED
+    assert job.error == "boom"
+
+
+def test_job_manager_limits_running_jobs():
+    manager = JobManager(max_workers=1)
+    release = asyncio.Event()
+
+    async def crawl(job: Job):
+        await release.wait()
+
+    async def run():
+        first = manager.submit(1, crawl)
+        second = manager.submit(2, crawl)
+        await asyncio.sleep(0.01)
+        statuses = first.status, second.status
+        release.set()
+        await manager.shutdown()
+        return statuses
+
+    assert asyncio.run(run()) == (JOB_RUNNING, JOB_QUEUED)
+
+
+def test_job_manager_evicts_finished_jobs():
+    manager = JobManager(max_workers=1, max_jobs=1)
+
+    async def crawl(job: Job):
+        pass
+
+    async def run() -> tuple[Job, Job]:
+        first = manager.submit(1, crawl)
+        await manager.shutdown()
+        second = manager.submit(2, crawl)
+        await manager.shutdown()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert manager.get(first.job_id) is None
+    assert manager.get(second.job_id) is second
+
+
+def test_jobs_are_shared_through_the_state():
+    state = LocalState()
+    api, worker = JobManager(state=state), JobManager(state=state)
+    queued = api.enqueue(7)
+
+    async def crawl(job: Job):
+        job.set_total(3)
+        job.advance(2)
+
+    async def run():
+        job_id = worker.job_id_for_task(7)
+        worker.submit(7, crawl, job_id=job_id)
+        await worker.shutdown()
+
+    assert api.snapshot(queued.job_id).status == JOB_QUEUED
+    asyncio.run(run())
+
+    model = api.snapshot(queued.job_id)
+    assert model.status == JOB_FINISHED
+    assert (model.processed, model.total) == (2, 3)
+    assert api.snapshot("unknown") is None
+
+
+def test_job_report_publishes_once_off_the_event_loop():
+    state = LocalState()
+    state.remote = True
+    writers = []
+    set_value = state.set
+    state.set = lambda *args: writers.append(threading.get_ident()) or set_value(*args)
+    job = Job(7, state=state)
+
+    async def report() -> int:
+        await job.report(3, 2, eta_seconds=60)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(report())
+
+    model = JobModel.model_validate_json(state.get(f"job:{job.job_id}"))
+    assert (model.processed, model.total) == (2, 3)
+    assert model.eta is not None
+    assert len(writers) == 1
+    assert writers[0] != loop_thread
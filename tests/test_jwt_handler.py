@@ -1,9 +1,24 @@
+import time
 from unittest.mock import patch
 
 import pytest
+from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
 
-from parma_mining.mining_common.jwt_handler import JWTHandler
+from parma_mining.mining_common.jwt_handler import JWTHandler, TokenCache
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    JWTHandler.token_cache.clear()
+    yield
+    JWTHandler.token_cache.clear()
+
+
+def encode(claims: dict) -> str:
+    return jwt.encode(
+        claims, JWTHandler.SHARED_SECRET_KEY, algorithm=JWTHandler.ALGORITHM
+    )
 
 
 @pytest.fixture
@@ -43,3 +58,43 @@ def test_verify_jwt_with_invalid_token(invalid_jwt):
         mock_decode.assert_called_once_with(
             invalid_jwt, JWTHandler.SHARED_SECRET_KEY, algorithms=[JWTHandler.ALGORITHM]
         )
+
+
+def test_verify_jwt_caches_verified_token():
+    token = encode({"sub": "analytics", "exp": int(time.time()) + 60})
+
+    with patch("jose.jwt.decode", wraps=jwt.decode) as mock_decode:
+        assert JWTHandler.verify_jwt(token) is True
+        assert JWTHandler.verify_jwt(token) is True
+
+    mock_decode.assert_called_once()
+    assert JWTHandler.token_cache.stats()["hits"] == 1
+
+
+def test_verify_jwt_does_not_cache_invalid_token():
+    token = encode({"sub": "analytics"}) + "tampered"
+
+    assert JWTHandler.verify_jwt(token) is False
+    assert JWTHandler.token_cache.stats()["size"] == 0
+
+
+def test_token_cache_expires_with_token():
+    cache = TokenCache()
+    cache.put("expired", {"exp": time.time() - 1})
+    cache.put("valid", {"exp": time.time() + 60})
+
+    assert cache.get("expired") is None
+    assert cache.get("valid") is not None
+    assert cache.stats()["size"] == 1
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_entries=2)
+    cache.put("first", {})
+    cache.put("second", {})
+    cache.get("first")
+    cache.put("third", {})
+
+    assert cache.get("second") is None
+    assert cache.get("first") == {}
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from parma_mining.mining_common.exceptions import CrawlingError
+from parma_mining.mining_common.metrics import (
+    STAGE_ACTOR_RUN,
+    STAGE_DATASET_FETCH,
+    observe,
+    observe_iter,
+)
+
+
+def stage_count(stage: str) -> float:
+    return REGISTRY.get_sample_value(
+        "parma_mining_stage_seconds_count", {"stage": stage}
+    )
+
+
+def stage_sum(stage: str) -> float:
+    return REGISTRY.get_sample_value("parma_mining_stage_seconds_sum", {"stage": stage})
+
+
+def error_count(stage: str, error: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "parma_mining_errors_total", {"stage": stage, "error": error}
+        )
+        or 0
+    )
+
+
+def test_observe_records_duration_and_errors():
+    count = stage_count(STAGE_ACTOR_RUN)
+    errors = error_count(STAGE_ACTOR_RUN, "CrawlingError")
+
+    with observe(STAGE_ACTOR_RUN):
+        pass
+    with pytest.raises(CrawlingError), observe(STAGE_ACTOR_RUN):
+        raise CrawlingError("actor failed")
+
+    assert stage_count(STAGE_ACTOR_RUN) == count + 2
+    assert error_count(STAGE_ACTOR_RUN, "CrawlingError") == errors + 1
+
+
+def test_observe_iter_excludes_consumer_time():
+    count = stage_count(STAGE_DATASET_FETCH)
+    seconds = stage_sum(STAGE_DATASET_FETCH)
+
+    async def items():
+        for item in range(3):
+            yield item
+
+    async def consume():
+        result = []
+        async for item in observe_iter(STAGE_DATASET_FETCH, items()):
+            time.sleep(0.01)
+            result.append(item)
+        return result
+
+    assert asyncio.run(consume()) == [0, 1, 2]
+    assert stage_count(STAGE_DATASET_FETCH) == count + 1
+    assert stage_sum(STAGE_DATASET_FETCH) - seconds < 0.01  # noqa: PLR2004
@@ -0,0 +1,185 @@
+import asyncio
+from unittest.mock import patch
+from urllib.error import HTTPError
+
+import pytest
+
+from parma_mining.linkedin.client import LinkedinClient
+from parma_mining.linkedin.discovery import StaticSearchBackend
+from parma_mining.mining_common.const import HTTP_200, HTTP_429, HTTP_500
+from parma_mining.mining_common.exceptions import CircuitOpenError, ClientError
+from parma_mining.mining_common.rate_control import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    GlobalBudget,
+    RateControl,
+    TokenBucket,
+    Upstream,
+)
+from parma_mining.mining_common.shared_state import LocalState
+
+FAST_UPSTREAM = {
+    "RATE_PER_SECOND": 1000,
+    "MIN_RATE_PER_SECOND": 1,
+    "MAX_RATE_PER_SECOND": 1000,
+    "BURST": 1000,
+    "BREAKER_THRESHOLD": 2,
+    "BREAKER_RESET_SECONDS": 60,
+}
+
+
+def test_token_bucket_reserves_after_burst():
+    bucket = TokenBucket(rate=10, min_rate=1, max_rate=20, burst=2)
+
+    delays = [bucket.reserve() for _ in range(3)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2] == pytest.approx(0.1, abs=0.01)
+
+
+def test_token_bucket_aimd():
+    bucket = TokenBucket(rate=10, min_rate=1, max_rate=11)
+
+    bucket.on_throttled()
+    assert bucket.rate == 5  # noqa: PLR2004
+    for _ in range(TokenBucket.INCREASE_STEPS * 2):
+        bucket.on_success()
+    assert bucket.rate == 11  # noqa: PLR2004
+    for _ in range(10):
+        bucket.on_throttled()
+    assert bucket.rate == 1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.on_failure()
+    assert breaker.allow()
+    breaker.on_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow()
+
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow()
+    breaker.on_success()
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+def test_cancelled_trial_does_not_keep_circuit_half_open():
+    upstream = Upstream(
+        "test",
+        TokenBucket(rate=0.01, min_rate=0.01, max_rate=1),
+        CircuitBreaker(failure_threshold=1, reset_seconds=60),
+    )
+    upstream.record_failure()
+    upstream.breaker.opened_at -= 60
+    # the trial request waits for a token and is cancelled meanwhile
+    upstream.bucket.reserve()
+
+    async def cancel_trial():
+        trial = asyncio.create_task(upstream.acquire_async())
+        await asyncio.sleep(0.01)
+        assert upstream.breaker.state == CIRCUIT_HALF_OPEN
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(cancel_trial())
+
+    assert upstream.breaker.allow()
+    assert upstream.breaker.state == CIRCUIT_HALF_OPEN
+
+
+def test_trial_without_outcome_is_replaced():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.on_failure()
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.retry_in() > 0
+
+    breaker.trial_started_at -= 60
+    assert breaker.retry_in() == 0
+    assert breaker.allow()
+
+
+def test_upstream_fails_fast_while_circuit_is_open():
+    upstream = Upstream.from_env("test", FAST_UPSTREAM)
+    upstream.record_status(HTTP_500)
+    upstream.record_status(HTTP_429)
+
+    with pytest.raises(CircuitOpenError):
+        upstream.acquire()
+    state = upstream.state()
+    assert state["circuit"] == CIRCUIT_OPEN
+    assert state["throttled"] == 1
+    assert state["rejected"] == 1
+
+
+def test_upstream_record_status_success():
+    upstream = Upstream.from_env("test", FAST_UPSTREAM)
+    upstream.record_status(HTTP_500)
+    upstream.record_status(HTTP_200)
+
+    assert upstream.state()["consecutive_failures"] == 0
+
+
+def test_rate_control_shares_upstreams():
+    rate_control = RateControl({"google": FAST_UPSTREAM})
+
+    assert rate_control.upstream("google") is rate_control.upstream("google")
+    assert set(rate_control.state()) == {"google"}
+
+
+def test_discover_company_backs_off_when_throttled():
+    rate_control = RateControl({"google": FAST_UPSTREAM, "apify": FAST_UPSTREAM})
+    client = LinkedinClient(
+        search_backend=StaticSearchBackend({}), rate_control=rate_control
+    )
+    throttled = HTTPError("https://www.google.com", HTTP_429, "Too Many", {}, None)
+
+    with patch.object(client, "search_backend", side_effect=throttled):
+        for _ in range(2):
+            with pytest.raises(ClientError):
+                client.discover_company("Test")
+    with pytest.raises(ClientError, match="open"):
+        client.discover_company("Test")
+
+    state = rate_control.state()["google"]
+    assert state["throttled"] == 2  # noqa: PLR2004
+    assert state["rate_per_second"] < FAST_UPSTREAM["RATE_PER_SECOND"]
+
+
+def test_global_budget_caps_all_processes():
+    state = LocalState()
+    budgets = [GlobalBudget(state, "apify", per_second=3) for _ in range(2)]
+
+    delays = [budget.reserve() for budget in budgets for _ in range(2)]
+
+    assert delays[:3] == [0.0, 0.0, 0.0]
+    assert 0 < delays[3] <= 1
+    assert budgets[1].deferred == 1
+
+
+def test_slow_global_budget_spreads_requests():
+    budget = GlobalBudget(LocalState(), "google", per_second=0.5)
+
+    assert (budget.window_seconds, budget.limit) == (2, 1)
+    assert budget.reserve() == 0.0
+    assert budget.reserve() > 0
+
+
+def test_upstream_uses_global_budget(monkeypatch):
+    monkeypatch.setenv("APIFY_GLOBAL_RATE_PER_SECOND", "1")
+    shared = RateControl(
+        defaults={"apify": FAST_UPSTREAM}, state=LocalState()
+    ).upstream("apify")
+    local = RateControl(defaults={"apify": FAST_UPSTREAM}).upstream("apify")
+
+    assert shared.budget.limit == 1
+    assert local.budget is None
+    shared.acquire()
+    assert shared.state()["budget_deferred"] == 0
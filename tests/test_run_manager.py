@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from parma_mining.linkedin.run_manager import RunManager
+from parma_mining.mining_common.exceptions import CrawlingError
+from parma_mining.mining_common.rate_control import RateControl
+
+FAST_APIFY = {
+    "RATE_PER_SECOND": 1000,
+    "MIN_RATE_PER_SECOND": 1,
+    "MAX_RATE_PER_SECOND": 1000,
+    "BURST": 1000,
+    "BREAKER_THRESHOLD": 5,
+    "BREAKER_RESET_SECONDS": 60,
+}
+
+
+def run_manager(**kwargs) -> RunManager:
+    upstream = RateControl({"apify": FAST_APIFY}).upstream("apify")
+    return RunManager(upstream, **kwargs)
+
+
+def apify_client(*statuses: str) -> MagicMock:
+    client = MagicMock()
+    client.actor.return_value.start = AsyncMock(
+        return_value={"id": "run", "status": "READY"}
+    )
+    client.run.return_value.wait_for_finish = AsyncMock(
+        side_effect=[{"id": "run", "status": status} for status in statuses]
+    )
+    client.run.return_value.abort = AsyncMock(
+        return_value={"id": "run", "status": "ABORTED"}
+    )
+    return client
+
+
+def test_run_starts_with_limits_and_waits_until_finished():
+    manager = run_manager(timeout_seconds=300, memory_mbytes=2048)
+    client = apify_client("RUNNING", "SUCCEEDED")
+
+    run = asyncio.run(manager.run(client, "actor", {"urls": []}))
+
+    assert run["status"] == "SUCCEEDED"
+    client.actor.return_value.start.assert_awaited_once_with(
+        run_input={"urls": []}, timeout_secs=300, memory_mbytes=2048
+    )
+    wait_for_finish = client.run.return_value.wait_for_finish
+    assert wait_for_finish.await_count == 2  # noqa: PLR2004
+    assert wait_for_finish.call_args.kwargs["wait_secs"] == 60  # noqa: PLR2004
+    assert manager.stats() == {
+        "in_flight": 0,
+        "started": 1,
+        "succeeded": 1,
+        "failed": 0,
+        "aborted": 0,
+    }
+
+
+def test_run_is_aborted_past_its_deadline(monkeypatch):
+    monkeypatch.setattr(RunManager, "ABORT_GRACE_SECONDS", 0)
+    manager = run_manager(timeout_seconds=0)
+    client = apify_client()
+
+    run = asyncio.run(manager.run(client, "actor", {}))
+
+    assert run["status"] == "ABORTED"
+    client.run.return_value.abort.assert_awaited_once()
+    client.run.return_value.wait_for_finish.assert_not_awaited()
+    assert manager.stats()["aborted"] == 1
+    assert manager.stats()["failed"] == 1
+
+
+def test_resume_waits_for_an_earlier_run():
+    manager = run_manager()
+    client = apify_client("SUCCEEDED")
+    client.run.return_value.get = AsyncMock(
+        side_effect=[{"id": "run", "status": "RUNNING"}, None]
+    )
+
+    run = asyncio.run(manager.resume(client, "run"))
+
+    assert run["status"] == "SUCCEEDED"
+    client.actor.return_value.start.assert_not_awaited()
+    assert asyncio.run(manager.resume(client, "gone")) is None
+
+
+def test_run_reports_its_id_once_started():
+    started = []
+    client = apify_client("SUCCEEDED")
+
+    asyncio.run(run_manager().run(client, "actor", {}, on_start=started.append))
+
+    assert started == ["run"]
+
+
+def test_wait_raises_for_missing_run():
+    manager = run_manager()
+    client = apify_client()
+    client.run.return_value.wait_for_finish = AsyncMock(return_value=None)
+
+    with pytest.raises(CrawlingError):
+        asyncio.run(manager.run(client, "actor", {}))
+    assert manager.stats()["in_flight"] == 0
+
+
+def test_runs_in_flight_are_capped():
+    manager = run_manager(max_concurrent_runs=2)
+    client = apify_client()
+    in_flight = []
+
+    async def wait_for_finish(wait_secs):
+        in_flight.append(len(manager.in_flight))
+        await asyncio.sleep(0.01)
+        return {"id": "run", "status": "SUCCEEDED"}
+
+    client.run.return_value.wait_for_finish = wait_for_finish
+    client.actor.return_value.start = AsyncMock(
+        side_effect=[{"id": f"run-{i}", "status": "READY"} for i in range(5)]
+    )
+
+    async def run_all():
+        await asyncio.gather(*(manager.run(client, "actor", {}) for _ in range(5)))
+
+    asyncio.run(run_all())
+
+    assert max(in_flight) == 2  # noqa: PLR2004
+    assert manager.stats()["succeeded"] == 5  # noqa: PLR2004
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from parma_mining.linkedin.scheduler import TaskScheduler
+
+
+async def crawl(scheduler: TaskScheduler, task_id: int, profiles: int, order: list):
+    async with scheduler.slot(task_id, profiles):
+        order.append(task_id)
+        await asyncio.sleep(0.01)
+
+
+def test_small_task_overtakes_backfill():
+    scheduler = TaskScheduler(capacity=1, max_per_task=1)
+    order: list[int] = []
+
+    async def run():
+        backfill = [
+            asyncio.create_task(crawl(scheduler, 1, 25, order)) for _ in range(4)
+        ]
+        await asyncio.sleep(0)
+        urgent = asyncio.create_task(crawl(scheduler, 2, 2, order))
+        await asyncio.gather(*backfill, urgent)
+
+    asyncio.run(run())
+
+    # the first chunk of the backfill was running when the urgent task arrived
+    assert order == [1, 2, 1, 1, 1]
+
+
+def test_slots_are_shared_by_priority():
+    scheduler = TaskScheduler(capacity=1, max_per_task=1)
+    scheduler.register(1, priority=3)
+    scheduler.register(2, priority=1)
+    order: list[int] = []
+
+    async def run():
+        await asyncio.gather(
+            *(crawl(scheduler, task_id, 10, order) for task_id in (1, 2) * 4)
+        )
+
+    asyncio.run(run())
+
+    assert order[:4].count(1) == 3  # noqa: PLR2004
+
+
+def test_tasks_are_capped():
+    scheduler = TaskScheduler(capacity=4, max_per_task=2)
+    running: list[int] = []
+
+    async def hold(task_id: int):
+        async with scheduler.slot(task_id, 1):
+            running.append(scheduler.stats()["running"])
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(hold(1) for _ in range(4)))
+
+    asyncio.run(run())
+
+    assert max(running) == 2  # noqa: PLR2004
+
+
+def test_cancelled_chunks_leave_the_queue():
+    scheduler = TaskScheduler(capacity=1, max_per_task=1)
+    order: list[int] = []
+
+    async def run():
+        first = asyncio.create_task(crawl(scheduler, 1, 1, order))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(crawl(scheduler, 2, 1, order))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(first, waiting, return_exceptions=True)
+        await crawl(scheduler, 3, 1, order)
+
+    asyncio.run(run())
+
+    assert order == [1, 3]
+    assert scheduler.stats()["running"] == 0
+    assert scheduler.stats()["waiting"] == 0
+
+
+def test_estimate_by_share_of_capacity():
+    scheduler = TaskScheduler(
+        capacity=4, max_per_task=4, default_seconds_per_profile=10
+    )
+    scheduler.register(1, priority=1)
+    scheduler.register(2, priority=3)
+
+    assert scheduler.estimate(1, 10) == pytest.approx(100)
+    assert scheduler.estimate(2, 30) == pytest.approx(100)
+    assert scheduler.estimate(3, 10) is None
+    assert scheduler.stats()["tasks"][2]["eta_seconds"] == pytest.approx(100)
+    scheduler.unregister(2)
+    assert scheduler.estimate(1, 10) == pytest.approx(25)
+
+
+def test_slot_left_after_cancelling_a_waiter_is_passed_on():
+    scheduler = TaskScheduler(capacity=1, max_per_task=1)
+    order: list[int] = []
+
+    async def run():
+        queued = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(1, 1):
+                await queued.wait()
+                # the waiter is cancelled but has not resumed when the slot is left
+                waiting.cancel()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(crawl(scheduler, 2, 1, order))
+        await asyncio.sleep(0)
+        queued.set()
+        results = await asyncio.gather(holder, waiting, return_exceptions=True)
+        await asyncio.wait_for(crawl(scheduler, 3, 1, order), 1)
+        return results
+
+    holder_result, waiting_result = asyncio.run(run())
+
+    assert holder_result is None
+    assert isinstance(waiting_result, asyncio.CancelledError)
+    assert order == [3]
+    assert scheduler.stats()["running"] == 0
+    assert scheduler.stats()["waiting"] == 0
+    assert scheduler.stats()["tasks"][2]["waiting"] == 0
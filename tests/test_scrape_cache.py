@@ -0,0 +1,88 @@
+import pytest
+
+from parma_mining.linkedin.scrape_cache import ScrapeCache
+from parma_mining.mining_common.shared_state import LocalState
+
+ITEM = {"id": "123", "universalName": "Acme", "name": "Acme"}
+ACTOR_SECONDS = 30
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ScrapeCache(str(tmp_path / "scrape.sqlite3"), freshness_seconds=3600)
+
+
+def test_cache_serves_fresh_items(cache):
+    assert cache.get("acme") is None
+    cache.put(ITEM)
+
+    assert cache.get("acme") == ITEM
+    assert cache.get("123") == ITEM
+
+
+def test_cache_ignores_stale_items(tmp_path):
+    cache = ScrapeCache(str(tmp_path / "scrape.sqlite3"), freshness_seconds=-1)
+    cache.put(ITEM)
+
+    assert cache.get("acme") is None
+
+
+def test_cache_purges_stale_items_on_write(tmp_path):
+    cache = ScrapeCache(str(tmp_path / "scrape.sqlite3"), freshness_seconds=3600)
+    cache.put(ITEM)
+    cache._db.execute("UPDATE entries SET scraped_at = scraped_at - 7200")
+    cache.put({"universalName": "other", "name": "Other"})
+
+    assert cache._db.execute("SELECT key FROM entries").fetchall() == [("other",)]
+    assert cache._db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+    assert cache.stats()["size"] == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ScrapeCache(
+        str(tmp_path / "scrape.sqlite3"), freshness_seconds=3600, max_entries=2
+    )
+    cache.put({"universalName": "first"})
+    cache.put({"universalName": "second"})
+    cache.get("first")
+    cache.put({"universalName": "third"})
+
+    assert cache.get("second") is None
+    assert cache.get("first") == {"universalName": "first"}
+    assert cache._db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2  # noqa: PLR2004
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_is_content_addressed(cache):
+    cache.put(ITEM)
+    cache.put({**ITEM, "name": "Acme Corp"})
+
+    assert cache.get("acme")["name"] == "Acme Corp"
+    assert cache._db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+
+def test_cache_stats(cache):
+    cache.put(ITEM)
+    cache.record_run(ACTOR_SECONDS, 2)
+    cache.get("acme")
+    cache.get("unknown")
+
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 1,
+        "hit_ratio": 0.5,
+        "saved_actor_seconds": ACTOR_SECONDS / 2,
+        "evictions": 0,
+        "size": 2,
+    }
+
+
+def test_cache_serves_items_of_other_processes(tmp_path):
+    shared = LocalState()
+    first = ScrapeCache(":memory:", freshness_seconds=3600, shared=shared)
+    second = ScrapeCache(":memory:", freshness_seconds=3600, shared=shared)
+
+    first.put(ITEM)
+
+    assert second.get("acme") == ITEM
+    assert second.stats()["hits"] == 1
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from parma_mining.mining_common.shared_state import LocalState, RedisState
+from tests.redis_stub import RedisStub
+
+
+@pytest.fixture(scope="module")
+def redis_stub():
+    stub = RedisStub().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture(params=["local", "redis"])
+def state(request, redis_stub):
+    if request.param == "local":
+        state = LocalState()
+    else:
+        state = RedisState(redis_stub.url)
+    yield state
+    state.close()
+
+
+def test_get_and_set(state):
+    assert state.get("missing") is None
+
+    state.set("key", "value")
+
+    assert state.get("key") == "value"
+
+
+def test_keys_expire(state):
+    state.set("expiring", "value", ttl_seconds=0.05)
+    state.incr("counter", ttl_seconds=0.05)
+    time.sleep(0.1)
+
+    assert state.get("expiring") is None
+    assert state.incr("counter", ttl_seconds=0.05) == 1
+
+
+def test_incr_counts(state):
+    counts = [state.incr("counted", ttl_seconds=60) for _ in range(3)]
+
+    assert counts == [1, 2, 3]
+
+
+def test_processes_share_the_redis_state(redis_stub):
+    first, second = RedisState(redis_stub.url), RedisState(redis_stub.url)
+
+    first.set("shared", "value")
+    first.incr("shared-counter", ttl_seconds=60)
+
+    assert second.get("shared") == "value"
+    assert second.incr("shared-counter", ttl_seconds=60) == 2  # noqa: PLR2004
@@ -0,0 +1,42 @@
+import asyncio
+
+from parma_mining.mining_common.exceptions import CrawlingError
+from parma_mining.mining_common.single_flight import SingleFlight
+
+
+def test_callers_join_a_flight_in_progress():
+    flights = SingleFlight()
+
+    lead, joined = flights.lead_or_join(["a", "b"])
+    again, waiting = flights.lead_or_join(["b", "c"])
+
+    assert (lead, joined) == (["a", "b"], {})
+    assert again == ["c"]
+    assert list(waiting) == ["b"]
+
+    async def run():
+        wait = asyncio.create_task(waiting["b"].wait())
+        flights.resolve("b", "result")
+        await wait
+
+    asyncio.run(run())
+
+    assert waiting["b"].result == "result"
+    assert flights.stats() == {"in_flight": 2, "led": 3, "joined": 1}
+    # a key is fetched again once its flight has ended
+    assert flights.lead_or_join(["b"]) == (["b"], {})
+
+
+def test_failed_and_abandoned_flights():
+    flights = SingleFlight()
+    flights.lead_or_join(["a", "b"])
+    _, joined = flights.lead_or_join(["a", "b"])
+    error = CrawlingError("actor failed")
+
+    flights.fail("a", error)
+    flights.abandon(["a", "b"])
+
+    assert joined["a"].error is error
+    assert not joined["a"].abandoned
+    assert joined["b"].abandoned
+    assert flights.stats()["in_flight"] == 0
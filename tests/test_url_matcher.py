@@ -0,0 +1,80 @@
+import pytest
+
+from parma_mining.linkedin.client import SEARCH_MODE_KEYWORD, LinkedinClient
+from parma_mining.linkedin.discovery import StaticSearchBackend
+from parma_mining.linkedin.url_matcher import LinkedinUrlMatcher
+
+
+@pytest.fixture
+def matcher():
+    return LinkedinUrlMatcher(confident_score=0.95, min_score=0.5)
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://www.linkedin.com/company/Acme/", "acme"),
+        ("https://de.linkedin.com/company/acme-gmbh/about/", "acme-gmbh"),
+        ("https://www.linkedin.com/company/caf%C3%A9?trk=1", "café"),
+        ("https://www.linkedin.com/in/someone", None),
+        ("https://example.com/a/b/", None),
+        ("https://example.com/linkedin.com/company/acme", None),
+    ],
+)
+def test_slug(url, expected):
+    assert LinkedinUrlMatcher.slug(url) == expected
+
+
+def test_score_prefers_matching_slug(matcher):
+    assert matcher.score("ACME GmbH", "acme") == 1.0
+    assert matcher.score("Acme", "acme-gmbh") == 1.0
+    assert matcher.score("Acme", "acme-software") > matcher.score("Acme", "zenith")
+
+
+def test_best_match_ranks_candidates(matcher):
+    urls = [
+        "https://example.com/company/acme/",
+        "https://www.linkedin.com/company/zenith",
+        "https://www.linkedin.com/company/acme-software",
+    ]
+
+    assert (
+        matcher.best_match("Acme", urls)
+        == "https://www.linkedin.com/company/acme-software"
+    )
+
+
+def test_best_match_stops_at_confident_match(matcher):
+    consumed = []
+
+    def urls():
+        for slug in ["other", "acme", "acme-inc"]:
+            consumed.append(slug)
+            yield f"https://www.linkedin.com/company/{slug}"
+
+    assert matcher.best_match("Acme", urls()) == "https://www.linkedin.com/company/acme"
+    assert consumed == ["other", "acme"]
+
+
+def test_best_match_rejects_weak_candidates(matcher):
+    urls = ["https://www.linkedin.com/company/zenith"]
+
+    assert matcher.best_match("Acme", urls) is None
+
+
+def test_discover_company_keyword_mode():
+    backend = StaticSearchBackend(
+        {
+            "Acme linkedin": [
+                "https://example.com/a/b/",
+                "https://linkedin.com/company/acme",
+            ]
+        }
+    )
+    client = LinkedinClient(search_backend=backend)
+    client.search_mode = SEARCH_MODE_KEYWORD
+
+    result = client.discover_company("Acme")
+
+    assert result.urls == ["https://www.linkedin.com/company/acme"]
+    assert backend.queries == ["Acme linkedin"]